@@ -0,0 +1,88 @@
+# archive.py
+# Перенос закрытых учебных лет из homeworks/grades в архивные таблицы. Горячие таблицы остаются
+# маленькими — эндпоинты по умолчанию читают только их, история подмешивается по запросу (?history=1).
+# Строки переносятся короткими транзакциями по batch_size (вставка в архив и удаление — вместе),
+# между пачками — пауза, чтобы запросы API не ждали блокировок.
+import time
+from datetime import datetime
+
+from sqlalchemy import select, text
+
+import config
+from db_models import Homework, Grade, HomeworkArchive, GradeArchive
+
+ARCHIVED = ((Homework, HomeworkArchive), (Grade, GradeArchive))
+START_MONTH = getattr(config, 'ACADEMIC_YEAR_START_MONTH', 9)
+
+
+def academic_year(dt):
+    # учебный год называется по году начала: сентябрь 2024 — август 2025 -> 2024
+    return dt.year if dt.month >= START_MONTH else dt.year - 1
+
+
+def year_start(year):
+    return datetime(year, START_MONTH, 1)
+
+
+def current_academic_year(now=None):
+    return academic_year(now or datetime.utcnow())
+
+
+def _ensure_partitions(conn, archive, years):
+    # MySQL: секция на каждый архивный год отделяется от p_future; более старые годы попадают
+    # в самую раннюю секцию (RANGE допускает только возрастающие границы)
+    existing = {r[0] for r in conn.execute(text(
+        "SELECT partition_name FROM information_schema.partitions WHERE table_schema = DATABASE() AND table_name = :t"),
+        {'t': archive.__tablename__}) if r[0]}
+    top = max((int(p[1:]) for p in existing if p[1:].isdigit()), default=None)
+    for year in sorted(years):
+        if top is not None and year <= top:
+            continue
+        conn.execute(text(f'ALTER TABLE {archive.__tablename__} REORGANIZE PARTITION p_future INTO '
+                          f'(PARTITION p{year} VALUES LESS THAN ({year + 1}), PARTITION p_future VALUES LESS THAN MAXVALUE)'))
+        top = year
+
+
+def archive_before(engine, before_year, batch_size=500, pause=0.05, progress=None):
+    # переносит строки, созданные до начала учебного года before_year; {таблица: перенесено}
+    boundary = year_start(before_year)
+    moved = {}
+    for model, archive in ARCHIVED:
+        hot, arch = model.__table__, archive.__table__
+        cols = [c.name for c in hot.columns]
+        if engine.dialect.name == 'mysql':
+            with engine.connect() as conn:
+                first = conn.execute(select(hot.c.created_at).where(hot.c.created_at < boundary).order_by(hot.c.created_at).limit(1)).scalar()
+            if first is not None:
+                with engine.begin() as conn:
+                    _ensure_partitions(conn, archive, range(academic_year(first), before_year))
+        total, last_id = 0, 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(select(hot).where(hot.c.created_at < boundary, hot.c.id > last_id)
+                                    .order_by(hot.c.id).limit(batch_size)).mappings().all()
+                if not rows:
+                    break
+                conn.execute(arch.insert(), [dict({c: r[c] for c in cols}, academic_year=academic_year(r['created_at'])) for r in rows])
+                conn.execute(hot.delete().where(hot.c.id.in_([r['id'] for r in rows])))
+            last_id = rows[-1]['id']
+            total += len(rows)
+            if progress:
+                progress(hot.name, total)
+            time.sleep(pause)
+        moved[hot.name] = total
+    return moved
+
+
+def archived_homework(sess, student_id, program, year=None):
+    q = sess.query(HomeworkArchive).filter((HomeworkArchive.student_id == student_id) | (HomeworkArchive.program == program))
+    if year is not None:
+        q = q.filter(HomeworkArchive.academic_year == year)
+    return q.order_by(HomeworkArchive.academic_year, HomeworkArchive.id).all()
+
+
+def archived_grades(sess, student_id, year=None):
+    q = sess.query(GradeArchive).filter(GradeArchive.student_id == student_id)
+    if year is not None:
+        q = q.filter(GradeArchive.academic_year == year)
+    return q.order_by(GradeArchive.academic_year, GradeArchive.id).all()
@@ -0,0 +1,133 @@
+# avatars.py
+# Аватары студентов на сервере: при загрузке один раз в фоновом потоке нарезаются миниатюры
+# фиксированных размеров, дальше они отдаются как есть. Версия — хэш исходного файла, она же ETag.
+# Без Pillow миниатюры не строятся: на любой размер отдаётся исходное изображение.
+import hashlib
+import io
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # миниатюры доступны только при установленном Pillow
+    Image = None
+
+THUMBNAILS = Image is not None
+
+AVATAR_SIZES = (32, 64, 128, 256)
+_SIGNATURES = {b'\x89PNG\r\n\x1a\n': 'png', b'\xff\xd8\xff': 'jpeg'}
+
+
+def sniff_format(data):
+    for sig, fmt in _SIGNATURES.items():
+        if data.startswith(sig):
+            return fmt
+    return None
+
+
+class AvatarStore:
+    # root/<student_id>/<версия>/<размер>.png и original; файл current указывает на готовую версию
+    def __init__(self, root, workers=2, sizes=AVATAR_SIZES):
+        self.root = os.path.abspath(root)
+        self.sizes = tuple(sorted(sizes))
+        os.makedirs(root, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avatar')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, student_id, version=None):
+        d = os.path.join(self.root, str(int(student_id)))
+        return os.path.join(d, version) if version else d
+
+    def current(self, student_id):
+        try:
+            with open(os.path.join(self._dir(student_id), 'current'), encoding='ascii') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def submit(self, student_id, data):
+        # проверка формата — сразу, нарезка — в пуле; до её окончания отдаётся прежняя версия
+        fmt = sniff_format(data)
+        if not fmt:
+            raise ValueError('avatar must be PNG or JPEG')
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as img:
+                    img.verify()
+            except Exception:
+                raise ValueError('avatar image is corrupted')
+        version = hashlib.sha256(data).hexdigest()[:16]
+        if version == self.current(student_id):
+            return version, None
+        with self._lock:
+            fut = self._jobs.get((student_id, version))
+            if fut is None or fut.done():
+                fut = self._jobs[(student_id, version)] = self._pool.submit(self._process, student_id, version, data)
+        return version, fut
+
+    def _process(self, student_id, version, data):
+        tmp = self._dir(student_id, version + '.tmp')
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            with open(os.path.join(tmp, 'original'), 'wb') as f:
+                f.write(data)
+            if Image is not None:
+                with Image.open(io.BytesIO(data)) as img:
+                    img = img.convert('RGBA')
+                    for size in self.sizes:
+                        thumb = img.copy()
+                        thumb.thumbnail((size, size), Image.LANCZOS)
+                        thumb.save(os.path.join(tmp, f'{size}.png'), 'PNG', optimize=True)
+            self._publish(student_id, version, tmp)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        finally:
+            with self._lock:
+                self._jobs.pop((student_id, version), None)
+        return version
+
+    def _publish(self, student_id, version, tmp):
+        final = self._dir(student_id, version)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        pointer = os.path.join(self._dir(student_id), 'current')
+        with open(pointer + '.tmp', 'w', encoding='ascii') as f:
+            f.write(version)
+        old = self.current(student_id)
+        os.replace(pointer + '.tmp', pointer)
+        if old and old != version:
+            shutil.rmtree(self._dir(student_id, old), ignore_errors=True)
+
+    def pick_size(self, requested):
+        # наименьшая миниатюра не меньше запрошенной, иначе самая большая
+        for size in self.sizes:
+            if size >= requested:
+                return size
+        return self.sizes[-1]
+
+    def path(self, student_id, size=None):
+        # (путь, mimetype, etag) или None, если аватара нет
+        version = self.current(student_id)
+        if not version:
+            return None
+        d = self._dir(student_id, version)
+        if size:
+            size = self.pick_size(size)
+            thumb = os.path.join(d, f'{size}.png')
+            if os.path.exists(thumb):
+                return thumb, 'image/png', f'{version}-{size}'
+        original = os.path.join(d, 'original')
+        try:
+            with open(original, 'rb') as f:
+                fmt = sniff_format(f.read(8))
+        except FileNotFoundError:  # версию только что заменили
+            return None
+        return original, f'image/{fmt or "png"}', f'{version}-orig'
+
+    def pending(self, student_id):
+        with self._lock:
+            return any(sid == student_id and not fut.done() for (sid, _), fut in self._jobs.items())
@@ -0,0 +1,294 @@
+# backup.py
+# Резервные копии БД и вложений. Каждый шард читается в одной транзакции (согласованный снимок:
+# на SQLite — явный BEGIN, на MySQL — START TRANSACTION WITH CONSISTENT SNAPSHOT), таблицы пишутся
+# потоково в NDJSON.gz. Вложения ДЗ из снимка и текущие аватары кладутся в хранилище по хэшу
+# содержимого: файл, который уже есть в прошлых копиях, повторно не копируется.
+#
+#   <target>/<YYYYmmdd-HHMMSS>/manifest.json       таблицы, число строк, файлы и их хэши
+#   <target>/<YYYYmmdd-HHMMSS>/db/<шард>/<таблица>.ndjson.gz
+#   <target>/files/<ab>/<sha256>                   содержимое файлов, общее для всех копий
+#   <target>/files/index.json                      размер и mtime уже посчитанных файлов — чтобы не хэшировать заново
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import select
+
+from db_models import Student, Homework, Grade, ScheduleItem, HomeworkArchive, GradeArchive, ShardMapEntry, IdBlock
+
+BACKUP_MODELS = (Student, ScheduleItem, Homework, Grade, HomeworkArchive, GradeArchive)
+# карта шардов и счётчики id лежат только в БД шарда по умолчанию
+DIRECTORY_MODELS = (ShardMapEntry, IdBlock)
+ROW_BATCH = 1000
+CHUNK = 1 << 20
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _snapshot_connection(engine):
+    # соединение с открытой читающей транзакцией; все SELECT в ней видят одно состояние БД
+    conn = engine.connect()
+    if engine.dialect.name == 'sqlite':
+        # pysqlite сам не начинает транзакцию для SELECT — управляем ею явно
+        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+        conn.exec_driver_sql('BEGIN')
+    elif engine.dialect.name == 'mysql':
+        conn = conn.execution_options(isolation_level='REPEATABLE READ')
+        conn.exec_driver_sql('START TRANSACTION WITH CONSISTENT SNAPSHOT')
+    return conn
+
+
+def _end_snapshot(conn):
+    if conn.engine.dialect.name == 'sqlite':
+        conn.exec_driver_sql('ROLLBACK')
+    else:
+        conn.rollback()
+    conn.close()
+
+
+def _dump_table(conn, model, path):
+    # одна таблица шарда -> NDJSON.gz; возвращает (строк, sha256 файла, вложения)
+    table = model.__table__
+    rows, attachments = 0, set()
+    pk = list(table.primary_key.columns)
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        for row in conn.execution_options(yield_per=ROW_BATCH).execute(select(table).order_by(*pk)).mappings():
+            f.write(json.dumps({k: _json_value(v) for k, v in row.items()}, ensure_ascii=False) + '\n')
+            rows += 1
+            if model in (Homework, HomeworkArchive) and row['attachment']:
+                attachments.add(row['attachment'])
+    return rows, _sha256(path), attachments
+
+
+def _avatar_files(upload_dir):
+    # текущая версия аватара каждого студента: указатель current и файлы версии
+    root = os.path.join(upload_dir, 'avatars')
+    if not os.path.isdir(root):
+        return
+    for sid in os.listdir(root):
+        pointer = os.path.join(root, sid, 'current')
+        try:
+            with open(pointer, encoding='ascii') as f:
+                version = f.read().strip()
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        yield os.path.join('avatars', sid, 'current')
+        vdir = os.path.join(root, sid, version)
+        if os.path.isdir(vdir):
+            for name in os.listdir(vdir):
+                yield os.path.join('avatars', sid, version, name)
+
+
+class FileStore:
+    # хранилище содержимого по sha256 с кэшем хэшей исходных файлов (размер и mtime не изменились — хэш тот же)
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, 'index.json')
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        self._lock = threading.Lock()
+
+    def object_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, src):
+        # (sha256, размер, скопирован ли файл)
+        st = os.stat(src)
+        key = os.path.abspath(src)
+        with self._lock:
+            cached = self.index.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns and os.path.exists(self.object_path(cached[2])):
+            return cached[2], st.st_size, False
+        digest = _sha256(src)
+        dst = self.object_path(digest)
+        copied = not os.path.exists(dst)
+        if copied:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = f'{dst}.{threading.get_ident()}.tmp'
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        with self._lock:
+            self.index[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest, st.st_size, copied
+
+    def save_index(self):
+        with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+
+def backup(shards, target, upload_dir, workers=4, progress=None):
+    started = time.monotonic()
+    name = datetime.now().strftime('%Y%m%d-%H%M%S')
+    snap_dir = os.path.join(target, name)
+    if os.path.exists(snap_dir):
+        raise RuntimeError(f'backup {name} already exists')
+    tmp_dir = snap_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest = {'created': datetime.now().isoformat(timespec='seconds'), 'shards': {}, 'files': {}, 'missing': []}
+    attachments = set()
+
+    def dump_shard(shard):
+        engine = shards.engine(shard)
+        models = BACKUP_MODELS + (DIRECTORY_MODELS if shard == shards.default else ())
+        os.makedirs(os.path.join(tmp_dir, 'db', shard))
+        tables, found = {}, set()
+        conn = _snapshot_connection(engine)
+        try:
+            for model in models:
+                rel = f'db/{shard}/{model.__tablename__}.ndjson.gz'
+                rows, digest, att = _dump_table(conn, model, os.path.join(tmp_dir, rel))
+                tables[model.__tablename__] = {'file': rel, 'rows': rows, 'sha256': digest}
+                found |= att
+                if progress:
+                    progress(f'{shard}.{model.__tablename__}: {rows} rows')
+        finally:
+            _end_snapshot(conn)
+        return shard, {'dialect': engine.dialect.name, 'tables': tables}, found
+
+    store = FileStore(os.path.join(target, 'files'))
+    copied = 0
+    try:
+        # шарды независимы — читаем их параллельно, каждый в своём снимке
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for shard, info, found in pool.map(dump_shard, shards.names()):
+                manifest['shards'][shard] = info
+                attachments |= found
+            files = sorted(attachments | set(_avatar_files(upload_dir)))
+
+            def put(rel):
+                src = os.path.join(upload_dir, rel)
+                try:
+                    return rel, store.put(src)
+                except FileNotFoundError:  # вложение удалено после снимка
+                    return rel, None
+
+            for rel, result in pool.map(put, files):
+                if result is None:
+                    manifest['missing'].append(rel)
+                    continue
+                digest, size, was_copied = result
+                manifest['files'][rel] = {'sha256': digest, 'size': size}
+                copied += was_copied
+        manifest['stats'] = {'files_copied': copied, 'files_reused': len(manifest['files']) - copied,
+                             'elapsed': round(time.monotonic() - started, 3)}
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        store.save_index()
+        os.replace(tmp_dir, snap_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return name, manifest
+
+
+def list_backups(target):
+    # готовые копии, от старой к новой (незавершённые *.tmp пропускаются)
+    if not os.path.isdir(target):
+        return []
+    return sorted(d for d in os.listdir(target) if os.path.exists(os.path.join(target, d, 'manifest.json')))
+
+
+def _decode_row(table, row):
+    out = {}
+    for k, v in row.items():
+        col = table.c.get(k)
+        if col is None:
+            continue  # колонки, которой уже нет в схеме
+        if v is not None and isinstance(v, str) and col.type.python_type is datetime:
+            v = datetime.fromisoformat(v)
+        out[k] = v
+    return out
+
+
+def _load_table(conn, model, path, expected_sha):
+    if expected_sha and _sha256(path) != expected_sha:
+        raise RuntimeError(f'{path}: checksum mismatch')
+    table = model.__table__
+    batch, total = [], 0
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            batch.append(_decode_row(table, json.loads(line)))
+            if len(batch) >= ROW_BATCH:
+                conn.execute(table.insert(), batch)
+                total += len(batch); batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def restore(shards, target, upload_dir, name=None, workers=4, progress=None):
+    # восстанавливает копию name (по умолчанию последнюю): строки таблиц шарда заменяются в одной
+    # транзакции, шарды и файлы восстанавливаются параллельно; хэши файлов проверяются
+    started = time.monotonic()
+    names = list_backups(target)
+    if not names:
+        raise RuntimeError(f'no backups in {target}')
+    name = name or names[-1]
+    if name not in names:
+        raise RuntimeError(f'backup {name} not found; available: {", ".join(names[-5:])}')
+    snap_dir = os.path.join(target, name)
+    with open(os.path.join(snap_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    unknown = set(manifest['shards']) - set(shards.names())
+    if unknown:
+        raise RuntimeError(f'shards missing in config: {", ".join(sorted(unknown))}')
+    store = FileStore(os.path.join(target, 'files'))
+    by_name = {m.__tablename__: m for m in BACKUP_MODELS + DIRECTORY_MODELS}
+
+    def restore_shard(shard):
+        info = manifest['shards'][shard]
+        models = [by_name[t] for t in info['tables']]
+        counts = {}
+        with shards.engine(shard).begin() as conn:
+            # удаление — от зависимых таблиц к students, вставка — в обратном порядке
+            for model in reversed(models):
+                conn.execute(model.__table__.delete())
+            for model in models:
+                t = info['tables'][model.__tablename__]
+                counts[model.__tablename__] = _load_table(conn, model, os.path.join(snap_dir, t['file']), t.get('sha256'))
+                if progress:
+                    progress(f'{shard}.{model.__tablename__}: {counts[model.__tablename__]} rows')
+        return shard, counts
+
+    def restore_file(item):
+        rel, meta = item
+        dst = os.path.join(upload_dir, rel)
+        if os.path.exists(dst) and os.path.getsize(dst) == meta['size'] and _sha256(dst) == meta['sha256']:
+            return False
+        src = store.object_path(meta['sha256'])
+        if _sha256(src) != meta['sha256']:
+            raise RuntimeError(f'{rel}: stored copy is corrupted')
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        shutil.copyfile(src, dst + '.tmp')
+        os.replace(dst + '.tmp', dst)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        file_jobs = [pool.submit(restore_file, item) for item in manifest['files'].items()]
+        rows = dict(pool.map(restore_shard, manifest['shards']))
+        files_written = sum(job.result() for job in file_jobs)
+    shards.reload_map()
+    return {'name': name, 'rows': rows, 'files': len(manifest['files']), 'files_written': files_written,
+            'missing': manifest['missing'], 'elapsed': time.monotonic() - started}
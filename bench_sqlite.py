@@ -0,0 +1,123 @@
+# bench_sqlite.py
+# Нагрузочное сравнение SQLite «как раньше» и режима SQLITE_TUNED: несколько процессов API
+# (как воркеры gunicorn) по несколько потоков, ~80% чтений (ДЗ, оценки, расписание) и ~20% POST ДЗ.
+#   python bench_sqlite.py [--procs 4] [--threads 4] [--seconds 10] [--write-share 0.2]
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+STUDENTS = 200
+PROGRAMS = ('ИВТ', 'ПМИ', 'БИ', 'ФИЗ')
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')
+
+
+def _configure(tmp, tuned):
+    import config
+    config.DATABASE_URL = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    config.DATABASE_REPLICA_URLS = []
+    config.SHARDS = {}
+    config.UPLOAD_DIR = os.path.join(tmp, 'uploads')
+    config.QUERY_STATS_FILE = os.path.join(tmp, 'query_stats.db')
+    config.SQLITE_TUNED = tuned
+
+
+def _seed(tmp, tuned):
+    _configure(tmp, tuned)
+    from db_models import get_shards, get_session, Student, Homework, Grade, ScheduleItem
+    get_shards().init_all()
+    sess = get_session()
+    rnd = random.Random(1)
+    students = [Student(full_name=f'Студент {i}', program=PROGRAMS[i % len(PROGRAMS)], year=1, password_hash='-') for i in range(STUDENTS)]
+    sess.add_all(students)
+    sess.flush()
+    for program in PROGRAMS:
+        for day in DAYS:
+            for pair in range(4):
+                sess.add(ScheduleItem(program=program, week_day=day, time=f'{9 + 2 * pair}:00-{10 + 2 * pair}:30', subject=f'Предмет {pair}'))
+        for i in range(30):
+            sess.add(Homework(program=program, title=f'Задание {i}', description='Описание ' * 10, pushed=1))
+    for st in students:
+        for i in range(10):
+            sess.add(Grade(student_id=st.id, subject=f'Предмет {i % 4}', grade=str(rnd.randint(2, 5))))
+    sess.commit()
+    sess.close()
+
+
+def _worker(tmp, tuned, threads, seconds, write_share, seed, out):
+    _configure(tmp, tuned)
+    import server_api
+    results = []
+
+    def run(n):
+        client = server_api.app.test_client()
+        rnd = random.Random(seed * 100 + n)
+        lat, errors, writes = [], 0, 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            sid = rnd.randint(1, STUDENTS)
+            started = time.perf_counter()
+            try:
+                if rnd.random() < write_share:
+                    writes += 1
+                    resp = client.post(f'/students/{sid}/homework', json={'title': f'bench {seed}-{n}', 'description': 'x' * 200})
+                else:
+                    resp = client.get(f'/students/{sid}/' + rnd.choice(('homework', 'grades', 'schedule')))
+                ok = resp.status_code == 200
+            except Exception:
+                ok = False
+            lat.append(time.perf_counter() - started)
+            errors += not ok
+        results.append((lat, errors, writes))
+
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    out.put(results)
+
+
+def run_mode(tuned, procs, threads, seconds, write_share):
+    tmp = tempfile.mkdtemp(prefix='bench_sqlite_')
+    try:
+        ctx = mp.get_context('spawn')  # каждый процесс импортирует server_api со своими настройками
+        seeder = ctx.Process(target=_seed, args=(tmp, tuned))
+        seeder.start(); seeder.join()
+        out = ctx.Queue()
+        workers = [ctx.Process(target=_worker, args=(tmp, tuned, threads, seconds, write_share, i, out)) for i in range(procs)]
+        for w in workers:
+            w.start()
+        lat, errors, writes = [], 0, 0
+        for _ in workers:
+            for l, e, wr in out.get():
+                lat += l; errors += e; writes += wr
+        for w in workers:
+            w.join()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    lat.sort()
+    p = lambda q: lat[min(len(lat) - 1, int(len(lat) * q))] * 1000 if lat else 0.0
+    label = 'SQLITE_TUNED = True' if tuned else 'SQLITE_TUNED = False'
+    print(f'{label:<22} {len(lat) / seconds:8.0f} запр/с   p50 {p(0.5):7.1f} мс   p95 {p(0.95):7.1f} мс   '
+          f'p99 {p(0.99):7.1f} мс   ошибок {errors} из {len(lat)} (записей {writes})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite benchmark: default vs tuned mode')
+    parser.add_argument('--procs', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-share', type=float, default=0.2)
+    args = parser.parse_args()
+    print(f'{args.procs} процесса x {args.threads} потока, {args.seconds:g} с, доля записей {args.write_share:.0%}')
+    for tuned in (False, True):
+        run_mode(tuned, args.procs, args.threads, args.seconds, args.write_share)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,21 @@
 # client.py
 
+import time
+# точка отсчёта для --profile-startup: до импорта Qt и модулей клиента
+STARTUP_T0 = time.perf_counter()
+STARTUP_MARKS = []
 import sys
 import os
 import json
 import shutil
-import requests
+import tempfile
+import threading
 from datetime import datetime, timedelta, date
 
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QLineEdit, QPushButton,
-    QMessageBox, QTableWidget, QTableWidgetItem, QComboBox, QFileDialog, QSplitter,
+    QMessageBox, QComboBox, QFileDialog, QSplitter,
     QListWidget, QListWidgetItem, QTextEdit, QStackedWidget, QFormLayout, QSizePolicy,
     QCalendarWidget, QCheckBox, QSpinBox, QGroupBox, QGridLayout,
     QSystemTrayIcon, QMenu
@@ -20,14 +25,50 @@ try:
 except Exception:
     from PySide6.QtGui import QAction
 
-from PySide6.QtGui import QPixmap, QTextCharFormat, QBrush, QColor, QIcon
-from PySide6.QtCore import Qt, QTimer, QDate, QPropertyAnimation, QRect
+from PySide6.QtGui import QPixmap, QColor, QIcon
+from PySide6.QtCore import Qt, QTimer, QEvent, Signal
+STARTUP_MARKS.append(("импорт PySide6", time.perf_counter()))
 
 import config
+from client_workers import TaskRunner, StallMonitor
+from client_cache import ClientCache
+from client_outbox import Outbox, PENDING, SENDING, SENT, FAILED
+from client_diff import CollectionDiff, schedule_key
+from client_calendar import DueDateIndex, CalendarHighlighter
+from client_models import ScheduleModel, HomeworkModel, GradesModel, DownloadButtonDelegate, make_table_view
+from client_notify import NotificationCenter
+from client_reminders import ReminderScheduler
+from client_poll import PollScheduler
+from client_avatar import PixmapLRU, fetch_avatar, upload_avatar
+STARTUP_MARKS.append(("импорт модулей клиента", time.perf_counter()))
 
 API = getattr(config, "API_URL", "http://127.0.0.1:5000")
 AVATAR_DIR = getattr(config, "AVATAR_DIR", "avatars")
 SETTINGS_FILE = "settings.json"
+CACHE_FILE = getattr(config, "CLIENT_CACHE_FILE", "client_cache.db")
+
+# одна keep-alive сессия на весь клиент; при серии отказов предохранитель перестаёт слать запросы.
+# requests импортируется около 0,1 с, поэтому клиент создаётся при первом запросе (обычно в потоке пула), а не до первого кадра
+_http = None
+_http_lock = threading.Lock()
+breaker_listeners = []
+
+def _on_breaker_change(state):
+    for fn in breaker_listeners: fn(state)
+
+def http():
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                from client_http import HttpClient, CircuitBreaker
+                _http = HttpClient(API, pool_size=8, retries=getattr(config, "API_RETRIES", 3), timeout=getattr(config, "API_TIMEOUT_SEC", 10),
+                                   breaker=CircuitBreaker(getattr(config, "API_BREAKER_THRESHOLD", 5), getattr(config, "API_BREAKER_RESET_SEC", 30), on_change=_on_breaker_change))
+    return _http
+
+def api_circuit_open():
+    # пока не было ни одного запроса, предохранитель закрыт — клиент ради проверки не создаётся
+    return _http is not None and _http.breaker.state == _http.breaker.OPEN
 
 DEFAULT_SETTINGS = {
     "poll_interval_sec": 60,
@@ -57,42 +98,54 @@ def save_avatar(student_id: int, src_path: str) -> str:
         shutil.copyfile(src_path, dest)
     return dest
 
-def avatar_path(student_id: int):
-    p = os.path.join(ensure_avatar_dir(), f"{student_id}.png")
-    return p if os.path.exists(p) else None
+AVATAR_SIZE = 128  # миниатюра с сервера для метки 100x100
 
-def parse_date_safe(s):
-    if not s:
-        return None
-    try:
-        return datetime.fromisoformat(s)
-    except Exception:
-        for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%d.%m.%Y"):
-            try:
-                return datetime.strptime(s, fmt)
-            except Exception:
-                continue
+def server_avatar_path(student_id: int) -> str:
+    return os.path.join(ensure_avatar_dir(), f"{student_id}_{AVATAR_SIZE}.png")
+
+def avatar_path(student_id: int):
+    # миниатюра с сервера, иначе локальная копия последней загрузки
+    for p in (server_avatar_path(student_id), os.path.join(ensure_avatar_dir(), f"{student_id}.png")):
+        if os.path.exists(p): return p
     return None
 
-def qdate_from_dt(dt: datetime):
-    return QDate(dt.year, dt.month, dt.day)
+def api_get(path, params=None, timeout=10):
+    return http().get(path, params=params, timeout=timeout)
 
-def set_format_for_date(calendar: QCalendarWidget, qdate: QDate, color_hex: str):
-    fmt = QTextCharFormat()
-    fmt.setBackground(QBrush(QColor(color_hex)))
-    calendar.setDateTextFormat(qdate, fmt)
+def api_post_json(path, data, timeout=10):
+    return http().post(path, json=data, timeout=timeout)
 
-def clear_all_formats(calendar: QCalendarWidget):
-    today = date.today()
-    for d in range(-365, 366):
-        dt = today + timedelta(days=d)
-        calendar.setDateTextFormat(QDate(dt.year, dt.month, dt.day), QTextCharFormat())
+def api_fetch_avatar(student_id):
+    return fetch_avatar(http(), student_id, AVATAR_SIZE, server_avatar_path(student_id))
 
-def api_get(path, params=None, timeout=10):
-    return requests.get(API + path, params=params, timeout=timeout)
+def api_upload_avatar(student_id, path):
+    return upload_avatar(http(), student_id, path)
 
-def api_post_json(path, data, timeout=10):
-    return requests.post(API + path, json=data, timeout=timeout)
+def is_network_error(e):
+    # исключение от requests означает, что модуль уже загружен, — импорт здесь ничего не стоит
+    import requests
+    return isinstance(e, requests.RequestException)
+
+class ApiError(Exception):
+    pass
+
+def response_error(r):
+    try: return r.json().get("error", r.text)
+    except Exception: return r.text
+
+def fetch_json(path, params=None, timeout=10):
+    r = api_get(path, params=params, timeout=timeout)
+    if r.status_code != 200:
+        raise ApiError(response_error(r))
+    return r.json()
+
+def fetch_json_optional(path, params=None, timeout=10):
+    # для опроса: ответ не 200 — просто нет данных, сетевые ошибки и «сервер занят» пробрасываются дальше
+    from client_http import ServerBusyError, retry_after
+    r = api_get(path, params=params, timeout=timeout)
+    if r.status_code in http().BUSY_STATUSES:
+        raise ServerBusyError(retry_after(r))
+    return r.json() if r.status_code == 200 else None
 
 
 def load_settings():
@@ -116,101 +169,12 @@ def save_settings(settings):
         print("Failed to save settings:", e)
 
 
-class NotificationPopup(QWidget):
-    PADDING = 12
-    WIDTH = 360
-    HEIGHT = 90
-
-    _active = []
-
-    def __init__(self, title: str, message: str, duration: int = 6, parent=None):
-        super().__init__(parent, Qt.Window | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        self.duration = duration
-        self.title = title
-        self.message = message
-        self._build_ui()
-        self._position()
-        NotificationPopup._active.append(self)
-        self.show()
-        self._animate_in()
-        QTimer.singleShot(self.duration * 1000, self.close_popup)
-
-    def _build_ui(self):
-        self.resize(self.WIDTH, self.HEIGHT)
-        self.main = QVBoxLayout(self)
-        self.main.setContentsMargins(8, 8, 8, 8)
-        container = QWidget(self)
-        container.setStyleSheet("""
-            background: qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:1, stop:0 #ffffff, stop:1 #fff0f6);
-            border: 1px solid #ffd6ea;
-            border-radius: 10px;
-        """)
-        c_layout = QVBoxLayout(container)
-        t = QLabel(self.title)
-        t.setStyleSheet("font-weight:700; color:#ff2e6e;")
-        m = QLabel(self.message)
-        m.setWordWrap(True)
-        m.setStyleSheet("color:#40192a;")
-        c_layout.addWidget(t)
-        c_layout.addWidget(m)
-        self.main.addWidget(container)
-
-    def _position(self):
-        screen = QApplication.primaryScreen()
-        geo = screen.availableGeometry()
-        margin = 16
-        x = geo.x() + geo.width() - self.WIDTH - margin
-        y = geo.y() + geo.height() - self.HEIGHT - margin
-        for p in NotificationPopup._active:
-            if p is self:
-                continue
-            y -= (self.HEIGHT + 10)
-        self.move(x, y)
-
-    def _animate_in(self):
-        screen = QApplication.primaryScreen()
-        geo = screen.availableGeometry()
-        start_x = geo.x() + geo.width() + 10
-        end_x = self.x()
-        y = self.y()
-        self.setGeometry(start_x, y, self.WIDTH, self.HEIGHT)
-        anim = QPropertyAnimation(self, b"geometry")
-        anim.setDuration(260)
-        anim.setStartValue(QRect(start_x, y, self.WIDTH, self.HEIGHT))
-        anim.setEndValue(QRect(end_x, y, self.WIDTH, self.HEIGHT))
-        anim.start()
-        self._anim = anim
-
-    def close_popup(self):
-        try:
-            if self in NotificationPopup._active:
-                NotificationPopup._active.remove(self)
-        except Exception:
-            pass
-        self.close()
-        for p in NotificationPopup._active:
-            p._reposition_after_close()
-
-    def _reposition_after_close(self):
-        screen = QApplication.primaryScreen()
-        geo = screen.availableGeometry()
-        margin = 16
-        target_x = geo.x() + geo.width() - self.WIDTH - margin
-        idx = NotificationPopup._active.index(self)
-        target_y = geo.y() + geo.height() - self.HEIGHT - margin - idx * (self.HEIGHT + 10)
-        anim = QPropertyAnimation(self, b"geometry")
-        anim.setDuration(240)
-        anim.setStartValue(self.geometry())
-        anim.setEndValue(QRect(target_x, target_y, self.WIDTH, self.HEIGHT))
-        anim.start()
-        self._anim = anim
-
-
 class LoginRegisterWidget(QWidget):
-    def __init__(self, on_success):
+    def __init__(self, on_success, runner, cache):
         super().__init__()
         self.on_success = on_success
+        self.runner = runner
+        self.cache = cache
         self._build_ui()
 
     def _build_ui(self):
@@ -228,7 +192,7 @@ class LoginRegisterWidget(QWidget):
         layout.addWidget(title)
 
         form = QFormLayout()
-        self.input_name = QLineEdit(); self.input_name.setPlaceholderText("Иванов Иван Иванович")
+        self.input_name = QLineEdit(); self.input_name.setPlaceholderText("Иванов Иван Иванович"); self.input_name.setText(self.cache.last_login_name() or "")
         self.input_pass = QLineEdit(); self.input_pass.setEchoMode(QLineEdit.Password); self.input_pass.setPlaceholderText("Пароль")
         form.addRow("ФИО:", self.input_name); form.addRow("Пароль:", self.input_pass)
         layout.addLayout(form)
@@ -248,42 +212,64 @@ class LoginRegisterWidget(QWidget):
         name = self.input_name.text().strip(); pwd = self.input_pass.text().strip()
         if not name or not pwd:
             QMessageBox.warning(self, "Ошибка", "Введите ФИО и пароль"); return
-        try:
-            resp = api_post_json("/login", {"full_name": name, "password": pwd})
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка сети", str(e)); return
+        self.runner.submit(api_post_json, "/login", {"full_name": name, "password": pwd}, group="auth",
+                           on_done=lambda resp: self._on_login_response(name, pwd, resp),
+                           on_error=lambda e: self._on_login_error(name, pwd, e))
+
+    def _on_login_response(self, name, pwd, resp):
         if resp.status_code == 200:
-            data = resp.json(); self.on_success(data.get("id"), data.get("full_name"))
+            data = resp.json()
+            self.runner.submit(self.cache.remember_login, name, pwd, data.get("id"), data.get("full_name"), group="login_cache",
+                               on_error=lambda e: print("login cache error:", e))
+            self.on_success(data.get("id"), data.get("full_name"))
         else:
-            try: err = resp.json().get("error", resp.text)
-            except Exception: err = resp.text
-            QMessageBox.warning(self, "Ошибка", err)
+            QMessageBox.warning(self, "Ошибка", response_error(resp))
+
+    def _on_login_error(self, name, pwd, e):
+        # без сети можно открыть последние сохранённые данные, если пароль совпадает с последним входом
+        if not is_network_error(e):
+            self._on_network_error(e); return
+        self.runner.submit(self.cache.check_offline_login, name, pwd, group="auth",
+                           on_done=lambda account: self._offer_offline(account, e), on_error=lambda _: self._on_network_error(e))
+
+    def _offer_offline(self, account, e):
+        if not account:
+            self._on_network_error(e); return
+        if QMessageBox.question(self, "Нет связи", f"Сервер недоступен ({e}).\nОткрыть сохранённые данные (только чтение)?") == QMessageBox.Yes:
+            self.on_success(account[0], account[1], offline=True)
+
+    def _on_network_error(self, e):
+        QMessageBox.critical(self, "Ошибка сети", str(e))
 
     def on_register(self):
         name = self.input_name.text().strip(); pwd = self.input_pass.text().strip()
         program = self.combo_program.currentText(); year = int(self.combo_year.currentText())
         if not name or not pwd:
             QMessageBox.warning(self, "Ошибка", "Введите ФИО и пароль для регистрации"); return
-        try:
-            resp = api_post_json("/register", {"full_name": name, "program": program, "year": year, "password": pwd})
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка сети", str(e)); return
+        self.runner.submit(api_post_json, "/register", {"full_name": name, "program": program, "year": year, "password": pwd}, group="auth",
+                           on_done=self._on_register_response, on_error=self._on_network_error)
+
+    def _on_register_response(self, resp):
         if resp.status_code == 200:
             data = resp.json(); QMessageBox.information(self, "Успех", f"Зарегистрировано id={data.get('id')}")
         else:
-            try: err = resp.json().get("error", resp.text)
-            except Exception: err = resp.text
-            QMessageBox.warning(self, "Ошибка", err)
+            QMessageBox.warning(self, "Ошибка", response_error(resp))
 
 
 class MainWindow(QWidget):
-    def __init__(self):
+    api_state_changed = Signal(str)
+
+    def __init__(self, profiler=None):
         super().__init__()
+        self.profiler = profiler
         self.student_id = None
         self.full_name = None
         self.program = None
         self.year = None
 
+        self.due_index = DueDateIndex()
+        # напоминания за сутки до срока: куча сроков и один таймер; показанные помнятся между запусками
+        self.reminders = ReminderScheduler(CACHE_FILE, self._on_reminder, parent=self)
         self.homework_list = []
         self.schedule_list = []
         self.grades_list = []
@@ -291,23 +277,40 @@ class MainWindow(QWidget):
         self.attachment_to_send = None
 
         self.settings = load_settings()
-
-        self.poll_timer = QTimer(self)
-        self.poll_timer.timeout.connect(self.poll_updates)
-
-        self._snapshot = {"homework": "", "schedule": "", "grades": ""}
-        self._prev_snapshot = {"homework": "", "schedule": "", "grades": ""}
-
-        self._first_seed_done = False
+        self.pixmaps = PixmapLRU()
+
+        # вся сеть — в пуле потоков; монитор замеряет, насколько GUI-поток не успевает за кадром
+        self.runner = TaskRunner(self)
+        self.stall_monitor = StallMonitor(self); self.stall_monitor.start()
+        self._api_ok = None
+        # кэш на диске: после входа данные показываются сразу, без сети — только чтение
+        self.cache = ClientCache(CACHE_FILE)
+        self.outbox = Outbox(CACHE_FILE)
+        self._offline = False
+        self._from_cache = False
+        self._data_at = None
+        # предохранитель переключается в потоке пула — в GUI-поток состояние приходит через сигнал
+        self.api_state_changed.connect(self._on_api_state)
+        breaker_listeners.append(self.api_state_changed.emit)
+
+        # опрос реже, пока окно скрыто или сервер недоступен, и чаще сразу после отправки ДЗ
+        self.poller = PollScheduler(self.poll_updates, hidden_factor=getattr(config, "POLL_HIDDEN_FACTOR", 5), boost_interval=getattr(config, "POLL_BOOST_SEC", 5),
+                                    boost_window=getattr(config, "POLL_BOOST_WINDOW_SEC", 60), max_backoff=getattr(config, "POLL_MAX_BACKOFF_SEC", 600), parent=self)
+        # уведомления за полторы секунды сворачиваются по категориям, звук — один на пачку
+        self.notifier = NotificationCenter(duration=self.settings.get("notification_duration_sec", 6), on_flush=self._play_sound, parent=self)
+
+        # по чему опрос определяет, что изменилось с прошлого ответа сервера
+        self.diffs = {"homework": CollectionDiff(), "schedule": CollectionDiff(key=schedule_key), "grades": CollectionDiff()}
 
         self.tray = None
 
         self._build_ui()
-        self.login_widget = LoginRegisterWidget(self.on_logged_in)
+        self.login_widget = LoginRegisterWidget(self.on_logged_in, self.runner, self.cache)
         self.show_login_dialog()
 
+        # трей не нужен для первого кадра — создаётся, когда цикл событий уже запущен
         if self.settings.get("enable_tray", True):
-            self._init_tray()
+            QTimer.singleShot(0, self._init_tray)
 
     def _build_ui(self):
         self.setWindowTitle("ЛК Студента")
@@ -319,7 +322,7 @@ class MainWindow(QWidget):
             QLabel#title { font-size:18px; font-weight:700; color:#ff3d7a; }
             QPushButton { background: #ff8fb6; color: white; border-radius:8px; padding:8px; }
             QLineEdit { background: #fff6fb; border:1px solid #ffd6ea; padding:6px; border-radius:6px; }
-            QTableWidget { background: white; border-radius:8px; }
+            QTableView { background: white; border-radius:8px; }
             QHeaderView::section { background: #ffd6ea; padding:6px; border: none; }
         """)
 
@@ -356,35 +359,73 @@ class MainWindow(QWidget):
         ov_layout.addWidget(lbl); ov_layout.addLayout(status_h); ov_layout.addWidget(self.overview_text); ov_layout.addWidget(self.overview_details); ov_layout.addStretch(1)
         self.stack.addWidget(page_overview)
 
+        # остальные страницы строятся при первом переходе на них: до входа нужна только страница «Обзор»
+        self._page_builders = {"Календарь": self._build_calendar_page, "Расписание": self._build_schedule_page, "Домашние задания": self._build_homework_page,
+                               "Оценки": self._build_grades_page, "Настройки": self._build_settings_page}
+        self._built_pages = {"Обзор"}
+        for _ in self._page_builders: self.stack.addWidget(QWidget())
+        # модели живут с окна: данные приходят в них и до того, как страница построена
+        self.schedule_model = ScheduleModel(self); self.hw_model = HomeworkModel(self); self.grades_model = GradesModel(self); self._hw_showing_search = False
+
+        self.nav.setCurrentRow(0); self.stack.setCurrentIndex(0)
+
+    def _ensure_page(self, idx):
+        name = self.nav.item(idx).text()
+        if name in self._built_pages: return
+        self._built_pages.add(name)
+        placeholder = self.stack.widget(idx)
+        self.stack.insertWidget(idx, self._page_builders[name]())
+        self.stack.removeWidget(placeholder); placeholder.deleteLater()
+
+    def _page(self, name):
+        return name in self._built_pages
+
+    def _build_calendar_page(self):
         page_calendar = QWidget(); cal_layout = QHBoxLayout(page_calendar)
-        left_cal = QVBoxLayout(); self.calendar = QCalendarWidget(); self.calendar.setGridVisible(True); self.calendar.selectionChanged.connect(self.on_calendar_selected); left_cal.addWidget(self.calendar); cal_layout.addLayout(left_cal,1)
-        right_cal = QVBoxLayout(); lbl_day = QLabel("События на выбранную дату:"); self.list_day = QListWidget(); right_cal.addWidget(lbl_day); right_cal.addWidget(self.list_day); cal_layout.addLayout(right_cal,1); self.stack.addWidget(page_calendar)
+        left_cal = QVBoxLayout(); self.calendar = QCalendarWidget(); self.calendar.setGridVisible(True); self.calendar_highlighter = CalendarHighlighter(self.calendar); self.calendar.selectionChanged.connect(self.on_calendar_selected); left_cal.addWidget(self.calendar); cal_layout.addLayout(left_cal,1)
+        right_cal = QVBoxLayout(); lbl_day = QLabel("События на выбранную дату:"); self.list_day = QListWidget(); right_cal.addWidget(lbl_day); right_cal.addWidget(self.list_day); cal_layout.addLayout(right_cal,1)
+        self.highlight_calendar_dates()
+        return page_calendar
 
+    def _build_schedule_page(self):
         page_schedule = QWidget(); sch_layout = QVBoxLayout(page_schedule)
         top_controls = QHBoxLayout(); top_controls.addWidget(QLabel("Показать день:"))
         self.combo_day = QComboBox(); self.combo_day.addItems(["Все", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
         top_controls.addWidget(self.combo_day); btn_filter = QPushButton("Загрузить"); btn_filter.clicked.connect(self.load_schedule); top_controls.addWidget(btn_filter); top_controls.addStretch()
         sch_layout.addLayout(top_controls)
-        self.tbl_schedule = QTableWidget(0,4); self.tbl_schedule.setHorizontalHeaderLabels(["День","Время","Предмет","Аудитория/Преподаватель"]); sch_layout.addWidget(self.tbl_schedule); self.stack.addWidget(page_schedule)
+        self.tbl_schedule = make_table_view(self.schedule_model); self.tbl_schedule.resizeColumnsToContents(); sch_layout.addWidget(self.tbl_schedule)
+        return page_schedule
 
+    def _build_homework_page(self):
         page_hw = QWidget(); hw_layout = QVBoxLayout(page_hw)
         hw_top = QHBoxLayout(); self.hw_search = QLineEdit(); self.hw_search.setPlaceholderText("Поиск по заголовку или описанию..."); self.hw_search.textChanged.connect(self.filter_homework_local)
+        self.hw_search_timer = QTimer(self); self.hw_search_timer.setSingleShot(True); self.hw_search_timer.setInterval(300); self.hw_search_timer.timeout.connect(self.search_homework_server)
         hw_top.addWidget(self.hw_search); btn_refresh_hw = QPushButton("Обновить"); btn_refresh_hw.clicked.connect(self.load_homework); hw_top.addWidget(btn_refresh_hw); hw_layout.addLayout(hw_top)
-        self.tbl_hw = QTableWidget(0,5); self.tbl_hw.setHorizontalHeaderLabels(["ID","Заголовок","Описание","Срок","Файл"]); hw_layout.addWidget(self.tbl_hw)
+        self.tbl_hw = make_table_view(self.hw_model); self.tbl_hw.resizeColumnsToContents()
+        self.hw_download_delegate = DownloadButtonDelegate(self.tbl_hw); self.hw_download_delegate.clicked.connect(lambda row: self.download_attachment(row.get("id")))
+        self.tbl_hw.setItemDelegateForColumn(HomeworkModel.ATTACHMENT_COLUMN, self.hw_download_delegate); hw_layout.addWidget(self.tbl_hw)
         push_box = QHBoxLayout(); self.input_hw_title = QLineEdit(); self.input_hw_title.setPlaceholderText("Заголовок")
         self.input_hw_desc = QLineEdit(); self.input_hw_desc.setPlaceholderText("Описание")
         self.input_hw_due = QLineEdit(); self.input_hw_due.setPlaceholderText("Срок YYYY-MM-DD")
         self.lbl_attach = QLineEdit(); self.lbl_attach.setReadOnly(True)
         btn_attach = QPushButton("Прикрепить файл"); btn_attach.clicked.connect(self.attach_file)
-        btn_send = QPushButton("Отправить ДЗ"); btn_send.clicked.connect(self.push_homework)
+        self.btn_send_hw = QPushButton("Отправить ДЗ"); self.btn_send_hw.clicked.connect(self.push_homework)
         push_box.addWidget(self.input_hw_title); push_box.addWidget(self.input_hw_desc); push_box.addWidget(self.input_hw_due)
-        push_box.addWidget(self.lbl_attach); push_box.addWidget(btn_attach); push_box.addWidget(btn_send)
-        hw_layout.addLayout(push_box); self.stack.addWidget(page_hw)
-
+        push_box.addWidget(self.lbl_attach); push_box.addWidget(btn_attach); push_box.addWidget(self.btn_send_hw)
+        outbox_h = QHBoxLayout(); outbox_h.addWidget(QLabel("Очередь отправки:")); outbox_h.addStretch(1)
+        btn_retry = QPushButton("Повторить ошибочные"); btn_retry.clicked.connect(self.retry_failed_outbox); outbox_h.addWidget(btn_retry)
+        self.list_outbox = QListWidget(); self.list_outbox.setMaximumHeight(110)
+        hw_layout.addLayout(push_box); hw_layout.addLayout(outbox_h); hw_layout.addWidget(self.list_outbox)
+        self._set_send_tooltip(); self._refresh_outbox_view()
+        return page_hw
+
+    def _build_grades_page(self):
         page_gr = QWidget(); gr_layout = QVBoxLayout(page_gr)
-        self.tbl_gr = QTableWidget(0,3); self.tbl_gr.setHorizontalHeaderLabels(["Предмет","Оценка","Комментарий"]); gr_layout.addWidget(self.tbl_gr)
-        btn_refresh_gr = QPushButton("Обновить оценки"); btn_refresh_gr.clicked.connect(self.load_grades); gr_layout.addWidget(btn_refresh_gr); self.stack.addWidget(page_gr)
+        self.tbl_gr = make_table_view(self.grades_model); self.tbl_gr.resizeColumnsToContents(); gr_layout.addWidget(self.tbl_gr)
+        btn_refresh_gr = QPushButton("Обновить оценки"); btn_refresh_gr.clicked.connect(self.load_grades); gr_layout.addWidget(btn_refresh_gr)
+        return page_gr
 
+    def _build_settings_page(self):
         page_set = QWidget(); set_layout = QVBoxLayout(page_set)
         set_layout.addWidget(QLabel("Настройки приложения"))
         grp = QGroupBox("Опрос сервера и уведомления"); g_l = QGridLayout()
@@ -407,9 +448,7 @@ class MainWindow(QWidget):
         btn_reset_set = QPushButton("Восстановить по умолчанию"); btn_reset_set.clicked.connect(self.reset_settings)
         btn_row.addWidget(btn_save_set); btn_row.addWidget(btn_reset_set); btn_row.addStretch()
         set_layout.addLayout(btn_row); set_layout.addStretch(1)
-        self.stack.addWidget(page_set)
-
-        self.nav.setCurrentRow(0); self.stack.setCurrentIndex(0)
+        return page_set
 
 
     def _init_tray(self):
@@ -452,7 +491,8 @@ class MainWindow(QWidget):
         layout = QVBoxLayout(dlg); layout.addWidget(self.login_widget); dlg.setFixedSize(480, 340)
         dlg.move(self.geometry().center() - dlg.rect().center()); dlg.show(); self._login_dialog = dlg
 
-    def on_logged_in(self, student_id, full_name):
+    def on_logged_in(self, student_id, full_name, offline=False):
+        if self.profiler: self.profiler.logged_in()
         self.student_id = student_id; self.full_name = full_name
         self.name_label.setText(full_name); self.small_label.setText("Студент")
         self.btn_logout.setVisible(True); self.btn_upload_avatar.setVisible(True)
@@ -461,12 +501,13 @@ class MainWindow(QWidget):
                 self._login_dialog.close()
         except Exception:
             pass
-        # initial load
-        self.load_homework(); self.load_schedule(); self.load_grades(); self.update_profile(); self.highlight_calendar_dates(); self.update_overview()
-        self._snapshot["homework"] = json.dumps(self.homework_list, sort_keys=True, ensure_ascii=False)
-        self._snapshot["schedule"] = json.dumps(self.schedule_list, sort_keys=True, ensure_ascii=False)
-        self._snapshot["grades"] = json.dumps(self.grades_list, sort_keys=True, ensure_ascii=False)
-        self._first_seed_done = True
+        self.reminders.set_student(student_id)
+        self._restore_from_cache()
+        self._set_offline(offline)
+        self._refresh_outbox_view()
+        # initial load: запросы уходят параллельно, первый ответ сервера только запоминает состояние без уведомлений
+        for d in self.diffs.values(): d.reset()
+        self.load_homework(); self.load_schedule(); self.load_grades(); self.update_profile(); self.update_overview()
         if self.settings.get("auto_poll_after_login", True):
             self.start_polling()
         if self.settings.get("enable_tray", True) and not self.tray:
@@ -474,8 +515,11 @@ class MainWindow(QWidget):
 
     def logout(self):
         self.stop_polling()
+        self.runner.cancel(); self._api_ok = None; self.outbox.requeue_inflight(); self.notifier.clear()
         self.student_id = None; self.full_name = None; self.program = None; self.year = None
-        self.homework_list = []; self.schedule_list = []; self.grades_list = []
+        self.reminders.set_student(None); self.homework_list = []; self.schedule_list = []; self.grades_list = []; self.highlight_calendar_dates()
+        self._set_offline(False); self._from_cache = False; self._data_at = None; self.lbl_last_update.setText("Последнее обновление: —")
+        self._refresh_outbox_view()
         self.avatar_label.clear(); self.name_label.setText("Не авторизован"); self.small_label.setText("")
         self.btn_logout.setVisible(False); self.btn_upload_avatar.setVisible(False)
         QMessageBox.information(self, "Выход", "Вы вышли из аккаунта.")
@@ -483,41 +527,46 @@ class MainWindow(QWidget):
 
 
     def on_nav_changed(self, idx):
+        self._ensure_page(idx)
         self.stack.setCurrentIndex(idx)
+        # ответы на загрузки, начатые для прошлой страницы, больше не нужны
+        self.runner.cancel("nav")
         page = self.nav.currentItem().text()
         if page == "Календарь": self.on_calendar_selected()
-        elif page == "Расписание": self.load_schedule()
-        elif page == "Домашние задания": self.load_homework()
-        elif page == "Оценки": self.load_grades()
+        elif page == "Расписание": self._load_schedule("nav")
+        elif page == "Домашние задания": self._load_homework("nav")
+        elif page == "Оценки": self._load_grades("nav")
         elif page == "Обзор": self.update_overview()
 
 
     def update_profile(self):
         if not self.student_id: return
-        try:
-            r = api_get(f"/students/{self.student_id}/homework")
-            if r.status_code == 200:
-                arr = r.json()
-                for h in arr:
-                    prog = h.get("program")
-                    if prog:
-                        self.program = prog; break
-            if not self.program:
-                r2 = api_get(f"/students/{self.student_id}/schedule")
-                if r2.status_code == 200:
-                    arr2 = r2.json()
-                    if arr2:
-                        self.program = arr2[0].get("subject", "")
-        except Exception:
-            pass
+        self.runner.submit(self._fetch_program, self.student_id, group="profile",
+                           on_done=self._apply_profile, on_error=lambda e: self._apply_profile(None))
+        self.runner.submit(api_fetch_avatar, self.student_id, group="avatar",
+                           on_done=lambda p: self._show_avatar(), on_error=lambda e: print("avatar fetch error:", e))
+
+    def _show_avatar(self):
+        av = avatar_path(self.student_id) if self.student_id else None
+        pix = self.pixmaps.get(av, 100) if av else None
+        if pix: self.avatar_label.setPixmap(pix)
+
+    @staticmethod
+    def _fetch_program(student_id):
+        arr = fetch_json_optional(f"/students/{student_id}/homework") or []
+        for h in arr:
+            if h.get("program"): return h.get("program")
+        arr2 = fetch_json_optional(f"/students/{student_id}/schedule") or []
+        return arr2[0].get("subject", "") if arr2 else None
+
+    def _apply_profile(self, program):
+        if not self.student_id: return
+        if program: self.program = program
         info = []
         if self.program: info.append(f"Направление: {self.program}")
         if self.year: info.append(f"Курс: {self.year}")
         self.small_label.setText(" • ".join(info))
-        av = avatar_path(self.student_id)
-        if av:
-            pix = QPixmap(av).scaled(100,100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.avatar_label.setPixmap(pix)
+        self._show_avatar()
 
     def upload_avatar(self):
         if not self.student_id:
@@ -525,73 +574,140 @@ class MainWindow(QWidget):
         path, _ = QFileDialog.getOpenFileName(self, "Выберите изображение для аватара", filter="Images (*.png *.jpg *.jpeg)")
         if not path: return
         dest = save_avatar(self.student_id, path)
-        pix = QPixmap(dest).scaled(100,100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.avatar_label.setPixmap(pix)
-        QMessageBox.information(self, "Успех", f"Аватар сохранён локально: {dest}")
+        # прежняя миниатюра с сервера устарела — до ответа показывается локальная копия
+        for p in (server_avatar_path(self.student_id), server_avatar_path(self.student_id) + ".etag"):
+            if os.path.exists(p): os.remove(p)
+        self._show_avatar()
+        self.runner.submit(api_upload_avatar, self.student_id, dest, group="avatar",
+                           on_done=lambda r, dest=dest: self._on_avatar_uploaded(dest, r), on_error=lambda e, dest=dest: self._on_avatar_uploaded(dest, e))
+
+    def _on_avatar_uploaded(self, dest, r):
+        if isinstance(r, Exception) or r.status_code not in (200, 202):
+            QMessageBox.warning(self, "Аватар", f"Аватар сохранён локально ({dest}), но не отправлен на сервер: {r if isinstance(r, Exception) else response_error(r)}"); return
+        self.update_profile()
+        QMessageBox.information(self, "Успех", "Аватар загружен на сервер.")
 
 
     def load_schedule(self):
+        self._load_schedule("schedule")
+
+    def _load_schedule(self, group):
         if not self.student_id:
             QMessageBox.warning(self, "Ошибка", "Нужно войти."); return
-        day = self.combo_day.currentText(); params = None if day == "Все" else {"day": day}
-        try:
-            r = api_get(f"/students/{self.student_id}/schedule", params=params)
-            if r.status_code != 200:
-                QMessageBox.warning(self, "Ошибка", r.text); return
-            data = r.json(); self.schedule_list = data
-            self.tbl_schedule.setRowCount(0)
-            for it in data:
-                row = self.tbl_schedule.rowCount(); self.tbl_schedule.insertRow(row)
-                self.tbl_schedule.setItem(row, 0, QTableWidgetItem(it.get("week_day",""))); self.tbl_schedule.setItem(row, 1, QTableWidgetItem(it.get("time","")))
-                self.tbl_schedule.setItem(row, 2, QTableWidgetItem(it.get("subject",""))); self.tbl_schedule.setItem(row, 3, QTableWidgetItem((it.get("classroom","") or "") + " / " + (it.get("teacher","") or "")))
-            self._snapshot["schedule"] = json.dumps(self.schedule_list, sort_keys=True, ensure_ascii=False)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", str(e))
+        day = self.combo_day.currentText() if self._page("Расписание") else "Все"; params = None if day == "Все" else {"day": day}
+        self.runner.submit(fetch_json, f"/students/{self.student_id}/schedule", params, group=group,
+                           on_done=lambda data: self._apply_schedule(data, store=params is None), on_error=lambda e: self._on_load_error("расписание", e))
+
+    def _apply_schedule(self, data, store=True):
+        if self.profiler: self.profiler.first_data("сервер" if store else "кэш")
+        self.schedule_list = data
+        if store: self._store_cache("schedule", data)
+        self.schedule_model.set_rows(data)
+        if self._page("Расписание"): self.tbl_schedule.resizeColumnsToContents()
+        if store: self.diffs["schedule"].update(data)
+        self._refresh_overview_if_visible()
+
+    def _on_load_error(self, what, e):
+        # сетевые сбои показывает строка статуса API, окно — только если сервер ответил ошибкой
+        if is_network_error(e):
+            print(f"load {what} error:", e); return
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить {what}: {e}")
+
+    def _on_api_state(self, state):
+        from client_http import CircuitBreaker
+        if state == CircuitBreaker.OPEN:
+            self.lbl_api_status.setText(f"API: Недоступно (повтор через {http().breaker.reset_timeout} с)")
+        elif state == CircuitBreaker.HALF_OPEN:
+            self.lbl_api_status.setText("API: Проверка...")
+        else:
+            self.lbl_api_status.setText("API: Доступно")
+        ok = None if state == CircuitBreaker.HALF_OPEN else state == CircuitBreaker.CLOSED
+        if ok is not None:
+            if self.student_id: self._set_offline(not ok)
+            self._on_probe(ok)
+
+    def _restore_from_cache(self):
+        oldest = None
+        for kind, apply in (("homework", self._apply_homework), ("schedule", self._apply_schedule), ("grades", self._apply_grades)):
+            data, fetched_at = self.cache.load(self.student_id, kind)
+            if data is None: continue
+            apply(data, store=False)
+            oldest = fetched_at if oldest is None else min(oldest, fetched_at)
+        self._from_cache = oldest is not None; self._data_at = oldest
+        self._update_freshness()
+
+    def _store_cache(self, kind, data):
+        # ответ сервера пришёл — сохраняем его и считаем данные свежими
+        if not self.student_id: return
+        self._data_at = self.cache.store(self.student_id, kind, data); self._from_cache = False
+        self._set_offline(False)
+
+    def _set_offline(self, offline):
+        self._offline = offline
+        self._set_send_tooltip()
+        self._update_freshness()
+        if not offline: self._flush_outbox()
+
+    def _set_send_tooltip(self):
+        if self._page("Домашние задания"):
+            self.btn_send_hw.setToolTip("Нет связи с сервером — задание встанет в очередь и уйдёт позже" if self._offline else "")
+
+    def _update_freshness(self):
+        if not self._data_at:
+            text = "Последнее обновление: —"
+        else:
+            stamp = datetime.fromtimestamp(self._data_at).strftime("%Y-%m-%d %H:%M:%S")
+            if self._from_cache or self._offline:
+                mins = int((time.time() - self._data_at) // 60)
+                text = f"Данные из кэша от {stamp} ({mins} мин назад)"
+            else:
+                text = f"Последнее обновление: {stamp}"
+        if self._offline: text += " — офлайн, ДЗ отправятся из очереди"
+        self.lbl_last_update.setText(text)
+
+    def _refresh_overview_if_visible(self):
+        if self.student_id and self.stack.currentIndex() == 0: self._render_overview()
 
 
     def load_homework(self):
+        self._load_homework("homework")
+
+    def _load_homework(self, group):
         if not self.student_id: return
-        try:
-            r = api_get(f"/students/{self.student_id}/homework")
-            if r.status_code != 200: return
-            data = r.json(); self.homework_list = data; self.populate_homework_table(data); self.highlight_calendar_dates()
-            self._snapshot["homework"] = json.dumps(self.homework_list, sort_keys=True, ensure_ascii=False)
-        except Exception as e:
-            print("load_homework error:", e)
-
-    def populate_homework_table(self, data):
-        self.tbl_hw.setRowCount(0)
-        query = self.hw_search.text().lower().strip() if hasattr(self, "hw_search") else ""
-        now = datetime.now()
-        for h in data:
-            title = (h.get("title") or ""); desc = (h.get("description") or "")
-            if query and (query not in title.lower() and query not in desc.lower()): continue
-            row = self.tbl_hw.rowCount(); self.tbl_hw.insertRow(row)
-            self.tbl_hw.setItem(row, 0, QTableWidgetItem(str(h.get("id",""))))
-            self.tbl_hw.setItem(row, 1, QTableWidgetItem(title)); self.tbl_hw.setItem(row, 2, QTableWidgetItem(desc))
-            due_dt = parse_date_safe(h.get("due_date")); due_text = due_dt.strftime("%Y-%m-%d %H:%M") if due_dt else (h.get("due_date") or "")
-            self.tbl_hw.setItem(row, 3, QTableWidgetItem(due_text))
-            att = h.get("attachment") or ""
-            if att:
-                btn = QPushButton("Скачать"); hid = h.get("id"); btn.clicked.connect(lambda _, hid=hid: self.download_attachment(hid)); self.tbl_hw.setCellWidget(row, 4, btn)
-            else:
-                self.tbl_hw.setItem(row, 4, QTableWidgetItem(""))
-
-            if due_dt:
-                if due_dt < now: color = "#ffd6da"
-                elif due_dt <= now + timedelta(hours=24): color = "#fff0d6"
-                else: color = "#ecffd9"
-                for col in range(5):
-                    item = self.tbl_hw.item(row, col)
-                    if item: item.setBackground(QBrush(QColor(color)))
-                    else:
-                        w = self.tbl_hw.cellWidget(row, col)
-                        if w: w.setStyleSheet(f"background:{color}; border-radius:6px;")
+        self.runner.submit(fetch_json, f"/students/{self.student_id}/homework", group=group,
+                           on_done=self._apply_homework, on_error=lambda e: self._on_load_error("ДЗ", e))
+
+    def _apply_homework(self, data, store=True):
+        if self.profiler: self.profiler.first_data("сервер" if store else "кэш")
+        if store: self._store_cache("homework", data)
+        self.homework_list = data; self.populate_homework_table(data); self.highlight_calendar_dates()
+        if store: self.diffs["homework"].update(data)
+        self._refresh_overview_if_visible()
+
+    def populate_homework_table(self, data, local_filter=True):
+        # модель только запоминает список; ячейки строятся представлением для видимых строк
+        self.hw_model.set_rows(data); self._hw_showing_search = not local_filter
+        if not self._page("Домашние задания"): return
+        self.hw_model.set_filter(self.hw_search.text() if local_filter else "")
         self.tbl_hw.resizeColumnsToContents()
 
     def filter_homework_local(self):
-        if hasattr(self, "homework_list"):
+        # локальный фильтр — сразу через прокси, поиск на сервере — после паузы во вводе
+        if self._hw_showing_search:
             self.populate_homework_table(self.homework_list)
+        else:
+            self.hw_model.set_filter(self.hw_search.text())
+        self.hw_search_timer.start()
+
+    def search_homework_server(self):
+        query = self.hw_search.text().strip()
+        # предыдущий поиск по старому тексту больше не нужен
+        self.runner.cancel("search")
+        if not query or not self.student_id:
+            self.populate_homework_table(self.homework_list); return
+        self.runner.submit(fetch_json, "/search", {"q": query, "student_id": self.student_id, "per_page": 100}, group="search",
+                           on_done=lambda data: self.populate_homework_table(data.get("items", []), local_filter=False),
+                           on_error=lambda e: self.populate_homework_table(self.homework_list))
 
     def attach_file(self):
         path, _ = QFileDialog.getOpenFileName(self, "Прикрепить файл")
@@ -604,115 +720,195 @@ class MainWindow(QWidget):
         title = self.input_hw_title.text().strip(); desc = self.input_hw_desc.text().strip(); due = self.input_hw_due.text().strip()
         if not title:
             QMessageBox.warning(self, "Ошибка", "Введите заголовок"); return
-        try:
-            if hasattr(self, "attachment_to_send") and self.attachment_to_send and os.path.exists(self.attachment_to_send):
-                with open(self.attachment_to_send, "rb") as f:
-                    files = {"file": f}; data = {"title": title, "description": desc, "due_date": due}
-                    r = requests.post(f"{API}/students/{self.student_id}/homework", data=data, files=files, timeout=30)
-            else:
-                r = requests.post(f"{API}/students/{self.student_id}/homework", json={"title": title, "description": desc, "due_date": due}, timeout=20)
-            if r.status_code == 200:
-                QMessageBox.information(self, "Успех", "Задание отправлено"); self.input_hw_title.clear(); self.input_hw_desc.clear(); self.input_hw_due.clear(); self.lbl_attach.clear(); self.attachment_to_send = None
-                self.load_homework(); self.update_overview()
-            else:
-                try: err = r.json().get("error", r.text)
-                except Exception: err = r.text
-                QMessageBox.warning(self, "Ошибка", err)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка сети", str(e))
+        attachment = self.attachment_to_send if self.attachment_to_send and os.path.exists(self.attachment_to_send) else None
+        # сначала запись в очередь на диске: без сети или при закрытии клиента задание не потеряется
+        self.outbox.enqueue(self.student_id, title, desc, due, attachment)
+        self.input_hw_title.clear(); self.input_hw_desc.clear(); self.input_hw_due.clear(); self.lbl_attach.clear(); self.attachment_to_send = None
+        self._refresh_outbox_view()
+        self._flush_outbox()
+
+    def _flush_outbox(self):
+        # по одному заданию за раз, в порядке постановки в очередь
+        if not self.student_id or self.runner.busy("outbox") or api_circuit_open():
+            return
+        item = self.outbox.next_pending(self.student_id)
+        if not item: return
+        if item["attachment"] and not os.path.exists(item["attachment"]):
+            self.outbox.mark_failed(item["id"], f"файл не найден: {item['attachment']}")
+            self._refresh_outbox_view(); self._flush_outbox(); return
+        self.outbox.mark_sending(item["id"]); self._refresh_outbox_view()
+        self.runner.submit(self._post_homework, self.student_id, item, group="outbox",
+                           on_done=lambda r: self._on_homework_pushed(item, r), on_error=lambda e: self._on_push_error(item, e))
+
+    @staticmethod
+    def _post_homework(student_id, item):
+        # с ключом идемпотентности POST можно безопасно повторять — сервер не создаст дубликат
+        data = {"title": item["title"], "description": item["description"], "due_date": item["due_date"]}
+        headers = {"Idempotency-Key": item["key"]}
+        if item["attachment"]:
+            with open(item["attachment"], "rb") as f:
+                # файл нельзя перечитать при повторе внутри одного вызова — повтор сделает следующий проход очереди
+                return http().post(f"/students/{student_id}/homework", data=data, files={"file": f}, headers=headers, timeout=30)
+        return http().post(f"/students/{student_id}/homework", json=data, headers=headers, retry=True, timeout=20)
+
+    def _on_homework_pushed(self, item, r):
+        if r.status_code == 200:
+            self.outbox.mark_sent(item["id"], r.json().get("id"))
+            self.load_homework(); self.update_overview(); self.poller.boost()
+        elif r.status_code >= 500:
+            self.outbox.release(item["id"], response_error(r))
+            self._refresh_outbox_view(); return
+        else:
+            self.outbox.mark_failed(item["id"], response_error(r))
+            QMessageBox.warning(self, "Ошибка", f"Сервер отклонил «{item['title']}»: {response_error(r)}")
+        self._refresh_outbox_view()
+        self._flush_outbox()
+
+    def _on_push_error(self, item, e):
+        # нет связи — задание остаётся в очереди до восстановления API
+        self.outbox.release(item["id"], e)
+        self._refresh_outbox_view()
+
+    def retry_failed_outbox(self):
+        if not self.student_id: return
+        self.outbox.retry_failed(self.student_id)
+        self._refresh_outbox_view(); self._flush_outbox()
+
+    def _refresh_outbox_view(self):
+        if not self._page("Домашние задания"): return
+        self.list_outbox.clear()
+        if not self.student_id: return
+        labels = {PENDING: "в очереди", SENDING: "отправляется", SENT: "доставлено", FAILED: "ошибка"}
+        for it in self.outbox.recent(self.student_id):
+            line = f"{it['title']} — {labels.get(it['state'], it['state'])}"
+            if it["state"] in (PENDING, FAILED) and it["error"]: line += f" ({it['error']})"
+            self.list_outbox.addItem(line)
 
     def download_attachment(self, hw_id):
-        try:
-            r = requests.get(f"{API}/homework/{hw_id}/download", stream=True, timeout=30)
-            if r.status_code == 200:
-                cd = r.headers.get("Content-Disposition", ""); fname = None
-                if "filename=" in cd: fname = cd.split("filename=")[-1].strip('"; ')
-                if not fname: fname = f"attachment_{hw_id}"
-                save = QFileDialog.getSaveFileName(self, "Сохранить файл", fname)[0]
-                if save:
-                    with open(save, "wb") as f:
-                        for chunk in r.iter_content(8192): f.write(chunk)
-                    QMessageBox.information(self, "Успех", "Файл сохранён")
-            else:
-                try: err = r.json().get("error", r.text)
-                except Exception: err = r.text
-                QMessageBox.warning(self, "Ошибка", err)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка сети", str(e))
+        # файл сначала скачивается во временный файл в фоне, потом пользователь выбирает, куда его сохранить
+        self.runner.submit(self._download_to_temp, hw_id, group="download",
+                           on_done=self._on_downloaded, on_error=lambda e: QMessageBox.critical(self, "Ошибка сети", str(e)))
+
+    @staticmethod
+    def _download_to_temp(hw_id):
+        r = http().get(f"/homework/{hw_id}/download", stream=True, timeout=30)
+        if r.status_code != 200:
+            raise ApiError(response_error(r))
+        cd = r.headers.get("Content-Disposition", ""); fname = None
+        if "filename=" in cd: fname = cd.split("filename=")[-1].strip('"; ')
+        if not fname: fname = f"attachment_{hw_id}"
+        fd, tmp = tempfile.mkstemp(prefix="hw_", suffix="_" + os.path.basename(fname))
+        with os.fdopen(fd, "wb") as f:
+            for chunk in r.iter_content(8192): f.write(chunk)
+        return tmp, fname
+
+    def _on_downloaded(self, result):
+        tmp, fname = result
+        save = QFileDialog.getSaveFileName(self, "Сохранить файл", fname)[0]
+        if save:
+            shutil.move(tmp, save)
+            QMessageBox.information(self, "Успех", "Файл сохранён")
+        else:
+            os.remove(tmp)
 
 
     def load_grades(self):
+        self._load_grades("grades")
+
+    def _load_grades(self, group):
         if not self.student_id:
             QMessageBox.warning(self, "Ошибка", "Нужно войти."); return
-        try:
-            r = api_get(f"/students/{self.student_id}/grades")
-            if r.status_code != 200:
-                QMessageBox.warning(self, "Ошибка", "Не удалось загрузить оценки"); return
-            data = r.json(); self.grades_list = data
-            self.tbl_gr.setRowCount(0)
-            for g in data:
-                row = self.tbl_gr.rowCount(); self.tbl_gr.insertRow(row)
-                self.tbl_gr.setItem(row, 0, QTableWidgetItem(g.get("subject",""))); self.tbl_gr.setItem(row, 1, QTableWidgetItem(g.get("grade",""))); self.tbl_gr.setItem(row, 2, QTableWidgetItem(g.get("comment","")))
-            self._snapshot["grades"] = json.dumps(self.grades_list, sort_keys=True, ensure_ascii=False)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка сети", str(e))
-
+        self.runner.submit(fetch_json, f"/students/{self.student_id}/grades", group=group,
+                           on_done=self._apply_grades, on_error=lambda e: self._on_load_error("оценки", e))
+
+    def _apply_grades(self, data, store=True):
+        if self.profiler: self.profiler.first_data("сервер" if store else "кэш")
+        self.grades_list = data
+        if store: self._store_cache("grades", data)
+        self.grades_model.set_rows(data)
+        if self._page("Оценки"): self.tbl_gr.resizeColumnsToContents()
+        if store: self.diffs["grades"].update(data)
+        self._refresh_overview_if_visible()
+
+
+    # индексы по дате сдачи и дню недели перестраиваются при полной замене списков
+    @property
+    def homework_list(self):
+        return self._homework_list
+
+    @homework_list.setter
+    def homework_list(self, rows):
+        self._homework_list = rows
+        self.due_index.rebuild(rows)
+        self.reminders.update(self.due_index.entries())
+
+    def _update_homework(self, rows, changes):
+        # при опросе индекс сроков правится только по изменённым ДЗ
+        self._homework_list = rows
+        self.due_index.apply(changes)
+        self.reminders.update(self.due_index.entries())
+
+    @property
+    def schedule_list(self):
+        return self._schedule_list
+
+    @schedule_list.setter
+    def schedule_list(self, rows):
+        self._schedule_list = rows
+        by_day = {}
+        for it in rows:
+            by_day.setdefault(it.get("week_day"), []).append(it)
+        self._schedule_by_day = by_day
 
     def highlight_calendar_dates(self):
-        clear_all_formats(self.calendar)
-        now = datetime.now()
-        for h in getattr(self, "homework_list", []):
-            due = parse_date_safe(h.get("due_date"))
-            if not due: continue
-            qd = qdate_from_dt(due)
-            if due < now: color = "#ffd6da"
-            elif due <= now + timedelta(hours=24): color = "#fff0d6"
-            else: color = "#ecffd9"
-            set_format_for_date(self.calendar, qd, color)
+        # перекрашиваются только дни, у которых цвет изменился (цвет зависит и от текущего времени)
+        if self._page("Календарь"): self.calendar_highlighter.apply(self.due_index.day_colors())
 
     def on_calendar_selected(self):
         if not self.student_id: return
         sel = self.calendar.selectedDate(); pydate = date(sel.year(), sel.month(), sel.day()); weekday_name = pydate.strftime("%A")
+        if self.schedule_list:
+            self._show_day(pydate, self._schedule_by_day.get(weekday_name, []))
+        else:
+            self.list_day.clear(); self.list_day.addItem("Загрузка...")
+            self.runner.submit(fetch_json, f"/students/{self.student_id}/schedule", {"day": weekday_name}, group="nav",
+                               on_done=lambda items: self._show_day(pydate, items),
+                               on_error=lambda e: self._show_day(pydate, None, error=e))
+
+    def _show_day(self, pydate, items, error=None):
         self.list_day.clear()
-        try:
-            if hasattr(self, "schedule_list") and self.schedule_list:
-                items = [it for it in self.schedule_list if it.get("week_day") == weekday_name]
-            else:
-                r = api_get(f"/students/{self.student_id}/schedule", params={"day": weekday_name}); items = r.json() if r.status_code == 200 else []
-            if items:
-                self.list_day.addItem("— Пары —")
-                for it in items:
-                    t = it.get("time",""); subj = it.get("subject",""); cls = it.get("classroom",""); teacher = it.get("teacher","")
-                    self.list_day.addItem(f"{t} — {subj} ({cls}) — {teacher}")
-            else:
-                self.list_day.addItem("Пар нет на этот день (по расписанию).")
-        except Exception as e:
-            self.list_day.addItem("Ошибка загрузки расписания: " + str(e))
-        try:
-            hlist = []
-            for h in getattr(self, "homework_list", []):
-                due = parse_date_safe(h.get("due_date"))
-                if due and due.date() == pydate: hlist.append(h)
-            if hlist:
-                self.list_day.addItem("— Домашние задания —")
-                for h in hlist:
-                    title = h.get("title",""); due = parse_date_safe(h.get("due_date")); due_txt = due.strftime("%Y-%m-%d %H:%M") if due else (h.get("due_date") or "")
-                    self.list_day.addItem(f"{title} (срок: {due_txt})")
-        except Exception as e:
-            self.list_day.addItem("Ошибка загрузки ДЗ: " + str(e))
+        if error is not None:
+            self.list_day.addItem("Ошибка загрузки расписания: " + str(error))
+        elif items:
+            self.list_day.addItem("— Пары —")
+            for it in items:
+                t = it.get("time",""); subj = it.get("subject",""); cls = it.get("classroom",""); teacher = it.get("teacher","")
+                self.list_day.addItem(f"{t} — {subj} ({cls}) — {teacher}")
+        else:
+            self.list_day.addItem("Пар нет на этот день (по расписанию).")
+        hlist = self.due_index.on_day(pydate)
+        if hlist:
+            self.list_day.addItem("— Домашние задания —")
+            for due, h in hlist:
+                self.list_day.addItem(f"{h.get('title','')} (срок: {due.strftime('%Y-%m-%d %H:%M')})")
 
 
     def start_polling(self):
-        interval = max(5, int(self.settings.get("poll_interval_sec", DEFAULT_SETTINGS["poll_interval_sec"])))
-        self.poll_timer.start(interval * 1000)
-        self._prev_snapshot["homework"] = self._snapshot.get("homework", "")
-        self._prev_snapshot["schedule"] = self._snapshot.get("schedule", "")
-        self._prev_snapshot["grades"] = self._snapshot.get("grades", "")
-        self.poll_updates()
+        self.poller.interval = max(5, int(self.settings.get("poll_interval_sec", DEFAULT_SETTINGS["poll_interval_sec"])))
+        self.poller.start()
 
     def stop_polling(self):
-        if self.poll_timer.isActive():
-            self.poll_timer.stop()
+        self.poller.stop()
+
+    def showEvent(self, event):
+        super().showEvent(event); self.poller.set_visible(not self.isMinimized())
+
+    def hideEvent(self, event):
+        super().hideEvent(event); self.poller.set_visible(False)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange: self.poller.set_visible(self.isVisible() and not self.isMinimized())
 
     def _play_sound(self):
         if self.settings.get("notify_sound", True):
@@ -722,168 +918,136 @@ class MainWindow(QWidget):
                 pass
 
     def poll_updates(self):
-        if not self.student_id:
+        if not self.student_id or self.runner.busy("poll"):
             return
+        # три GET уходят параллельно, разбор ответа — в GUI-потоке, когда придут все
+        base = f"/students/{self.student_id}"
+        self.runner.gather([(fetch_json_optional, (base + "/homework",)), (fetch_json_optional, (base + "/schedule",)), (fetch_json_optional, (base + "/grades",))],
+                           group="poll", on_done=self._apply_poll, on_error=self._on_poll_error)
+
+    def _on_poll_error(self, e):
+        self.poller.failed(getattr(e, "retry_after", None))
+        from client_http import CircuitOpenError
+        if not isinstance(e, CircuitOpenError): self.lbl_api_status.setText("API: Недоступно")
+        self._update_freshness()
+        print("Polling error:", e)
+
+    def _apply_poll(self, results):
+        self.poller.succeeded()
+        hw, s, g = results
+        for kind, data in zip(("homework", "schedule", "grades"), results):
+            if data is not None: self._store_cache(kind, data)
         try:
-            r_hw = api_get(f"/students/{self.student_id}/homework")
-            r_s = api_get(f"/students/{self.student_id}/schedule")
-            r_g = api_get(f"/students/{self.student_id}/grades")
-            hw, s, g = None, None, None
-            if r_hw.status_code == 200: hw = r_hw.json()
-            if r_s.status_code == 200: s = r_s.json()
-            if r_g.status_code == 200: g = r_g.json()
-            hw_json = json.dumps(hw, sort_keys=True, ensure_ascii=False) if hw is not None else ""
-            s_json = json.dumps(s, sort_keys=True, ensure_ascii=False) if s is not None else ""
-            g_json = json.dumps(g, sort_keys=True, ensure_ascii=False) if g is not None else ""
-            if not self._first_seed_done:
-                self._snapshot["homework"] = hw_json; self._snapshot["schedule"] = s_json; self._snapshot["grades"] = g_json
-                self._first_seed_done = True
-                self.lbl_api_status.setText("API: Доступно")
-                self.lbl_last_update.setText(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                return
-            if hw_json and hw_json != self._snapshot.get("homework", ""):
-                prev_hw = json.loads(self._snapshot.get("homework", "[]")) if self._snapshot.get("homework", "") else []
-                now_hw = hw or []
-                self._prev_snapshot["homework"] = self._snapshot.get("homework", "")
-                self._snapshot["homework"] = hw_json
-                self.homework_list = now_hw
-                self.populate_homework_table(now_hw)
-                self.highlight_calendar_dates()
-                prev_map = {str(h.get("id")): h for h in prev_hw}
-                now_map = {str(h.get("id")): h for h in now_hw}
-                added = [now_map[k] for k in now_map.keys() - prev_map.keys()]
-                removed = [prev_map[k] for k in prev_map.keys() - now_map.keys()]
-                changed = []
-                for k in (set(prev_map.keys()) & set(now_map.keys())):
-                    if json.dumps(prev_map[k], sort_keys=True, ensure_ascii=False) != json.dumps(now_map[k], sort_keys=True, ensure_ascii=False):
-                        changed.append(now_map[k])
-                if self.settings.get("notify_homework", True):
-                    for a in added:
-                        title = "Новое ДЗ"
-                        body = f"{a.get('title','(без названия)')}\nСрок: {a.get('due_date','—')}"
-                        NotificationPopup(title, body, duration=self.settings.get("notification_duration_sec", 6))
-                    for c in changed:
-                        title = "Обновлено ДЗ"
-                        body = f"{c.get('title','(без названия)')}\nСрок: {c.get('due_date','—')}"
-                        NotificationPopup(title, body, duration=self.settings.get("notification_duration_sec", 6))
-                    if removed:
-                        NotificationPopup("Удалено ДЗ", f"Удалено {len(removed)} заданий", duration=self.settings.get("notification_duration_sec", 6))
-                    if (added or changed or removed):
-                        self._play_sound()
-            if s_json and s_json != self._snapshot.get("schedule", ""):
-                prev_s = json.loads(self._snapshot.get("schedule", "[]")) if self._snapshot.get("schedule", "") else []
-                now_s = s or []
-                self._prev_snapshot["schedule"] = self._snapshot.get("schedule", "")
-                self._snapshot["schedule"] = s_json
-                self.schedule_list = now_s
-                if self.nav.currentItem() and self.nav.currentItem().text() == "Расписание":
-                    self.load_schedule()
-                if self.settings.get("notify_schedule", True):
-                    prev_map = {str(x.get("id")): x for x in prev_s}
-                    now_map = {str(x.get("id")): x for x in now_s}
-                    added = [now_map[k] for k in now_map.keys() - prev_map.keys()]
-                    removed = [prev_map[k] for k in prev_map.keys() - now_map.keys()]
-                    for a in added:
-                        NotificationPopup("Новая пара", f"{a.get('subject','')} — {a.get('time','')}\n{a.get('week_day','')}", duration=self.settings.get("notification_duration_sec", 6))
-                    if removed:
-                        NotificationPopup("Пары удалены", f"Удалено {len(removed)} пар.", duration=self.settings.get("notification_duration_sec", 6))
-                    if (added or removed):
-                        self._play_sound()
-
-            if g_json and g_json != self._snapshot.get("grades", ""):
-                prev_g = json.loads(self._snapshot.get("grades", "[]")) if self._snapshot.get("grades", "") else []
-                now_g = g or []
-                self._prev_snapshot["grades"] = self._snapshot.get("grades", "")
-                self._snapshot["grades"] = g_json
-                self.grades_list = now_g
-                if self.nav.currentItem() and self.nav.currentItem().text() == "Оценки":
-                    self.load_grades()
-                if self.settings.get("notify_grades", True):
-                    prev_map = {str(x.get("id")): x for x in prev_g}
-                    now_map = {str(x.get("id")): x for x in now_g}
-                    added = [now_map[k] for k in now_map.keys() - prev_map.keys()]
-                    changed = []
-                    for k in (set(prev_map.keys()) & set(now_map.keys())):
-                        if json.dumps(prev_map[k], sort_keys=True, ensure_ascii=False) != json.dumps(now_map[k], sort_keys=True, ensure_ascii=False):
-                            changed.append(now_map[k])
-                    for a in added:
-                        NotificationPopup("Новая оценка", f"{a.get('subject','')} — {a.get('grade','')}", duration=self.settings.get("notification_duration_sec", 6))
-                    for c in changed:
-                        NotificationPopup("Обновлена оценка", f"{c.get('subject','')} — {c.get('grade','')}", duration=self.settings.get("notification_duration_sec", 6))
-                    if (added or changed):
-                        self._play_sound()
+            # diff хранит только id -> дайджест строки; первый ответ после входа лишь запоминает состояние
+            if hw is not None:
+                ch = self.diffs["homework"].update(hw)
+                if ch:
+                    self._update_homework(hw, ch)
+                    self.populate_homework_table(hw)
+                    self.highlight_calendar_dates()
+                    if self.settings.get("notify_homework", True):
+                        for a in ch.added:
+                            self.notifier.notify("hw_added", "Новое ДЗ", f"{a.get('title','(без названия)')}\nСрок: {a.get('due_date','—')}", ("новое ДЗ", "новых ДЗ", "новых ДЗ"))
+                        for c in ch.changed:
+                            self.notifier.notify("hw_changed", "Обновлено ДЗ", f"{c.get('title','(без названия)')}\nСрок: {c.get('due_date','—')}", ("обновлённое ДЗ", "обновлённых ДЗ", "обновлённых ДЗ"))
+                        if ch.removed:
+                            self.notifier.notify("hw_removed", "Удалено ДЗ", f"Удалено {len(ch.removed)} заданий")
+            if s is not None:
+                ch = self.diffs["schedule"].update(s)
+                if ch:
+                    self.schedule_list = s
+                    if self.nav.currentItem() and self.nav.currentItem().text() == "Расписание":
+                        self.load_schedule()
+                    if self.settings.get("notify_schedule", True) and (ch.added or ch.removed):
+                        for a in ch.added:
+                            self.notifier.notify("schedule_added", "Новая пара", f"{a.get('subject','')} — {a.get('time','')}\n{a.get('week_day','')}", ("новая пара", "новые пары", "новых пар"))
+                        if ch.removed:
+                            self.notifier.notify("schedule_removed", "Пары удалены", f"Удалено {len(ch.removed)} пар.")
+            if g is not None:
+                ch = self.diffs["grades"].update(g)
+                if ch:
+                    self.grades_list = g
+                    if self.nav.currentItem() and self.nav.currentItem().text() == "Оценки":
+                        self.load_grades()
+                    if self.settings.get("notify_grades", True) and (ch.added or ch.changed):
+                        for a in ch.added:
+                            self.notifier.notify("grade_added", "Новая оценка", f"{a.get('subject','')} — {a.get('grade','')}", ("новая оценка", "новые оценки", "новых оценок"))
+                        for c in ch.changed:
+                            self.notifier.notify("grade_changed", "Обновлена оценка", f"{c.get('subject','')} — {c.get('grade','')}", ("обновлённая оценка", "обновлённые оценки", "обновлённых оценок"))
             self.update_overview()
-            self.lbl_last_update.setText(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            self._update_freshness()
             self.lbl_api_status.setText("API: Доступно")
         except Exception as e:
-            self.lbl_api_status.setText("API: Недоступно")
             print("Polling error:", e)
 
-
-    def check_reminders(self):
-        if not getattr(self, "homework_list", None): return
-        now = datetime.now(); window = now + timedelta(hours=24)
-        for h in self.homework_list:
-            due = parse_date_safe(h.get("due_date"))
-            if not due: continue
-            if now <= due <= window:
-                NotificationPopup("Напоминание: ДЗ скоро", f"{h.get('title','(без названия)')}\nСрок: {due.strftime('%Y-%m-%d %H:%M')}", duration=self.settings.get("notification_duration_sec", 6))
-                self._play_sound()
+    def _on_reminder(self, due, h):
+        self.notifier.notify("reminder", "Напоминание: ДЗ скоро", f"{h.get('title','(без названия)')}\nСрок: {due.strftime('%Y-%m-%d %H:%M')}", ("задание скоро сдавать", "задания скоро сдавать", "заданий скоро сдавать"))
 
 
     def count_homework_states(self):
-        now = datetime.now(); overdue = 0; due_24 = 0; future = 0; soonest = None; soonest_hw = None
-        for h in getattr(self, "homework_list", []):
-            due = parse_date_safe(h.get("due_date"))
-            if not due:
-                future += 1; continue
+        now = datetime.now(); overdue = 0; due_24 = 0; soonest = None; soonest_hw = None
+        entries = self.due_index.entries()
+        # ДЗ без распознанного срока считаются «позже»
+        future = len(self.homework_list) - len(entries)
+        for due, h in entries:
             if due < now: overdue += 1
             elif due <= now + timedelta(hours=24): due_24 += 1
             else: future += 1
-            if due and (soonest is None or due < soonest) and due >= now:
+            if (soonest is None or due < soonest) and due >= now:
                 soonest = due; soonest_hw = h
-        return {'total': len(getattr(self, "homework_list", [])), 'overdue': overdue, 'due_24': due_24, 'future': future, 'next': soonest_hw, 'next_dt': soonest}
+        return {'total': len(self.homework_list), 'overdue': overdue, 'due_24': due_24, 'future': future, 'next': soonest_hw, 'next_dt': soonest}
 
     def count_weekly_classes(self):
         today = date.today(); count = 0
         for d in range(7):
             dt = today + timedelta(days=d); wd = dt.strftime('%A')
-            for it in getattr(self, 'schedule_list', []):
-                if it.get('week_day') == wd: count += 1
+            count += len(self._schedule_by_day.get(wd, []))
         return count
 
     def recent_grades(self, n=3):
+        # оценки уже загружены и обновляются опросом — отдельный запрос не нужен
+        arr = getattr(self, "grades_list", []) or []
         try:
-            r = api_get(f"/students/{self.student_id}/grades")
-            if r.status_code != 200: return []
-            arr = r.json()
-            try:
-                arr_sorted = sorted(arr, key=lambda x: x.get('created_at',''), reverse=True)
-            except Exception:
-                arr_sorted = arr
-            return arr_sorted[:n]
+            arr_sorted = sorted(arr, key=lambda x: x.get('created_at',''), reverse=True)
         except Exception:
-            return []
+            arr_sorted = arr
+        return arr_sorted[:n]
 
     def update_overview(self):
         if not self.student_id:
             self.overview_text.setText("Пожалуйста, войдите в систему."); self.overview_details.setPlainText(""); self.lbl_api_status.setText("API: —"); return
-        try:
-            r = api_get(f"/students/{self.student_id}/schedule", timeout=5); api_ok = (r.status_code == 200)
-        except Exception:
-            api_ok = False
+        # доступность API проверяется в фоне; обзор перерисуется, когда придёт ответ
+        if not self.runner.busy("probe"):
+            self.runner.submit(api_get, "/health", timeout=5, group="probe",
+                               on_done=lambda r: self._on_probe(r.status_code == 200), on_error=lambda e: self._on_probe(False))
+        self._render_overview()
+
+    def _on_probe(self, ok):
+        changed = ok != self._api_ok
+        self._api_ok = ok
+        if changed and self.student_id: self._render_overview()
+
+    def _render_overview(self):
+        api_txt = "—" if self._api_ok is None else ("Доступно" if self._api_ok else "Недоступно")
         hw_stats = self.count_homework_states(); classes_week = self.count_weekly_classes(); recent = self.recent_grades(3); avatar = avatar_path(self.student_id) or "(нет)"
-        overview_html = f"Привет, <b>{self.full_name}</b>!<br/>API: <b>{'Доступно' if api_ok else 'Недоступно'}</b><br/>ID: <b>{self.student_id}</b><br/>Направление: <b>{self.program or '—'}</b> | Курс: <b>{self.year or '—'}</b>"
+        overview_html = f"Привет, <b>{self.full_name}</b>!<br/>API: <b>{api_txt}</b><br/>ID: <b>{self.student_id}</b><br/>Направление: <b>{self.program or '—'}</b> | Курс: <b>{self.year or '—'}</b>"
         self.overview_text.setText(overview_html)
         details = []; details.append(f"Всего ДЗ: {hw_stats['total']} (Просрочено: {hw_stats['overdue']}, До 24ч: {hw_stats['due_24']}, Позже: {hw_stats['future']})")
         if hw_stats['next']:
             ndt = hw_stats['next_dt'].strftime('%Y-%m-%d %H:%M') if hw_stats['next_dt'] else hw_stats['next'].get('due_date','')
             details.append(f"Ближайшее ДЗ: {hw_stats['next'].get('title','(без названия)')} — {ndt}")
         details.append(f"Пар в ближайшие 7 дней (по расписанию): {classes_week}")
+        next_reminder = self.reminders.next_at()
+        if next_reminder: details.append(f"Следующее напоминание: {max(next_reminder, datetime.now()).strftime('%Y-%m-%d %H:%M')} (ожидают: {self.reminders.pending()})")
         if recent:
             details.append("Последние оценки:")
             for g in recent: details.append(f"  {g.get('subject','')} — {g.get('grade','')} ({g.get('comment','')})")
         details.append(f"Аватар: {avatar}"); details.append(f"API URL: {API}")
+        details.append(self.lbl_last_update.text())
+        left = self.poller.seconds_left()
+        if left is not None: details.append(f"Следующий опрос через {left:.0f} с" + ("" if self.poller.visible else " (окно скрыто — опрос реже)") + (f", сбоев подряд: {self.poller.failures}" if self.poller.failures else ""))
+        stall = self.stall_monitor.report()
+        details.append(f"Задержки интерфейса: макс. {stall['max_ms']:.0f} мс, p95 {stall['p95_ms']:.0f} мс, дольше кадра: {stall['over_frame']} из {stall['samples']}")
         self.overview_details.setPlainText("\n".join(details))
 
 
@@ -896,7 +1060,7 @@ class MainWindow(QWidget):
         self.settings["enable_tray"] = bool(self.chk_enable_tray.isChecked())
         save_settings(self.settings)
         QMessageBox.information(self, "Настройки", "Настройки сохранены.")
-        if self.poll_timer.isActive():
+        if self.poller.is_active():
             self.stop_polling(); self.start_polling()
         if self.settings.get("enable_tray", True) and not self.tray:
             self._init_tray()
@@ -916,15 +1080,23 @@ class MainWindow(QWidget):
         self.chk_enable_tray.setChecked(self.settings["enable_tray"])
         save_settings(self.settings)
         QMessageBox.information(self, "Настройки", "Настройки восстановлены по умолчанию.")
-        if self.poll_timer.isActive():
+        if self.poller.is_active():
             self.stop_polling(); self.start_polling()
 
 
 def main():
     app = QApplication(sys.argv)
+    profiler = None
+    # --profile-startup: печать этапов запуска; с --check — выход с кодом 1, если первая отрисовка дольше STARTUP_BUDGET_MS
+    if "--profile-startup" in sys.argv:
+        from client_startup import StartupProfiler
+        profiler = StartupProfiler(STARTUP_T0, STARTUP_MARKS, budget_ms=getattr(config, "STARTUP_BUDGET_MS", 1500), check="--check" in sys.argv)
+        profiler.mark("QApplication"); profiler.watch(app)
     if os.path.exists("app_icon.png"):
         app.setWindowIcon(QIcon("app_icon.png"))
-    w = MainWindow(); w.show()
+    w = MainWindow(profiler=profiler)
+    if profiler: profiler.mark("окно собрано")
+    w.show()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
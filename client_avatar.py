@@ -0,0 +1,68 @@
+# client_avatar.py
+# Аватар на клиенте: миниатюра скачивается с сервера с If-None-Match (ETag) и лежит на диске,
+# а декодированные и уже отмасштабированные QPixmap держатся в небольшом LRU —
+# обновление профиля больше не декодирует и не масштабирует PNG каждый раз.
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPixmap
+
+
+class PixmapLRU:
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, size):
+        # ключ включает время изменения файла: перезаписанный аватар декодируется заново
+        try:
+            key = (path, os.path.getmtime(path), size)
+        except OSError:
+            return None
+        pix = self._items.get(key)
+        if pix is not None:
+            self._items.move_to_end(key); self.hits += 1
+            return pix
+        self.misses += 1
+        pix = QPixmap(path)
+        if pix.isNull():
+            return None
+        if pix.width() > size or pix.height() > size:
+            pix = pix.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._items[key] = pix
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+        return pix
+
+    def clear(self):
+        self._items.clear()
+
+
+def fetch_avatar(http, student_id, size, dest):
+    # выполняется в пуле потоков; ETag хранится рядом с файлом, 304 — файл на диске актуален
+    etag_file = dest + ".etag"
+    headers = {}
+    if os.path.exists(dest) and os.path.exists(etag_file):
+        with open(etag_file, encoding="utf-8") as f:
+            headers["If-None-Match"] = f.read().strip()
+    r = http.get(f"/students/{student_id}/avatar", params={"size": size}, headers=headers)
+    if r.status_code == 304:
+        return dest
+    if r.status_code != 200:
+        return dest if os.path.exists(dest) and r.status_code != 404 else None
+    with open(dest + ".tmp", "wb") as f:
+        f.write(r.content)
+    os.replace(dest + ".tmp", dest)
+    with open(etag_file, "w", encoding="utf-8") as f:
+        f.write(r.headers.get("ETag", ""))
+    return dest
+
+
+def upload_avatar(http, student_id, path):
+    # PUT идемпотентен (версия — хэш содержимого), поэтому HttpClient может его повторить
+    with open(path, "rb") as f:
+        data = f.read()
+    return http.request("PUT", f"/students/{student_id}/avatar", params={"wait": 1}, data=data, headers={"Content-Type": "application/octet-stream"})
@@ -0,0 +1,95 @@
+# client_cache.py
+# Локальный кэш клиента (SQLite): последние загруженные ДЗ, расписание и оценки каждого студента.
+# После входа интерфейс сразу рисуется из кэша, а без сети кэш открывается только для чтения.
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import time
+
+KINDS = ("homework", "schedule", "grades")
+
+
+class ClientCache:
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS datasets (
+                student_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (student_id, kind)
+            );
+            CREATE TABLE IF NOT EXISTS accounts (
+                full_name TEXT PRIMARY KEY,
+                student_id INTEGER NOT NULL,
+                display_name TEXT,
+                salt BLOB NOT NULL,
+                pw_hash BLOB NOT NULL,
+                last_login REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def load(self, student_id, kind):
+        row = self.conn.execute("SELECT payload, fetched_at FROM datasets WHERE student_id=? AND kind=?", (student_id, kind)).fetchone()
+        if not row:
+            return None, None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None, None
+
+    def store(self, student_id, kind, data):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO datasets (student_id, kind, payload, fetched_at) VALUES (?, ?, ?, ?)",
+            (student_id, kind, json.dumps(data, ensure_ascii=False), now))
+        self.conn.commit()
+        return now
+
+    # --- вход без сети: храним только соль и PBKDF2-хэш пароля последнего успешного входа ---
+    # PBKDF2 занимает ~0.1 с, поэтому remember_login и check_offline_login вызываются через TaskRunner;
+    # self.conn привязан к GUI-потоку, в пуле открывается своё соединение
+
+    @staticmethod
+    def _hash(password, salt):
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 100_000)
+
+    def _worker_conn(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def remember_login(self, full_name, password, student_id, display_name):
+        salt = os.urandom(16)
+        pw_hash = self._hash(password, salt)
+        conn = self._worker_conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO accounts (full_name, student_id, display_name, salt, pw_hash, last_login) VALUES (?, ?, ?, ?, ?, ?)",
+                (full_name, student_id, display_name, salt, pw_hash, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def check_offline_login(self, full_name, password):
+        conn = self._worker_conn()
+        try:
+            row = conn.execute("SELECT student_id, display_name, salt, pw_hash FROM accounts WHERE full_name=?", (full_name,)).fetchone()
+        finally:
+            conn.close()
+        if not row or not hmac.compare_digest(self._hash(password, row[2]), row[3]):
+            return None
+        return row[0], row[1]
+
+    def last_login_name(self):
+        row = self.conn.execute("SELECT full_name FROM accounts ORDER BY last_login DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,100 @@
+# client_calendar.py
+# Индекс ДЗ по дате сдачи и подсветка календаря: при опросе индекс правится по изменениям из CollectionDiff,
+# а календарь перекрашивает только дни, у которых поменялся цвет.
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QDate
+from PySide6.QtGui import QTextCharFormat, QBrush, QColor
+
+OVERDUE_COLOR = "#ffd6da"
+SOON_COLOR = "#fff0d6"
+LATER_COLOR = "#ecffd9"
+
+
+def parse_date_safe(s):
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(s)
+    except Exception:
+        for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%d.%m.%Y"):
+            try:
+                return datetime.strptime(s, fmt)
+            except Exception:
+                continue
+    return None
+
+
+def due_color(due, now):
+    if due < now: return OVERDUE_COLOR
+    if due <= now + timedelta(hours=24): return SOON_COLOR
+    return LATER_COLOR
+
+
+class DueDateIndex:
+    def __init__(self):
+        self._rows = {}                   # id ДЗ -> (datetime, ДЗ), только ДЗ с распознанным сроком
+        self._by_day = defaultdict(list)  # date -> [(datetime, ДЗ)], по возрастанию срока
+        self._dues = defaultdict(list)    # date -> [datetime] параллельно _by_day, для bisect
+
+    def rebuild(self, rows):
+        self._rows = {}; self._by_day = defaultdict(list); self._dues = defaultdict(list)
+        for h in rows:
+            self._insert(h)
+
+    def apply(self, changes):
+        # Changes из CollectionDiff: трогаем только добавленные, изменённые и удалённые ДЗ
+        for key in changes.removed:
+            self._remove(key)
+        for h in changes.changed:
+            self._remove(h.get("id"))
+        for h in changes.changed + changes.added:
+            self._insert(h)
+
+    def _insert(self, h):
+        due = parse_date_safe(h.get("due_date"))
+        key = h.get("id")
+        if key in self._rows: self._remove(key)
+        if due is None: return
+        entry = (due, h); day = due.date()
+        pos = bisect_right(self._dues[day], due)
+        self._dues[day].insert(pos, due); self._by_day[day].insert(pos, entry)
+        self._rows[key] = entry
+
+    def _remove(self, key):
+        entry = self._rows.pop(key, None)
+        if entry is None: return
+        day = entry[0].date(); items = self._by_day[day]
+        pos = next(i for i, e in enumerate(items) if e is entry)
+        del items[pos]; del self._dues[day][pos]
+        if not items:
+            del self._by_day[day]; del self._dues[day]
+
+    def on_day(self, day):
+        return self._by_day.get(day, [])
+
+    def entries(self):
+        return self._rows.values()
+
+    def day_colors(self, now=None):
+        # у дня несколько ДЗ — цвет по самому срочному
+        now = now or datetime.now()
+        return {day: due_color(items[0][0], now) for day, items in self._by_day.items()}
+
+
+class CalendarHighlighter:
+    def __init__(self, calendar):
+        self.calendar = calendar
+        self._painted = {}
+
+    def apply(self, colors):
+        for day in [d for d in self._painted if d not in colors]:
+            self.calendar.setDateTextFormat(QDate(day.year, day.month, day.day), QTextCharFormat())
+            del self._painted[day]
+        for day, color in colors.items():
+            if self._painted.get(day) == color: continue
+            fmt = QTextCharFormat(); fmt.setBackground(QBrush(QColor(color)))
+            self.calendar.setDateTextFormat(QDate(day.year, day.month, day.day), fmt)
+            self._painted[day] = color
@@ -0,0 +1,124 @@
+# client_diff.py
+# Поиск изменений между опросами: для каждой коллекции хранится только id -> дайджест строки,
+# а добавленные/изменённые/удалённые строки находятся за один проход по новому ответу.
+import json
+
+
+def row_digest(row):
+    # строки API плоские (строки, числа, None) — хватает хэша кортежа; вложенные значения — через JSON
+    try:
+        return hash(tuple(sorted(row.items())))
+    except TypeError:
+        return hash(json.dumps(row, sort_keys=True, ensure_ascii=False))
+
+
+class Changes:
+    def __init__(self, added=(), changed=(), removed=()):
+        self.added = list(added)      # новые строки
+        self.changed = list(changed)  # строки, у которых изменилось содержимое
+        self.removed = list(removed)  # ключи исчезнувших строк
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self):
+        return f"Changes(added={len(self.added)}, changed={len(self.changed)}, removed={len(self.removed)})"
+
+
+class CollectionDiff:
+    def __init__(self, key=None):
+        self.key = key or (lambda row: row.get("id"))
+        self._digests = None
+
+    @property
+    def seeded(self):
+        return self._digests is not None
+
+    def reset(self):
+        self._digests = None
+
+    def update(self, rows):
+        # первый вызов только запоминает состояние и возвращает пустые изменения
+        old = self._digests
+        new = {}
+        added, changed = [], []
+        for row in rows:
+            k = self.key(row)
+            d = row_digest(row)
+            new[k] = d
+            if old is None:
+                continue
+            prev = old.get(k)
+            if prev is None:
+                added.append(row)
+            elif prev != d:
+                changed.append(row)
+        self._digests = new
+        if old is None:
+            return Changes()
+        return Changes(added, changed, [k for k in old if k not in new])
+
+
+def schedule_key(row):
+    # у пар расписания нет id в ответе API — пара определяется днём, временем и предметом
+    return (row.get("week_day"), row.get("time"), row.get("subject"), row.get("classroom"), row.get("teacher"))
+
+
+def _legacy_diff(prev_json, rows):
+    # прежний способ из client.py: сериализация всего списка, затем повторный разбор и сериализация строк
+    now_json = json.dumps(rows, sort_keys=True, ensure_ascii=False)
+    if now_json == prev_json:
+        return now_json, 0
+    prev_map = {str(h.get("id")): h for h in (json.loads(prev_json) if prev_json else [])}
+    now_map = {str(h.get("id")): h for h in rows}
+    n = len(now_map.keys() - prev_map.keys()) + len(prev_map.keys() - now_map.keys())
+    for k in prev_map.keys() & now_map.keys():
+        if json.dumps(prev_map[k], sort_keys=True, ensure_ascii=False) != json.dumps(now_map[k], sort_keys=True, ensure_ascii=False):
+            n += 1
+    return now_json, n
+
+
+def benchmark(n=10_000, ticks=20):
+    import time
+    import tracemalloc
+
+    base = [{"id": i, "title": f"Задание {i}", "description": "Описание " * 8, "due_date": "2025-10-10",
+             "pushed": 1, "attachment": None} for i in range(n)]
+    # на каждом тике меняется одна строка и добавляется одна новая
+    snapshots = []
+    rows = base
+    for t in range(ticks):
+        rows = [dict(r) for r in rows]
+        rows[t]["title"] += " (изм.)"
+        rows.append({"id": n + t, "title": "Новое", "description": "", "due_date": None, "pushed": 1, "attachment": None})
+        snapshots.append(rows)
+
+    def run(label, fn):
+        # время и память меряются отдельными прогонами: tracemalloc сильно замедляет код
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000 / ticks
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        print(f"{label:<28} {elapsed:8.1f} мс/тик   пик памяти {peak:6.1f} МБ")
+
+    def legacy():
+        prev = json.dumps(base, sort_keys=True, ensure_ascii=False)
+        for s in snapshots:
+            prev, _ = _legacy_diff(prev, s)
+
+    def digest():
+        d = CollectionDiff()
+        d.update(base)
+        for s in snapshots:
+            d.update(s)
+
+    print(f"{n} строк, {ticks} тиков опроса")
+    run("JSON-снимок (прежний)", legacy)
+    run("id -> дайджест", digest)
+
+
+if __name__ == "__main__":
+    benchmark()
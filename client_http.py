@@ -0,0 +1,154 @@
+# client_http.py
+# Единая HTTP-сессия клиента: пул keep-alive соединений, повторы с джиттером для идемпотентных
+# запросов, таймауты на каждый вызов и предохранитель (circuit breaker), который перестаёт
+# долбить упавший сервер.
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class ServerBusyError(requests.RequestException):
+    # сервер ответил 429/503 и, возможно, подсказал, когда повторить
+    def __init__(self, retry_after=None):
+        super().__init__(f"сервер занят, повтор через {retry_after:.0f} с" if retry_after else "сервер занят")
+        self.retry_after = retry_after
+
+
+def retry_after(response):
+    # Retry-After бывает числом секунд или HTTP-датой
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, on_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("API недоступно, повтор позже")
+                self._set(self.HALF_OPEN)
+            # в полуоткрытом состоянии пропускаем один пробный запрос
+            if self._probe_in_flight:
+                raise CircuitOpenError("API недоступно, идёт проверка")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self.state != self.OPEN:
+                    self._set(self.OPEN)
+
+    def release_probe(self):
+        # запрос упал не по вине сети (ошибка в URL, редиректы и т.п.) — исход не считаем, но место пробы освобождаем
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _set(self, state):
+        self.state = state
+        if self.on_change:
+            self.on_change(state)
+
+
+class HttpClient:
+    IDEMPOTENT = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+    RETRY_STATUSES = {502, 503, 504}
+    BUSY_STATUSES = {429, 503}
+
+    def __init__(self, base_url, pool_size=10, retries=3, backoff=0.3, max_backoff=5.0, timeout=10, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        # повторы делаем сами (с учётом предохранителя), поэтому у адаптера max_retries=0
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, retry=None, timeout=None, **kwargs):
+        method = method.upper()
+        if retry is None:
+            retry = method in self.IDEMPOTENT
+        attempts = 1 + (self.retries if retry else 0)
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                r = self.session.request(method, self.base_url + path, timeout=timeout or self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                self._sleep(attempt)
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            if r.status_code >= 500:
+                self.breaker.record_failure()
+                if r.status_code in self.RETRY_STATUSES and attempt + 1 < attempts:
+                    # подсказку сервера соблюдаем; если ждать дольше max_backoff — отдаём ответ вызывающему
+                    wait = retry_after(r)
+                    if wait is not None and wait > self.max_backoff:
+                        return r
+                    r.close()
+                    self._sleep(attempt, wait)
+                    continue
+            else:
+                self.breaker.record_success()
+            return r
+
+    def _sleep(self, attempt, wait=None):
+        # экспоненциальная задержка с полным джиттером, чтобы клиенты не повторяли запросы синхронно
+        if wait is not None:
+            time.sleep(wait)
+        else:
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt))))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
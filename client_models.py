@@ -0,0 +1,215 @@
+# client_models.py
+# Модели таблиц клиента: данные лежат списком dict, а QTableView запрашивает только видимые ячейки.
+# Фильтр и сортировка хранятся как перестановка индексов строк: QSortFilterProxyModel вызывал бы
+# Python на каждую строку и каждое сравнение (на 50k строк — секунды), здесь это один sorted() и одно включение списка.
+# Кнопка «Скачать» рисуется делегатом без виджета на строку.
+from datetime import datetime
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, Signal
+from PySide6.QtGui import QBrush, QColor
+from PySide6.QtWidgets import (QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication, QTableView, QHeaderView,
+                               QAbstractItemView)
+
+from client_calendar import parse_date_safe, due_color
+
+ROW_ROLE = Qt.UserRole + 1
+
+
+class DictTableModel(QAbstractTableModel):
+    # columns — список (заголовок, функция row -> текст)
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.rows = []
+        self._sorted = []   # индексы rows в порядке сортировки
+        self._order = []    # отсортированные индексы, прошедшие фильтр, — это и есть видимые строки
+        self._sort = None   # (колонка, порядок)
+        self._needle = ""
+        self._haystack = None
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self._haystack = None
+        self._reset_derived()
+        self._sorted = self._sorted_indices()
+        self._order = self._filtered(self._sorted)
+        self.endResetModel()
+
+    def _reset_derived(self):
+        pass
+
+    def set_filter(self, text):
+        needle = (text or "").strip().lower()
+        if needle == self._needle:
+            return
+        self.beginResetModel()
+        self._needle = needle
+        self._order = self._filtered(self._sorted)
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # вызывается QTableView по клику на заголовок
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order) if column >= 0 else None
+        self._sorted = self._sorted_indices()
+        self._order = self._filtered(self._sorted)
+        self.layoutChanged.emit()
+
+    def _sorted_indices(self):
+        indices = range(len(self.rows))
+        if not self._sort:
+            return list(indices)
+        column, order = self._sort
+        return sorted(indices, key=lambda i: self.sort_value(i, column), reverse=order == Qt.DescendingOrder)
+
+    def _filtered(self, indices):
+        if not self._needle:
+            return indices
+        if self._haystack is None:
+            self._haystack = [self.search_text(r).lower() for r in self.rows]
+        hay, needle = self._haystack, self._needle
+        return [i for i in indices if needle in hay[i]]
+
+    def search_text(self, row):
+        return " ".join(f(row) for _, f in self.columns)
+
+    def row_at(self, r):
+        return self.rows[self._order[r]]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[self._order[index.row()]]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.columns[index.column()][1](row)
+        if role == ROW_ROLE:
+            return row
+        return None
+
+    def sort_value(self, i, column):
+        return self.columns[column][1](self.rows[i]).lower()
+
+
+def _text(key):
+    return lambda row: "" if row.get(key) is None else str(row.get(key))
+
+
+class ScheduleModel(DictTableModel):
+    def __init__(self, parent=None):
+        super().__init__([
+            ("День", _text("week_day")),
+            ("Время", _text("time")),
+            ("Предмет", _text("subject")),
+            ("Аудитория/Преподаватель", lambda r: (r.get("classroom") or "") + " / " + (r.get("teacher") or "")),
+        ], parent)
+
+
+class GradesModel(DictTableModel):
+    def __init__(self, parent=None):
+        super().__init__([("Предмет", _text("subject")), ("Оценка", _text("grade")), ("Комментарий", _text("comment"))], parent)
+
+
+class HomeworkModel(DictTableModel):
+    ATTACHMENT_COLUMN = 4
+
+    def __init__(self, parent=None):
+        super().__init__([
+            ("ID", _text("id")),
+            ("Заголовок", _text("title")),
+            ("Описание", _text("description")),
+            ("Срок", lambda r: r.get("due_date") or ""),
+            ("Файл", lambda r: ""),
+        ], parent)
+
+    def _reset_derived(self):
+        # срок разбирается при первом показе строки (или сортировке по сроку), а не для всего списка сразу
+        self._due = [None] * len(self.rows)
+        self._now = datetime.now()
+
+    def _due_of(self, i):
+        cached = self._due[i]
+        if cached is None:
+            raw = self.rows[i].get("due_date")
+            dt = parse_date_safe(raw)
+            cached = self._due[i] = (dt, dt.strftime("%Y-%m-%d %H:%M") if dt else (raw or ""), due_color(dt, self._now) if dt else None)
+        return cached
+
+    def search_text(self, row):
+        # поиск — по заголовку и описанию
+        return (row.get("title") or "") + "\n" + (row.get("description") or "")
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i, col = self._order[index.row()], index.column()
+        if col == 3 and role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self._due_of(i)[1]
+        if role == Qt.BackgroundRole:
+            color = self._due_of(i)[2]
+            return QBrush(QColor(color)) if color else None
+        return super().data(index, role)
+
+    def sort_value(self, i, column):
+        row = self.rows[i]
+        if column == 0:
+            return row.get("id") or 0
+        if column == 3:
+            dt = self._due_of(i)[0]
+            return (dt is not None, dt or datetime.min)
+        if column == self.ATTACHMENT_COLUMN:
+            return 1 if row.get("attachment") else 0
+        return super().sort_value(i, column)
+
+
+class DownloadButtonDelegate(QStyledItemDelegate):
+    # рисует кнопку «Скачать» только для видимых строк с вложением; клик отдаёт строку в сигнал
+    clicked = Signal(object)
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        row = index.data(ROW_ROLE)
+        if not row or not row.get("attachment"):
+            return
+        btn = QStyleOptionButton()
+        btn.rect = option.rect.adjusted(4, 2, -4, -2)
+        btn.text = "Скачать"
+        btn.state = QStyle.State_Enabled | (option.state & QStyle.State_MouseOver)
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, btn, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            row = index.data(ROW_ROLE)
+            if row and row.get("attachment") and option.rect.contains(event.position().toPoint()):
+                self.clicked.emit(row)
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+def make_table_view(model):
+    view = QTableView()
+    view.setModel(model)
+    view.setSortingEnabled(True)
+    view.sortByColumn(-1, Qt.AscendingOrder)
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    view.setMouseTracking(True)
+    # фиксированная высота строк: представлению не нужно измерять каждую строку
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(28)
+    header = view.horizontalHeader()
+    header.setResizeContentsPrecision(100)
+    header.setStretchLastSection(True)
+    return view
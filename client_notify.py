@@ -0,0 +1,160 @@
+# client_notify.py
+# Всплывающие уведомления: события копятся короткое окно и сворачиваются по категориям в одно окно
+# («12 новых оценок»), на экране одновременно не больше нескольких окон, а сами окна берутся из пула —
+# массовая выставка оценок или рассылка ДЗ больше не создаёт сотни окон с анимациями.
+from collections import OrderedDict, deque
+
+from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QRect, QObject
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel
+
+
+def plural(n, one, few, many):
+    n = abs(n) % 100
+    if 11 <= n <= 14: return many
+    n %= 10
+    if n == 1: return one
+    if 2 <= n <= 4: return few
+    return many
+
+
+class NotificationPopup(QWidget):
+    WIDTH = 360
+    HEIGHT = 90
+    MARGIN = 16
+    GAP = 10
+
+    def __init__(self, on_hidden, parent=None):
+        super().__init__(parent, Qt.Window | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.on_hidden = on_hidden
+        self.slot = None
+        self._build_ui()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.close_popup)
+        self._anim = QPropertyAnimation(self, b"geometry", self)
+        self._anim.setDuration(260)
+
+    def _build_ui(self):
+        self.resize(self.WIDTH, self.HEIGHT)
+        self.main = QVBoxLayout(self)
+        self.main.setContentsMargins(8, 8, 8, 8)
+        container = QWidget(self)
+        container.setStyleSheet("""
+            background: qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:1, stop:0 #ffffff, stop:1 #fff0f6);
+            border: 1px solid #ffd6ea;
+            border-radius: 10px;
+        """)
+        c_layout = QVBoxLayout(container)
+        self.lbl_title = QLabel()
+        self.lbl_title.setStyleSheet("font-weight:700; color:#ff2e6e;")
+        self.lbl_message = QLabel()
+        self.lbl_message.setWordWrap(True)
+        self.lbl_message.setStyleSheet("color:#40192a;")
+        c_layout.addWidget(self.lbl_title)
+        c_layout.addWidget(self.lbl_message)
+        self.main.addWidget(container)
+
+    def show_message(self, title, message, slot, duration):
+        # окно переиспользуется: меняются только тексты и место в стопке
+        self.lbl_title.setText(title)
+        self.lbl_message.setText(message)
+        self.slot = slot
+        geo = QApplication.primaryScreen().availableGeometry()
+        x = geo.x() + geo.width() - self.WIDTH - self.MARGIN
+        y = geo.y() + geo.height() - self.HEIGHT - self.MARGIN - slot * (self.HEIGHT + self.GAP)
+        start = QRect(geo.x() + geo.width() + 10, y, self.WIDTH, self.HEIGHT)
+        self._anim.stop()
+        self.setGeometry(start)
+        self.show()
+        self._anim.setStartValue(start)
+        self._anim.setEndValue(QRect(x, y, self.WIDTH, self.HEIGHT))
+        self._anim.start()
+        self._timer.start(duration * 1000)
+
+    def close_popup(self):
+        self._timer.stop()
+        self._anim.stop()
+        self.hide()
+        self.on_hidden(self)
+
+    def mousePressEvent(self, event):
+        self.close_popup()
+
+
+class NotificationCenter(QObject):
+    SAMPLES = 3  # сколько событий перечислить в сводке
+
+    def __init__(self, window_ms=1500, max_visible=3, max_queued=6, duration=6, on_flush=None, parent=None):
+        super().__init__(parent)
+        self.max_queued = max_queued
+        self.duration = duration
+        self.on_flush = on_flush
+        self._buckets = OrderedDict()  # категория -> накопленные за окно события
+        self._queue = deque()          # (заголовок, текст), ждут свободного места на экране
+        self._slots = [None] * max_visible
+        self._idle = []                # пул скрытых окон
+        self.dropped = 0
+        self._window = QTimer(self)
+        self._window.setSingleShot(True)
+        self._window.setInterval(window_ms)
+        self._window.timeout.connect(self.flush)
+
+    def notify(self, category, title, message, forms=None):
+        # forms — формы «одна/две/пять» для сводки: ("новая оценка", "новые оценки", "новых оценок")
+        b = self._buckets.get(category)
+        if b is None:
+            b = self._buckets[category] = {"title": title, "forms": forms, "count": 0, "samples": []}
+        b["count"] += 1
+        if len(b["samples"]) < self.SAMPLES:
+            b["samples"].append(message)
+        if not self._window.isActive():
+            self._window.start()
+
+    def flush(self):
+        self._window.stop()
+        buckets, self._buckets = self._buckets, OrderedDict()
+        if not buckets:
+            return
+        for b in buckets.values():
+            self._queue.append(self._render(b))
+        # если окна не успевают закрываться, старые сводки уступают место новым
+        while len(self._queue) > self.max_queued:
+            self._queue.popleft(); self.dropped += 1
+        if self.on_flush:
+            self.on_flush()
+        self._show_next()
+
+    def _render(self, b):
+        n = b["count"]
+        if n == 1:
+            return b["title"], b["samples"][0]
+        title = f"{n} {plural(n, *b['forms'])}" if b["forms"] else f"{b['title']}: {n}"
+        lines = [s.split("\n")[0] for s in b["samples"]]
+        rest = n - len(lines)
+        return title, "; ".join(lines) + (f" и ещё {rest}" if rest > 0 else "")
+
+    def _show_next(self):
+        while self._queue and None in self._slots:
+            slot = self._slots.index(None)
+            popup = self._idle.pop() if self._idle else NotificationPopup(self._on_hidden)
+            self._slots[slot] = popup
+            title, message = self._queue.popleft()
+            popup.show_message(title, message, slot, self.duration)
+
+    def _on_hidden(self, popup):
+        if popup.slot is not None and self._slots[popup.slot] is popup:
+            self._slots[popup.slot] = None
+        popup.slot = None
+        self._idle.append(popup)
+        self._show_next()
+
+    def clear(self):
+        self._window.stop()
+        self._buckets.clear(); self._queue.clear()
+        for popup in [p for p in self._slots if p is not None]:
+            popup.close_popup()
+
+    def pool_size(self):
+        return len(self._idle) + sum(1 for p in self._slots if p is not None)
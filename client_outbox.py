@@ -0,0 +1,88 @@
+# client_outbox.py
+# Очередь исходящих ДЗ на диске: отправка сначала записывается сюда, а потом уходит на сервер по порядку.
+# У каждой записи свой Idempotency-Key, поэтому повтор после обрыва связи не создаёт дубликат.
+import json
+import sqlite3
+import time
+import uuid
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+
+
+class Outbox:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                server_id INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_outbox_student_state ON outbox (student_id, state, id);
+        """)
+        self.conn.commit()
+        self.requeue_inflight()
+
+    def requeue_inflight(self):
+        # отправка, прерванная выходом или закрытием клиента, повторяется с тем же ключом
+        self.conn.execute("UPDATE outbox SET state=? WHERE state=?", (PENDING, SENDING))
+        self.conn.commit()
+
+    def enqueue(self, student_id, title, description, due_date, attachment=None):
+        now = time.time()
+        payload = {"title": title, "description": description, "due_date": due_date, "attachment": attachment}
+        cur = self.conn.execute(
+            "INSERT INTO outbox (student_id, idempotency_key, payload, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (student_id, uuid.uuid4().hex, json.dumps(payload, ensure_ascii=False), PENDING, now, now))
+        self.conn.commit()
+        return cur.lastrowid
+
+    def next_pending(self, student_id):
+        row = self.conn.execute(
+            "SELECT id, idempotency_key, payload FROM outbox WHERE student_id=? AND state=? ORDER BY id LIMIT 1",
+            (student_id, PENDING)).fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "key": row[1], **json.loads(row[2])}
+
+    def mark_sending(self, item_id):
+        self._update(item_id, "state=?, attempts=attempts+1", SENDING)
+
+    def mark_sent(self, item_id, server_id):
+        self._update(item_id, "state=?, server_id=?, last_error=NULL", SENT, server_id)
+
+    def mark_failed(self, item_id, error):
+        # сервер отклонил запрос — повтор не поможет
+        self._update(item_id, "state=?, last_error=?", FAILED, str(error))
+
+    def release(self, item_id, error):
+        # сеть недоступна — запись остаётся в очереди
+        self._update(item_id, "state=?, last_error=?", PENDING, str(error))
+
+    def retry_failed(self, student_id):
+        self.conn.execute("UPDATE outbox SET state=?, updated_at=? WHERE student_id=? AND state=?", (PENDING, time.time(), student_id, FAILED))
+        self.conn.commit()
+
+    def _update(self, item_id, assignments, *values):
+        self.conn.execute(f"UPDATE outbox SET {assignments}, updated_at=? WHERE id=?", (*values, time.time(), item_id))
+        self.conn.commit()
+
+    def recent(self, student_id, limit=20):
+        rows = self.conn.execute(
+            "SELECT id, payload, state, attempts, last_error, updated_at FROM outbox WHERE student_id=? ORDER BY id DESC LIMIT ?",
+            (student_id, limit)).fetchall()
+        return [{"id": r[0], "title": json.loads(r[1]).get("title"), "state": r[2], "attempts": r[3], "error": r[4], "updated_at": r[5]} for r in rows]
+
+    def count(self, student_id, state=PENDING):
+        return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE student_id=? AND state=?", (student_id, state)).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
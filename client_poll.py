@@ -0,0 +1,98 @@
+# client_poll.py
+# Планировщик опроса сервера вместо таймера с постоянным интервалом: после сбоев интервал растёт
+# с джиттером, пока окно скрыто в трее — опрос реже, после отправки ДЗ — ненадолго чаще,
+# а подсказка сервера Retry-After соблюдается.
+import random
+import time
+
+from PySide6.QtCore import QObject, QTimer
+
+
+class PollScheduler(QObject):
+    def __init__(self, on_tick, interval=60, hidden_factor=5, boost_interval=5, boost_window=60, max_backoff=600, parent=None):
+        super().__init__(parent)
+        self.on_tick = on_tick
+        self.interval = interval
+        self.hidden_factor = hidden_factor
+        self.boost_interval = boost_interval
+        self.boost_window = boost_window
+        self.max_backoff = max_backoff
+        self.visible = True
+        self.failures = 0
+        self._boost_until = 0.0
+        self._not_before = 0.0   # раньше этого момента не опрашивать (Retry-After)
+        self._due_at = None
+        self._last_tick = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self, now=True):
+        self.failures = 0
+        if now:
+            self._tick()
+        else:
+            self._schedule()
+
+    def stop(self):
+        self._timer.stop()
+        self._due_at = None
+
+    def is_active(self):
+        return self._timer.isActive()
+
+    def next_delay(self):
+        now = time.monotonic()
+        if self.failures:
+            # экспоненциальный рост с «полным» джиттером, но не чаще обычного интервала
+            cap = min(self.max_backoff, self.interval * 2 ** min(self.failures, 16))
+            delay = random.uniform(self.interval, max(self.interval, cap))
+        else:
+            delay = self.boost_interval if now < self._boost_until else self.interval
+            delay *= random.uniform(0.9, 1.1)
+        if not self.visible:
+            delay = min(max(delay, self.interval * self.hidden_factor), max(self.max_backoff, self.interval))
+        return max(delay, self._not_before - now, 1.0)
+
+    def _schedule(self):
+        delay = self.next_delay()
+        self._due_at = time.monotonic() + delay
+        self._timer.start(int(delay * 1000))
+
+    def _tick(self):
+        # следующий опрос назначается сразу: если ответ не придёт, опрос всё равно не остановится;
+        # succeeded/failed затем переназначают его от момента ответа
+        self._last_tick = time.monotonic()
+        self._schedule()
+        self.on_tick()
+
+    def succeeded(self):
+        self.failures = 0
+        self._not_before = 0.0
+        if self._due_at is not None: self._schedule()
+
+    def failed(self, retry_after=None):
+        self.failures += 1
+        if retry_after:
+            self._not_before = time.monotonic() + retry_after
+        if self._due_at is not None: self._schedule()
+
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        if self._due_at is None:
+            return
+        # окно снова показано — данные обновляются сразу, если с прошлого опроса прошёл интервал
+        if visible and self.failures == 0 and time.monotonic() - self._last_tick >= self.interval:
+            self._tick()
+        else:
+            self._schedule()
+
+    def boost(self):
+        self._boost_until = time.monotonic() + self.boost_window
+        if self._due_at is not None and self.failures == 0 and self._due_at - time.monotonic() > self.boost_interval:
+            self._schedule()
+
+    def seconds_left(self):
+        return None if self._due_at is None else max(0.0, self._due_at - time.monotonic())
@@ -0,0 +1,114 @@
+# client_reminders.py
+# Напоминания о сроках ДЗ: ближайшие сроки лежат в min-куче, и один QTimer взводится на следующее
+# напоминание, а не список перебирается целиком. Отправленные напоминания записываются в SQLite,
+# поэтому после перезапуска клиента то же напоминание не повторяется.
+import heapq
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, QTimer
+
+MAX_SLEEP_MS = 60 * 60 * 1000  # таймер просыпается хотя бы раз в час: после сна системы или перевода часов
+
+
+class ReminderScheduler(QObject):
+    def __init__(self, path, on_due, lead=timedelta(hours=24), parent=None):
+        super().__init__(parent)
+        self.on_due = on_due
+        self.lead = lead
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reminders_sent (
+                student_id INTEGER NOT NULL,
+                hw_id TEXT NOT NULL,
+                due TEXT NOT NULL,
+                sent_at REAL NOT NULL,
+                PRIMARY KEY (student_id, hw_id, due)
+            );
+        """)
+        self.conn.commit()
+        self.student_id = None
+        self._sent = set()     # (id ДЗ, срок) — уже показанные напоминания
+        self._armed = {}       # id ДЗ -> (срок, ДЗ), по которым напоминание ещё впереди
+        self._heap = []        # (время напоминания, срок, id ДЗ); устаревшие записи отбрасываются при извлечении
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+
+    def set_student(self, student_id):
+        self._timer.stop()
+        self.student_id = student_id
+        self._armed = {}; self._heap = []; self._sent = set()
+        if student_id is None:
+            return
+        # сроки старше недели больше не понадобятся
+        self.conn.execute("DELETE FROM reminders_sent WHERE sent_at < ?", (time.time() - 7 * 86400 - self.lead.total_seconds(),))
+        self.conn.commit()
+        self._sent = {(r[0], datetime.fromisoformat(r[1])) for r in self.conn.execute("SELECT hw_id, due FROM reminders_sent WHERE student_id=?", (student_id,))}
+
+    def update(self, entries, now=None):
+        # entries — [(срок, ДЗ)] из DueDateIndex; в кучу попадают только новые или сдвинутые сроки
+        if self.student_id is None:
+            return
+        now = now or datetime.now()
+        armed = {}
+        for due, hw in entries:
+            key = str(hw.get("id"))
+            if due < now or (key, due) in self._sent:
+                continue
+            prev = self._armed.get(key)
+            if prev is None or prev[0] != due:
+                heapq.heappush(self._heap, (due - self.lead, due, key))
+            armed[key] = (due, hw)
+        self._armed = armed
+        if len(self._heap) > 2 * len(armed) + 64:
+            self._heap = [(due - self.lead, due, key) for key, (due, _) in armed.items()]
+            heapq.heapify(self._heap)
+        self._arm(now)
+
+    def _arm(self, now):
+        at = self.next_at()
+        if at is None:
+            self._timer.stop()
+            return
+        delay = (at - now).total_seconds() * 1000
+        self._timer.start(int(min(max(delay, 0), MAX_SLEEP_MS)))
+
+    def _stale(self, entry):
+        armed = self._armed.get(entry[2])
+        return armed is None or armed[0] != entry[1]
+
+    def _fire(self):
+        now = datetime.now()
+        heap = self._heap; fired = []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if self._stale(entry):
+                continue
+            due, hw = self._armed.pop(entry[2])
+            if due < now:
+                continue
+            self._sent.add((entry[2], due))
+            fired.append((due, hw))
+        if fired:
+            self.conn.executemany("INSERT OR IGNORE INTO reminders_sent (student_id, hw_id, due, sent_at) VALUES (?, ?, ?, ?)",
+                                  [(self.student_id, str(hw.get("id")), due.isoformat(), time.time()) for due, hw in fired])
+            self.conn.commit()
+            for due, hw in fired:
+                self.on_due(due, hw)
+        self._arm(now)
+
+    def pending(self):
+        return len(self._armed)
+
+    def next_at(self):
+        heap = self._heap
+        while heap and self._stale(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def close(self):
+        self._timer.stop()
+        self.conn.close()
@@ -0,0 +1,69 @@
+# client_startup.py
+# Замер холодного старта клиента (python client.py --profile-startup): импорт модулей, сборка окна,
+# первая отрисовка и первые данные после входа. С --check процесс завершается после первой отрисовки
+# с кодом 1, если она не уложилась в бюджет, — это проверка на регрессию времени запуска.
+import sys
+import time
+
+from PySide6.QtCore import QObject, QEvent, QTimer
+from PySide6.QtWidgets import QApplication
+
+
+class StartupProfiler(QObject):
+    def __init__(self, t0, marks=(), budget_ms=None, check=False, out=None):
+        super().__init__()
+        self.t0 = t0
+        self.marks = [(name, (t - t0) * 1000) for name, t in marks]
+        self.budget_ms = budget_ms
+        self.check = check
+        self.out = out or sys.stderr
+        self._login_at = None
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - self.t0) * 1000))
+
+    def elapsed(self, name):
+        return next((ms for n, ms in self.marks if n == name), None)
+
+    def watch(self, app):
+        # фильтр событий на всё приложение дорогой — он снимается сразу после первой отрисовки окна
+        app.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj.isWidgetType() and obj.isWindow():
+            QApplication.instance().removeEventFilter(self)
+            self.mark("первая отрисовка")
+            QTimer.singleShot(0, self._on_first_paint)
+        return False
+
+    def _on_first_paint(self):
+        self.report()
+        if self.check:
+            QApplication.exit(0 if self.within_budget() else 1)
+
+    def within_budget(self):
+        paint = self.elapsed("первая отрисовка")
+        return self.budget_ms is None or (paint is not None and paint <= self.budget_ms)
+
+    def logged_in(self):
+        if self._login_at is None:
+            self._login_at = time.perf_counter()
+
+    def first_data(self, source):
+        # source — «кэш» или «сервер»; отмечается только первый раз для каждого источника
+        name = f"первые данные ({source})"
+        if self._login_at is None or self.elapsed(name) is not None:
+            return
+        self.mark(name)
+        after_login = (time.perf_counter() - self._login_at) * 1000
+        print(f"[startup] {name}: {after_login:.0f} мс после входа", file=self.out)
+
+    def report(self):
+        prev = 0.0
+        for name, ms in self.marks:
+            print(f"[startup] {name:<24} {ms:8.0f} мс  (+{ms - prev:.0f})", file=self.out)
+            prev = ms
+        if self.budget_ms is not None:
+            paint = self.elapsed("первая отрисовка")
+            verdict = "OK" if self.within_budget() else "ПРЕВЫШЕН"
+            print(f"[startup] бюджет первой отрисовки {self.budget_ms} мс: {verdict} ({paint:.0f} мс)", file=self.out)
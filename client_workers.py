@@ -0,0 +1,127 @@
+# client_workers.py
+# Сетевые вызовы клиента выполняются в QThreadPool, результаты возвращаются в GUI-поток сигналом.
+import itertools
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Qt, Signal, Slot
+
+
+class _Task(QRunnable):
+    def __init__(self, runner, task_id, fn, args, kwargs):
+        super().__init__()
+        self.runner = runner
+        self.task_id = task_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.runner._finished.emit(self.task_id, False, e)
+            return
+        self.runner._finished.emit(self.task_id, True, result)
+
+
+class TaskRunner(QObject):
+    # сигнал испускается из потока пула, а слот живёт в GUI-потоке — Qt доставляет его через очередь событий.
+    # Отмена — по группам: у группы растёт поколение, и результаты старых задач просто отбрасываются
+    _finished = Signal(int, bool, object)
+
+    def __init__(self, parent=None, max_threads=6):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._generation = {}
+        self._finished.connect(self._on_finished, Qt.QueuedConnection)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, group="default", **kwargs):
+        task_id = next(self._ids)
+        self._pending[task_id] = (group, self._generation.get(group, 0), on_done, on_error)
+        self.pool.start(_Task(self, task_id, fn, args, kwargs))
+        return task_id
+
+    def gather(self, calls, on_done=None, on_error=None, group="default"):
+        # calls — список (fn, args); колбэк получает результаты в том же порядке, когда завершатся все
+        results = [None] * len(calls)
+        state = {"left": len(calls), "error": None}
+
+        def finish(i, ok, value):
+            if ok:
+                results[i] = value
+            elif state["error"] is None:
+                state["error"] = value
+            state["left"] -= 1
+            if state["left"] == 0:
+                if state["error"] is not None:
+                    if on_error: on_error(state["error"])
+                elif on_done:
+                    on_done(results)
+
+        for i, (fn, args) in enumerate(calls):
+            self.submit(fn, *args, group=group,
+                        on_done=lambda v, i=i: finish(i, True, v),
+                        on_error=lambda e, i=i: finish(i, False, e))
+
+    def cancel(self, group=None):
+        groups = [group] if group is not None else {g for g, *_ in self._pending.values()}
+        for g in groups:
+            self._generation[g] = self._generation.get(g, 0) + 1
+
+    def busy(self, group):
+        gen = self._generation.get(group, 0)
+        return any(g == group and gn == gen for g, gn, *_ in self._pending.values())
+
+    @Slot(int, bool, object)
+    def _on_finished(self, task_id, ok, value):
+        entry = self._pending.pop(task_id, None)
+        if entry is None:
+            return
+        group, gen, on_done, on_error = entry
+        if self._generation.get(group, 0) != gen:
+            return
+        cb = on_done if ok else on_error
+        if cb:
+            cb(value)
+
+
+class StallMonitor(QObject):
+    # таймер на каждый кадр (~16 мс): насколько позже срабатывает тик, настолько был занят GUI-поток
+    FRAME_MS = 16
+
+    def __init__(self, parent=None, window=600):
+        super().__init__(parent)
+        self._samples = deque(maxlen=window)
+        self._last = None
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.setInterval(self.FRAME_MS)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        stall = (now - self._last) * 1000 - self.FRAME_MS
+        self._last = now
+        self._samples.append(max(0.0, stall))
+
+    def report(self):
+        if not self._samples:
+            return {"max_ms": 0.0, "p95_ms": 0.0, "over_frame": 0, "samples": 0}
+        ordered = sorted(self._samples)
+        return {
+            "max_ms": ordered[-1],
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "over_frame": sum(1 for s in ordered if s > self.FRAME_MS),
+            "samples": len(ordered),
+        }
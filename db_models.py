@@ -1,10 +1,15 @@
 # db_models.py
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import create_engine, event, inspect, text, select, func, Column, Integer, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, validates, Session
 from werkzeug.security import generate_password_hash, check_password_hash
 import config  # читаем настройки из config.py
+from timetable import parse_time_range, normalize_day, normalize_resource, resource_key, WEEK_DAYS
 
 Base = declarative_base()
 
@@ -34,9 +39,32 @@ class ScheduleItem(Base):
     program = Column(String(128), nullable=False)
     week_day = Column(String(32), nullable=False)  # e.g. Monday
     time = Column(String(64), nullable=False)
+    start_min = Column(Integer, nullable=True)  # минуты от 00:00, заполняются из time
+    end_min = Column(Integer, nullable=True)
     subject = Column(String(255), nullable=False)
     classroom = Column(String(64), nullable=True)
     teacher = Column(String(128), nullable=True)
+    classroom_key = Column(String(64), nullable=True)  # resource_key(classroom), заполняется валидатором
+    teacher_key = Column(String(128), nullable=True)
+
+    __table_args__ = (
+        Index('ix_schedule_day_classroom_key', 'week_day', 'classroom_key', 'start_min'),
+        Index('ix_schedule_day_teacher_key', 'week_day', 'teacher_key', 'start_min'),
+    )
+
+    @validates('time')
+    def _parse_time(self, key, value):
+        self.start_min, self.end_min = parse_time_range(value)
+        return value.strip()
+
+    @validates('week_day')
+    def _normalize_day(self, key, value):
+        return normalize_day(value)
+
+    @validates('classroom', 'teacher')
+    def _normalize_resource(self, key, value):
+        setattr(self, key + '_key', resource_key(value))
+        return normalize_resource(value)
 
 class Homework(Base):
     __tablename__ = 'homeworks'
@@ -49,9 +77,15 @@ class Homework(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     pushed = Column(Integer, default=0)
     attachment = Column(String(512), nullable=True)
+    # ключ из заголовка Idempotency-Key: повторная отправка того же ДЗ возвращает уже созданную запись
+    idempotency_key = Column(String(64), nullable=True)
 
     student = relationship('Student', back_populates='homeworks')
 
+    __table_args__ = (
+        Index('ux_homework_student_idempotency', 'student_id', 'idempotency_key', unique=True),
+    )
+
 class Grade(Base):
     __tablename__ = 'grades'
     id = Column(Integer, primary_key=True)
@@ -63,6 +97,60 @@ class Grade(Base):
 
     student = relationship('Student', back_populates='grades')
 
+# Архив закрытых учебных лет (команда archive в консоли): те же колонки плюс academic_year, без внешних
+# ключей. На MySQL архив секционирован по году (RANGE) — у секционированных таблиц InnoDB не бывает
+# внешних ключей, поэтому горячие homeworks/grades остаются обычными таблицами.
+_ARCHIVE_PARTITIONS = 'RANGE (academic_year) (PARTITION p_future VALUES LESS THAN MAXVALUE)'
+
+class HomeworkArchive(Base):
+    __tablename__ = 'homeworks_archive'
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    academic_year = Column(Integer, primary_key=True, autoincrement=False)
+    student_id = Column(Integer, nullable=True)
+    program = Column(String(128), nullable=True)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    due_date = Column(String(64), nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    pushed = Column(Integer, default=0)
+    attachment = Column(String(512), nullable=True)
+    idempotency_key = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index('ix_homeworks_archive_student', 'student_id', 'academic_year'),
+        Index('ix_homeworks_archive_program', 'program', 'academic_year'),
+        {'mysql_partition_by': _ARCHIVE_PARTITIONS},
+    )
+
+class GradeArchive(Base):
+    __tablename__ = 'grades_archive'
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    academic_year = Column(Integer, primary_key=True, autoincrement=False)
+    student_id = Column(Integer, nullable=False)
+    subject = Column(String(255), nullable=False)
+    grade = Column(String(32), nullable=False)
+    comment = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_grades_archive_student', 'student_id', 'academic_year'),
+        {'mysql_partition_by': _ARCHIVE_PARTITIONS},
+    )
+
+class ShardMapEntry(Base):
+    # привязка направления к шарду; хранится в БД шарда по умолчанию
+    __tablename__ = 'shard_map'
+    program = Column(String(128), primary_key=True)
+    shard = Column(String(64), nullable=False)
+
+class IdBlock(Base):
+    # hi/lo-счётчики id: при шардировании id выдаются блоками, чтобы быть уникальными во всех шардах
+    __tablename__ = 'id_blocks'
+    name = Column(String(64), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+SHARDED_MODELS = (Student, ScheduleItem, Homework, Grade)
+
 def get_database_url():
     if getattr(config, "DATABASE_URL", None):
         return config.DATABASE_URL
@@ -73,12 +161,412 @@ def get_database_url():
     db = getattr(config, "MYSQL_DB", "student_dashboard")
     return f'mysql+pymysql://{user}:{password}@{host}:{port}/{db}?charset=utf8mb4'
 
-def get_engine():
-    db_url = get_database_url()
-    return create_engine(db_url, echo=False, future=True, pool_pre_ping=True)
+# SQLite для одного сервера: WAL (читатели не ждут писателя), synchronous=NORMAL (в WAL теряются
+# максимум последние транзакции при отключении питания, файл не портится), большой кэш и mmap
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,          # КиБ: 64 МиБ на соединение
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+def get_engine(db_url=None, readonly=False):
+    # SQLite: PRAGMA из SQLITE_PRAGMAS на каждом новом соединении, readonly — query_only для пула читателей.
+    # Транзакциями по-прежнему управляет pysqlite: BEGIN перед первым изменением, поэтому SELECT не держат
+    # снимок, а писатели ждут блокировку busy_timeout секунд, а не получают «database is locked» при повышении
+    if db_url is None:
+        db_url = get_database_url()
+    if not db_url.startswith('sqlite') or not getattr(config, 'SQLITE_TUNED', True):
+        return create_engine(db_url, echo=False, future=True, pool_pre_ping=True)
+    engine = create_engine(db_url, echo=False, future=True, connect_args={'timeout': getattr(config, 'SQLITE_BUSY_TIMEOUT_SEC', 30)})
+    pragmas = dict(SQLITE_PRAGMAS, **getattr(config, 'SQLITE_PRAGMAS', {}))
+    if readonly:
+        pragmas['query_only'] = 'ON'
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_conn, record):
+        cur = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cur.execute(f'PRAGMA {name}={value}')
+        cur.close()
+    return engine
+
+def sqlite_checkpoint(engine, optimize=False):
+    # пассивный checkpoint не ждёт ни читателей, ни писателя; optimize обновляет статистику планировщика
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        busy, wal_pages, moved = conn.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)').one()
+        if optimize:
+            conn.exec_driver_sql('PRAGMA optimize')
+    return wal_pages, moved
+
+class ReplicaRouter:
+    # чтение — по кругу по живым репликам, запись — в основную БД;
+    # после записи студента (sticky_key) его чтения какое-то время тоже идут в основную БД
+    def __init__(self, primary, replicas=(), sticky_sec=5, health_interval=10):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_sec = sticky_sec
+        self.health_interval = health_interval
+        self._healthy = list(self.replicas)
+        self._next = 0
+        self._written = {}
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    def writer(self):
+        return self.primary
+
+    def reader(self, sticky_key=None):
+        with self._lock:
+            if sticky_key is not None:
+                until = self._written.get(sticky_key)
+                if until is not None:
+                    if until > time.monotonic():
+                        return self.primary
+                    del self._written[sticky_key]
+            if not self._healthy:
+                return self.primary
+            self._next = (self._next + 1) % len(self._healthy)
+            return self._healthy[self._next]
+
+    def mark_written(self, sticky_key):
+        with self._lock:
+            self._written[sticky_key] = time.monotonic() + self.sticky_sec
+
+    def check_health(self):
+        healthy = []
+        for eng in self.replicas:
+            try:
+                with eng.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+                healthy.append(eng)
+            except Exception as e:
+                print('Replica unavailable:', eng.url.render_as_string(hide_password=True), e)
+        with self._lock:
+            self._healthy = healthy
+            now = time.monotonic()
+            self._written = {k: v for k, v in self._written.items() if v > now}
+        return healthy
+
+    def start_health_checks(self):
+        if not self.replicas or self._health_thread:
+            return
+        def loop():
+            while True:
+                self.check_health()
+                time.sleep(self.health_interval)
+        self._health_thread = threading.Thread(target=loop, name='replica-health', daemon=True)
+        self._health_thread.start()
+
+def get_router():
+    url = get_database_url()
+    replica_urls = getattr(config, 'DATABASE_REPLICA_URLS', [])
+    sticky = getattr(config, 'REPLICA_STICKY_SEC', 5)
+    if url.startswith('sqlite') and not replica_urls and getattr(config, 'SQLITE_TUNED', True):
+        # один файл SQLite: чтения — через отдельный пул соединений только для чтения к тому же файлу;
+        # в WAL они сразу видят записанное, поэтому sticky-чтения не нужны
+        return ReplicaRouter(get_engine(url), [get_engine(url, readonly=True)], sticky_sec=0,
+                             health_interval=getattr(config, 'REPLICA_HEALTH_INTERVAL_SEC', 10))
+    return ReplicaRouter(get_engine(url), [get_engine(u) for u in replica_urls], sticky_sec=sticky,
+                         health_interval=getattr(config, 'REPLICA_HEALTH_INTERVAL_SEC', 10))
+
+class ShardSet:
+    # шарды по направлению (program): имя -> ReplicaRouter; при одном шарде всё работает как одна БД
+    def __init__(self, routers, default, map_ttl=30, id_block=100):
+        self.routers = routers
+        self.default = default
+        self.sharded = len(routers) > 1
+        self.map_ttl = map_ttl
+        self.id_block = id_block
+        self._map = {}
+        self._map_loaded = 0
+        self._students = OrderedDict()
+        self.cache_hits = self.cache_misses = 0  # кэш направлений студентов (для консоли stats)
+        self._ids = {}
+        self._lock = threading.Lock()
+        self._maintenance_thread = None
+
+    def names(self):
+        return list(self.routers)
+
+    def directory(self):
+        return self.routers[self.default].writer()
+
+    def init_all(self):
+        for r in self.routers.values():
+            init_db(r.writer())
+        if self.sharded:
+            sess = get_session(self.directory())
+            try:
+                known = {e.program for e in sess.query(ShardMapEntry)}
+                for program, shard in getattr(config, 'SHARD_MAP', {}).items():
+                    if program not in known:
+                        sess.add(ShardMapEntry(program=program, shard=shard))
+                sess.commit()
+            finally:
+                sess.close()
+            self.reload_map()
+
+    def reload_map(self):
+        sess = get_session(self.directory())
+        try:
+            mapping = {e.program: e.shard for e in sess.query(ShardMapEntry)}
+        finally:
+            sess.close()
+        with self._lock:
+            self._map = mapping
+            self._map_loaded = time.monotonic()
+
+    def shard_for(self, program):
+        if not self.sharded or program is None:
+            return self.default
+        if time.monotonic() - self._map_loaded > self.map_ttl:
+            self.reload_map()
+        shard = self._map.get(program, self.default)
+        return shard if shard in self.routers else self.default
+
+    def engine(self, shard=None, readonly=False, sticky_key=None):
+        r = self.routers[shard or self.default]
+        return r.reader(sticky_key) if readonly else r.writer()
+
+    def engine_for(self, program, readonly=False, sticky_key=None):
+        return self.engine(self.shard_for(program), readonly, sticky_key)
+
+    def mark_written(self, program, sticky_key):
+        self.routers[self.shard_for(program)].mark_written(sticky_key)
+
+    def start_health_checks(self):
+        for r in self.routers.values():
+            r.start_health_checks()
+
+    def start_maintenance(self, interval=None):
+        # checkpoint/optimize для шардов на SQLite; на других СУБД ничего не делает
+        interval = interval or getattr(config, 'SQLITE_MAINTENANCE_SEC', 300)
+        engines = [r.writer() for r in self.routers.values() if r.writer().dialect.name == 'sqlite' and getattr(config, 'SQLITE_TUNED', True)]
+        if not engines or self._maintenance_thread:
+            return
+        def loop():
+            runs = 0
+            while True:
+                time.sleep(interval)
+                runs += 1
+                for eng in engines:
+                    try:
+                        sqlite_checkpoint(eng, optimize=runs % 12 == 0)
+                    except Exception as e:
+                        print('SQLite maintenance failed:', e)
+        self._maintenance_thread = threading.Thread(target=loop, name='sqlite-maintenance', daemon=True)
+        self._maintenance_thread.start()
+
+    def locate_student(self, student_id):
+        # направление студента (по нему выбирается шард); без шардирования — None, лишнего запроса нет
+        if not self.sharded:
+            return None
+        with self._lock:
+            if student_id in self._students:
+                self._students.move_to_end(student_id)
+                self.cache_hits += 1
+                return self._students[student_id]
+            self.cache_misses += 1
+        for name in self.routers:
+            with self.engine(name, readonly=True).connect() as conn:
+                program = conn.execute(select(Student.program).where(Student.id == student_id)).scalar()
+            if program is not None:
+                with self._lock:
+                    self._students[student_id] = program
+                    if len(self._students) > 10000:
+                        self._students.popitem(last=False)
+                return program
+        return None
+
+    def next_id(self, table):
+        with self._lock:
+            nxt, end = self._ids.get(table, (0, 0))
+            if nxt >= end:
+                nxt, end = self._reserve_ids(table)
+            self._ids[table] = (nxt + 1, end)
+            return nxt
+
+    def _reserve_ids(self, table):
+        model = next(m for m in SHARDED_MODELS if m.__tablename__ == table)
+        for _ in range(3):
+            with self.directory().begin() as conn:
+                start = conn.execute(select(IdBlock.next_id).where(IdBlock.name == table).with_for_update()).scalar()
+                if start is not None:
+                    conn.execute(IdBlock.__table__.update().where(IdBlock.name == table).values(next_id=start + self.id_block))
+                    return start, start + self.id_block
+            # первый запуск: начинаем после максимального id во всех шардах
+            start = 1 + max(self._max_id(name, model) for name in self.routers)
+            try:
+                with self.directory().begin() as conn:
+                    conn.execute(IdBlock.__table__.insert().values(name=table, next_id=start + self.id_block))
+                return start, start + self.id_block
+            except IntegrityError:
+                continue  # блок уже создал другой процесс
+        raise RuntimeError(f'cannot reserve ids for {table}')
+
+    def move_program(self, program, dst, batch_size=500, progress=None):
+        # копируем строки направления на новый шард пачками (id сохраняются), переключаем карту,
+        # затем удаляем их на старом шарде; повторный запуск после сбоя сначала чистит недокопированное
+        src_eng, dst_eng = self.engine(self.shard_for(program)), self.engine(dst)
+        students = select(Student.id).where(Student.program == program).scalar_subquery()
+        criteria = [
+            (Student, Student.program == program),
+            (Homework, (Homework.program == program) | Homework.student_id.in_(students)),
+            (Grade, Grade.student_id.in_(students)),
+            # архив без внешних ключей, но ссылается на студентов: удаляется раньше них
+            (HomeworkArchive, (HomeworkArchive.program == program) | HomeworkArchive.student_id.in_(students)),
+            (GradeArchive, GradeArchive.student_id.in_(students)),
+            (ScheduleItem, ScheduleItem.program == program),
+        ]
+        for model, where in reversed(criteria):
+            _delete_rows(dst_eng, model, where, batch_size)
+        moved = {}
+        for model, where in criteria:
+            moved[model.__tablename__] = _copy_rows(src_eng, dst_eng, model, where, batch_size)
+            if progress:
+                progress(model.__tablename__, moved[model.__tablename__])
+        with get_session(self.directory()) as sess:
+            entry = sess.get(ShardMapEntry, program)
+            if entry:
+                entry.shard = dst
+            else:
+                sess.add(ShardMapEntry(program=program, shard=dst))
+            sess.commit()
+        self.reload_map()
+        for model, where in reversed(criteria):
+            _delete_rows(src_eng, model, where, batch_size)
+        return moved
+
+    def _max_id(self, shard, model):
+        with self.engine(shard).connect() as conn:
+            return conn.execute(select(func.max(model.id))).scalar() or 0
+
+def _copy_rows(src, dst, model, where, batch_size):
+    table = model.__table__
+    last_id, total = 0, 0
+    while True:
+        with src.connect() as conn:
+            rows = conn.execute(select(table).where(where, table.c.id > last_id).order_by(table.c.id).limit(batch_size)).mappings().all()
+        if not rows:
+            return total
+        with dst.begin() as conn:
+            conn.execute(table.insert(), [dict(r) for r in rows])
+        last_id = rows[-1]['id']
+        total += len(rows)
+
+def _delete_rows(eng, model, where, batch_size):
+    # удаляем пачками по id, чтобы не держать длинную блокировку
+    table = model.__table__
+    while True:
+        with eng.begin() as conn:
+            ids = conn.execute(select(table.c.id).where(where).limit(batch_size)).scalars().all()
+            if not ids:
+                return
+            conn.execute(table.delete().where(table.c.id.in_(ids)))
+
+_shards = None
+
+def get_shards():
+    global _shards
+    if _shards is None:
+        sticky = getattr(config, 'REPLICA_STICKY_SEC', 5)
+        interval = getattr(config, 'REPLICA_HEALTH_INTERVAL_SEC', 10)
+        shard_cfg = getattr(config, 'SHARDS', {})
+        if not shard_cfg:
+            _shards = ShardSet({'default': get_router()}, 'default')
+        else:
+            default = getattr(config, 'DEFAULT_SHARD', next(iter(shard_cfg)))
+            if default not in shard_cfg:
+                # в шарде по умолчанию лежат карта шардов и счётчики id — молча подставлять другой нельзя
+                raise RuntimeError(f'DEFAULT_SHARD {default!r} is not in SHARDS ({", ".join(shard_cfg)}); '
+                                   f'set DEFAULT_SHARD to one of them')
+            routers = {}
+            for name, spec in shard_cfg.items():
+                if isinstance(spec, str):
+                    spec = {'url': spec}
+                routers[name] = ReplicaRouter(get_engine(spec['url']), [get_engine(u) for u in spec.get('replicas', [])],
+                                              sticky_sec=sticky, health_interval=interval)
+            _shards = ShardSet(routers, default)
+    return _shards
+
+@event.listens_for(Session, 'before_flush')
+def _assign_shard_ids(session, flush_context, instances):
+    # id назначаются до отправки INSERT, чтобы не брать блок id посреди записи в тот же файл SQLite
+    if _shards is None or not _shards.sharded:
+        return
+    for obj in session.new:
+        if isinstance(obj, SHARDED_MODELS) and obj.id is None:
+            obj.id = _shards.next_id(obj.__tablename__)
+
+def shard_sessions(readonly=False):
+    # по сессии на каждый шард — для scatter-gather запросов
+    shards = get_shards()
+    for name in shards.names():
+        sess = get_session(shards.engine(name, readonly))
+        try:
+            yield sess
+        finally:
+            sess.close()
+
+# индексы прежних версий, которые заменены другими
+_OBSOLETE_INDEXES = {'schedule': ('ix_schedule_day_classroom', 'ix_schedule_day_teacher')}
+
+def init_db(engine):
+    # create_all не меняет уже существующие таблицы: недостающие колонки и индексы добавляем сами
+    Base.metadata.create_all(engine)
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c['name'] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    col_type = col.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+    for table in Base.metadata.sorted_tables:
+        existing = {i['name'] for i in insp.get_indexes(table.name)}
+        for idx in table.indexes:
+            if idx.name not in existing:
+                idx.create(engine)
+        for name in _OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(f'DROP INDEX {name} ON {table.name}' if engine.dialect.name == 'mysql' else f'DROP INDEX {name}'))
+    backfill_schedule_times(engine)
+    from search import ensure_search_index  # search импортирует модели, поэтому не на уровне модуля
+    ensure_search_index(engine)
+
+def backfill_schedule_times(engine):
+    # старые строки расписания без start_min/end_min; нераспознанное время остаётся NULL (видно в audit_schedule)
+    sess = get_session(engine)
+    try:
+        for si in sess.query(ScheduleItem).filter(ScheduleItem.start_min.is_(None)):
+            try:
+                si.start_min, si.end_min = parse_time_range(si.time)
+            except ValueError:
+                continue
+        # ключи сравнения аудиторий/преподавателей: casefold есть только в Python, не в SQL
+        for si in sess.query(ScheduleItem).filter(
+                (ScheduleItem.classroom.isnot(None) & ScheduleItem.classroom_key.is_(None))
+                | (ScheduleItem.teacher.isnot(None) & ScheduleItem.teacher_key.is_(None))):
+            si.classroom_key, si.teacher_key = resource_key(si.classroom), resource_key(si.teacher)
+        sess.commit()
+    finally:
+        sess.close()
+    # написание дней и аудиторий/преподавателей — как у новых строк (валидаторы ScheduleItem),
+    # иначе точное сравнение в find_conflicts их не найдёт
+    t = ScheduleItem.__table__
+    with engine.begin() as conn:
+        for col in (t.c.classroom, t.c.teacher):
+            conn.execute(t.update().where((col != func.trim(col)) | (col == '')).values({col.name: func.nullif(func.trim(col), '')}))
+        for day in WEEK_DAYS:
+            conn.execute(t.update().where(func.lower(func.trim(t.c.week_day)) == day.lower(), t.c.week_day != day).values(week_day=day))
 
-def get_session(engine=None):
+def get_session(engine=None, program=None, readonly=False, sticky_key=None):
+    # без явного engine сессия открывается на шарде направления (по умолчанию — основная БД)
     if engine is None:
-        engine = get_engine()
+        engine = get_shards().engine_for(program, readonly, sticky_key)
     Session = sessionmaker(bind=engine, autoflush=False)
     return Session()
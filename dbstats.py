@@ -0,0 +1,264 @@
+# dbstats.py
+# Статистика БД для команды консоли stats. В процессе API QueryStats замеряет каждый запрос событиями
+# движков SQLAlchemy (время по нормализованному тексту, медленные запросы, попадания в пул соединений
+# и в кэш скомпилированных запросов) и раз в QUERY_STATS_FLUSH_SEC секунд сбрасывает накопленное
+# в небольшой локальный файл SQLite: медленные запросы там — кольцевой буфер на SLOW_QUERY_KEEP строк.
+# Консоль читает этот файл и сама смотрит размеры таблиц и индексы в каждой БД.
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+from db_models import Base
+
+MAX_STATEMENTS = 1000
+MAX_STATEMENT_LEN = 2000
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS statements (engine TEXT, statement TEXT, calls INTEGER, total_ms REAL, max_ms REAL, '
+    'PRIMARY KEY (engine, statement))',
+    'CREATE TABLE IF NOT EXISTS slow_queries (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, engine TEXT, ms REAL, statement TEXT)',
+    'CREATE TABLE IF NOT EXISTS counters (pid INTEGER, name TEXT, hits INTEGER, misses INTEGER, updated REAL, PRIMARY KEY (pid, name))',
+)
+# счётчики процессов, которые не обновлялись сутки, удаляются
+COUNTERS_TTL_SEC = 24 * 3600
+
+
+@lru_cache(maxsize=4096)
+def normalize(statement):
+    # IN (?, ?, ...) и VALUES (...), (...) разной длины — один и тот же запрос
+    statement = re.sub(r'\((\?|%s)(?:, \1)+\)', r'(\1)', statement)
+    statement = re.sub(r'(\([^()]*\))(?:, \1)+', r'\1', statement)
+    return ' '.join(statement.split())[:MAX_STATEMENT_LEN]
+
+
+class QueryStats:
+    def __init__(self, path, slow_ms=100, keep=500):
+        self.path = path
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self._stmts = {}     # (движок, запрос) -> [вызовов, всего мс, максимум мс]
+        self._slow = deque(maxlen=keep)
+        self._counters = {}  # имя -> два счётчика (см. flush)
+        self._caches = {}    # имя -> функция, возвращающая (попадания, промахи)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def attach(self, engine, name):
+        counters = self._counters
+        pool, compiled = counters.setdefault(f'pool {name}', [0, 0]), counters.setdefault(f'statement cache {name}', [0, 0])
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            ms = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+            key = normalize(statement)
+            cache = getattr(context, 'cache_hit', None)
+            with self._lock:
+                agg = self._stmts.get((name, key))
+                if agg is None:
+                    if len(self._stmts) >= MAX_STATEMENTS:
+                        key = '(other statements)'
+                    agg = self._stmts.setdefault((name, key), [0, 0.0, 0.0])
+                agg[0] += 1; agg[1] += ms
+                agg[2] = max(agg[2], ms)
+                if ms >= self.slow_ms:
+                    self._slow.append((time.time(), name, ms, key))
+                if cache is CACHE_HIT:
+                    compiled[0] += 1
+                elif cache is CACHE_MISS:
+                    compiled[1] += 1
+
+        # выдача соединения из пула: новое соединение — промах, остальное — попадание
+        @event.listens_for(engine, 'checkout')
+        def _checkout(dbapi_conn, record, proxy):
+            pool[0] += 1
+
+        @event.listens_for(engine, 'connect')
+        def _connect(dbapi_conn, record):
+            pool[1] += 1
+
+    def attach_shards(self, shards):
+        for name, router in shards.routers.items():
+            self.attach(router.primary, name)
+            for i, engine in enumerate(router.replicas, 1):
+                self.attach(engine, f'{name}/replica{i}')
+        if shards.sharded:
+            self.track_cache('student -> shard cache', lambda: (shards.cache_hits, shards.cache_misses))
+
+    def track_cache(self, name, counts):
+        self._caches[name] = counts
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        for ddl in _SCHEMA:
+            conn.execute(ddl)
+        return conn
+
+    def flush(self):
+        with self._lock:
+            stmts, self._stmts = self._stmts, {}
+            slow = list(self._slow)
+            self._slow.clear()
+            # пул: все выдачи и новые соединения; кэш запросов: попадания и промахи
+            counters = {name: (a - b, b) if name.startswith('pool') else (a, b) for name, (a, b) in self._counters.items()}
+        counters.update({name: tuple(fn()) for name, fn in self._caches.items()})
+        now = time.time()
+        conn = self._open()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT INTO statements VALUES (?, ?, ?, ?, ?) ON CONFLICT (engine, statement) DO UPDATE SET '
+                    'calls = calls + excluded.calls, total_ms = total_ms + excluded.total_ms, max_ms = MAX(max_ms, excluded.max_ms)',
+                    [(engine, key, *agg) for (engine, key), agg in stmts.items()])
+                if slow:
+                    conn.executemany('INSERT INTO slow_queries (ts, engine, ms, statement) VALUES (?, ?, ?, ?)', slow)
+                    conn.execute('DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?', (self.keep,))
+                conn.executemany('INSERT OR REPLACE INTO counters VALUES (?, ?, ?, ?, ?)',
+                                 [(os.getpid(), name, hits, misses, now) for name, (hits, misses) in counters.items()])
+                conn.execute('DELETE FROM counters WHERE updated < ?', (now - COUNTERS_TTL_SEC,))
+        finally:
+            conn.close()
+
+    def start(self, interval=10):
+        if self._thread:
+            return
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print('Query stats flush failed:', e)
+        self._thread = threading.Thread(target=loop, name='query-stats', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+
+def _read(path, sql, params=()):
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:  # файл ещё без таблиц
+        return []
+    finally:
+        conn.close()
+
+
+def _engine_filter(engines):
+    return f"engine IN ({', '.join('?' * len(engines))})", tuple(engines)
+
+
+def hot_statements(path, engines, top=10):
+    # (statement, calls, total_ms, avg_ms, max_ms) по суммарному времени
+    where, params = _engine_filter(engines)
+    return _read(path, f'SELECT statement, SUM(calls), SUM(total_ms), SUM(total_ms) / SUM(calls), MAX(max_ms) FROM statements '
+                       f'WHERE {where} GROUP BY statement ORDER BY SUM(total_ms) DESC LIMIT ?', params + (top,))
+
+
+def slow_queries(path, engines, top=10):
+    # (statement, раз, avg_ms, max_ms, последний ts) из кольцевого буфера
+    where, params = _engine_filter(engines)
+    return _read(path, f'SELECT statement, COUNT(*), AVG(ms), MAX(ms), MAX(ts) FROM slow_queries '
+                       f'WHERE {where} GROUP BY statement ORDER BY MAX(ms) DESC LIMIT ?', params + (top,))
+
+
+def recorded_statements(path, engines):
+    where, params = _engine_filter(engines)
+    return [r[0] for r in _read(path, f'SELECT DISTINCT statement FROM statements WHERE {where}', params)]
+
+
+def hit_rates(path):
+    # (имя, попадания, промахи) — сумма по живым процессам API
+    return _read(path, 'SELECT name, SUM(hits), SUM(misses) FROM counters GROUP BY name ORDER BY name')
+
+
+def table_stats(engine):
+    # [(таблица, строк, байт данных, байт индексов)] по таблицам моделей и размер всей БД; байты — None, если СУБД их не отдаёт
+    existing = set(inspect(engine).get_table_names())
+    tables = [t for t in Base.metadata.sorted_tables if t.name in existing]
+    sizes, total = {}, None
+    with engine.connect() as conn:
+        counts = {t.name: conn.execute(select(func.count()).select_from(t)).scalar() for t in tables}
+        if engine.dialect.name == 'sqlite':
+            total = conn.exec_driver_sql('PRAGMA page_count').scalar() * conn.exec_driver_sql('PRAGMA page_size').scalar()
+            try:
+                # dbstat есть не во всех сборках SQLite; индекс относится к таблице по sqlite_master.tbl_name
+                for name, kind, size in conn.exec_driver_sql(
+                        'SELECT m.tbl_name, m.type, SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name '
+                        'GROUP BY m.tbl_name, m.type'):
+                    entry = sizes.setdefault(name, [0, 0])
+                    entry[kind == 'index'] += size
+            except Exception:
+                sizes = {}
+        elif engine.dialect.name == 'mysql':
+            rows = conn.execute(text('SELECT table_name, data_length, index_length FROM information_schema.tables '
+                                     'WHERE table_schema = DATABASE()')).all()
+            sizes = {name: [data, index] for name, data, index in rows}
+            total = sum(data + index for _, data, index in rows)
+    return [(t.name, counts[t.name], *sizes.get(t.name, (None, None))) for t in tables], total
+
+
+def _sqlite_plan(conn, statement):
+    # EXPLAIN QUERY PLAN с NULL вместо параметров: план от значений не зависит
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, (None,) * statement.count('?')).all()
+    return [r[-1] for r in rows]
+
+
+def index_report(engine, statements=()):
+    # {'missing': [...], 'full_scans': [(таблица, запрос)], 'unused': [...], 'note': str|None}
+    insp = inspect(engine)
+    existing = set(insp.get_table_names())
+    report = {'missing': [], 'full_scans': [], 'unused': [], 'note': None}
+    declared = {}
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        in_db = {i['name'] for i in insp.get_indexes(table.name)}
+        declared[table.name] = in_db
+        report['missing'] += [f'{table.name}.{idx.name}' for idx in table.indexes if idx.name not in in_db]
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == 'sqlite':
+            used = set()
+            for statement in statements:
+                if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                try:
+                    plan = _sqlite_plan(conn, statement)
+                except Exception:
+                    continue
+                for step in plan:
+                    m = re.search(r'USING (?:COVERING )?INDEX (\w+)', step)
+                    if m:
+                        used.add(m.group(1))
+                    elif step.startswith('SCAN ') and step.split()[1] in declared:
+                        report['full_scans'].append((step.split()[1], statement))
+            if statements:
+                report['unused'] = sorted(f'{t}.{i}' for t, names in declared.items() for i in names
+                                          if i not in used and not i.startswith('sqlite_autoindex'))
+            else:
+                report['note'] = 'no recorded queries yet: unused indexes and full scans come from the API query log'
+        elif dialect == 'mysql':
+            try:
+                # счётчики performance_schema — с момента запуска сервера MySQL
+                report['unused'] = [f'{t}.{i}' for t, i in conn.execute(text(
+                    "SELECT object_name, index_name FROM performance_schema.table_io_waits_summary_by_index_usage "
+                    "WHERE object_schema = DATABASE() AND index_name IS NOT NULL AND index_name <> 'PRIMARY' AND count_star = 0"))]
+                report['full_scans'] = [(t, f'{n} rows read by full scans') for t, n in conn.execute(text(
+                    'SELECT object_name, rows_full_scanned FROM sys.schema_tables_with_full_table_scans '
+                    'WHERE object_schema = DATABASE() ORDER BY rows_full_scanned DESC'))]
+            except Exception as e:
+                report['note'] = f'performance_schema / sys schema unavailable: {e.__class__.__name__}'
+    return report
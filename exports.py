@@ -0,0 +1,160 @@
+# exports.py
+# Экспорт таблиц консоли: строки читаются потоково (yield_per, серверный курсор на MySQL) и сразу
+# пишутся в CSV / NDJSON / JSON, при имени *.gz — через gzip. Память не зависит от размера таблицы.
+# Для аналитики — Parquet (нужен pyarrow): пачки строк пишутся record batch'ами с типизированными колонками.
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from db_models import Student, Homework, Grade, ScheduleItem
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet доступен только при установленном pyarrow
+    pa = pq = None
+
+EXPORT_TABLES = {
+    'students': (Student, ('id', 'full_name', 'program', 'year', 'created_at')),
+    'homeworks': (Homework, ('id', 'student_id', 'program', 'title', 'description', 'due_date', 'pushed', 'attachment', 'created_at')),
+    'grades': (Grade, ('id', 'student_id', 'subject', 'grade', 'comment', 'created_at')),
+    'schedule': (ScheduleItem, ('id', 'program', 'week_day', 'time', 'subject', 'classroom', 'teacher')),
+}
+EXPORT_FORMATS = ('.csv', '.ndjson', '.json', '.parquet')
+# повторяющиеся строки (направления, предметы) в Parquet кодируются словарём
+DICTIONARY_COLUMNS = ('program', 'subject')
+YIELD_PER = 1000
+PROGRESS_EVERY_SEC = 0.5
+
+
+def export_format(filename):
+    # (формат, gzip?) по имени файла: grades.csv, grades.ndjson.gz, ...; Parquet сжат сам
+    name = filename[:-3] if filename.endswith('.gz') else filename
+    for fmt in EXPORT_FORMATS:
+        if name.endswith(fmt):
+            if fmt == '.parquet' and name != filename:
+                break
+            return fmt[1:], name != filename
+    return None, False
+
+
+def arrow_schema(table):
+    # типы колонок берутся из моделей: Integer -> int64, DateTime -> timestamp, остальное — строки
+    model, keys = EXPORT_TABLES[table]
+    fields = []
+    for k in keys:
+        py_type = model.__table__.c[k].type.python_type
+        if py_type is int:
+            t = pa.int64()
+        elif py_type is datetime:
+            t = pa.timestamp('us')
+        elif k in DICTIONARY_COLUMNS:
+            t = pa.dictionary(pa.int32(), pa.string())
+        else:
+            t = pa.string()
+        fields.append(pa.field(k, t, nullable=model.__table__.c[k].nullable))
+    return pa.schema(fields)
+
+
+def _plain(value):
+    return str(value) if isinstance(value, datetime) else value
+
+
+def iter_rows(engines, table, batch_size=YIELD_PER, plain=True):
+    # кортежи значений по шардам; в памяти одновременно не больше batch_size строк
+    model, keys = EXPORT_TABLES[table]
+    cols = [model.__table__.c[k] for k in keys]
+    for engine in engines:
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(select(*cols).order_by(model.__table__.c.id))
+            for row in result:
+                yield tuple(_plain(v) for v in row) if plain else tuple(row)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _open(filename, gz):
+    if gz:
+        return gzip.open(filename, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    return open(filename, 'w', encoding='utf-8', newline='')
+
+
+def _write_text(f, fmt, keys, rows):
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(keys)
+        writer.writerows(rows)
+    elif fmt == 'ndjson':
+        for row in rows:
+            f.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + '\n')
+    else:
+        # JSON-массив по объекту на строку: пишется так же потоково, как NDJSON
+        sep = '[\n'
+        for row in rows:
+            f.write(sep + json.dumps(dict(zip(keys, row)), ensure_ascii=False))
+            sep = ',\n'
+        f.write('[]\n' if sep == '[\n' else '\n]\n')
+
+
+def _write_parquet(filename, table, rows, batch_size):
+    schema = arrow_schema(table)
+    with pq.ParquetWriter(filename, schema, compression='zstd') as writer:
+        for batch in _batches(rows, batch_size):
+            columns = [pa.array(col, type=field.type) for col, field in zip(zip(*batch), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+
+
+def export_table(engines, table, filename, batch_size=YIELD_PER, progress=None):
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'table must be one of {", ".join(EXPORT_TABLES)}')
+    fmt, gz = export_format(filename)
+    if fmt is None:
+        raise ValueError('file must end with .csv, .ndjson, .json (optionally .gz) or .parquet')
+    if fmt == 'parquet' and pa is None:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+    keys = EXPORT_TABLES[table][1]
+    stats = {'table': table, 'done': 0, 'rate': 0.0, 'elapsed': 0.0}
+    started = time.monotonic()
+
+    def counted(rows):
+        last_report = started
+        for row in rows:
+            yield row
+            stats['done'] += 1
+            if progress and stats['done'] % batch_size == 0 and time.monotonic() - last_report >= PROGRESS_EVERY_SEC:
+                last_report = time.monotonic()
+                stats['elapsed'] = last_report - started
+                stats['rate'] = stats['done'] / stats['elapsed']
+                progress(dict(stats))
+
+    try:
+        if fmt == 'parquet':
+            _write_parquet(filename, table, counted(iter_rows(engines, table, batch_size, plain=False)), batch_size)
+        else:
+            with _open(filename, gz) as f:
+                _write_text(f, fmt, keys, counted(iter_rows(engines, table, batch_size)))
+    except BaseException:
+        if os.path.exists(filename):
+            os.remove(filename)
+        raise
+    stats['elapsed'] = time.monotonic() - started
+    stats['rate'] = stats['done'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+    return stats
+
+
+def print_export_progress(stats):
+    print(f"\r[{stats['table']}] {stats['done']} rows ({stats['rate']:.0f} rows/s)", end='', flush=True)
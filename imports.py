@@ -0,0 +1,326 @@
+# imports.py
+# Загрузка таблиц из CSV / NDJSON / JSON / Parquet (обратная операция к exports.py): файл читается
+# потоково пачками, строки проверяются и приводятся к типам колонок, каждая пачка раскладывается
+# по шардам и записывается одним executemany с upsert в отдельной транзакции.
+# Строка с id обновляет запись с этим id, без id — запись с тем же естественным ключом (NATURAL_KEYS).
+# Пары расписания, занимающие уже занятую аудиторию или преподавателя, отклоняются (ScheduleGuard),
+# ДЗ и оценки несуществующих студентов — тоже (StudentDirectory).
+import csv
+import gzip
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import select, or_
+from sqlalchemy.dialects import mysql, sqlite
+
+from exports import EXPORT_TABLES, PROGRESS_EVERY_SEC, export_format, pq
+from db_models import ScheduleItem, Student
+from timetable import TimetableIndex, parse_time_range, normalize_day, normalize_resource, resource_key
+
+IMPORT_BATCH = 1000
+MAX_REPORTED_ERRORS = 20
+# по этим колонкам находится существующая запись, если в строке нет id
+NATURAL_KEYS = {
+    'students': ('full_name', 'program'),
+    'homeworks': ('student_id', 'program', 'title'),
+    'grades': ('student_id', 'subject', 'created_at'),
+    'schedule': ('program', 'week_day', 'time'),
+}
+
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    # элементы JSON-массива по одному: буфер дочитывается, пока очередной объект не разберётся целиком
+    decoder = json.JSONDecoder()
+    buf, pos, eof, expect = '', 0, False, '['
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n':
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError('unexpected end of JSON array')
+            chunk = f.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        ch = buf[pos]
+        if expect == '[':
+            if ch != '[':
+                raise ValueError('JSON file must contain an array of objects')
+            pos += 1; expect = 'value'
+        elif ch == ']':
+            return
+        elif expect == ',':
+            if ch != ',':
+                raise ValueError(f'expected "," in JSON array, got {ch!r}')
+            pos += 1; expect = 'value'
+        else:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            yield obj
+            pos, expect = end, ','
+
+
+def _iter_records(filename, fmt, gz):
+    # словари строк; нечитаемая строка NDJSON отдаётся как ValueError и попадает в отклонённые
+    f = gzip.open(filename, 'rt', encoding='utf-8', newline='') if gz else open(filename, encoding='utf-8-sig', newline='')
+    with f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        elif fmt == 'ndjson':
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield ValueError(f'bad JSON: {e}')
+        else:
+            yield from _iter_json_array(f)
+
+
+def read_batches(filename, table, batch_size=IMPORT_BATCH):
+    # пачки словарей {колонка: значение}
+    fmt, gz = export_format(filename)
+    if fmt is None:
+        raise ValueError('file must end with .csv, .ndjson, .json (optionally .gz) or .parquet')
+    if fmt == 'parquet':
+        if pq is None:
+            raise RuntimeError('Parquet import requires pyarrow (pip install pyarrow)')
+        pf = pq.ParquetFile(filename)
+        columns = [k for k in EXPORT_TABLES[table][1] if k in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pylist()
+        return
+    batch = []
+    for record in _iter_records(filename, fmt, gz):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _coerce(col, value):
+    if value is None or value == '':
+        return None
+    py_type = col.type.python_type
+    if py_type is int:
+        return int(value)
+    if py_type is datetime:
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    value = str(value)
+    if getattr(col.type, 'length', None) and len(value) > col.type.length:
+        raise ValueError(f'longer than {col.type.length} characters')
+    return value
+
+
+def clean_row(table, row):
+    # словарь для INSERT со всеми колонками выгрузки; ValueError — строка отклоняется
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError('row must be an object')
+    model, keys = EXPORT_TABLES[table]
+    cols = model.__table__.c
+    out = {}
+    unkeyed = row.get('id') in (None, '')
+    for k in keys:
+        try:
+            out[k] = _coerce(cols[k], row.get(k))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'{k}: {e}')
+        if out[k] is None and k != 'id':
+            default = cols[k].default
+            if default is not None and default.is_callable and unkeyed and k in NATURAL_KEYS[table]:
+                # значение по умолчанию (время загрузки) никогда не совпадёт при повторном импорте
+                raise ValueError(f'{k} is required for rows without id')
+            if default is not None:
+                out[k] = default.arg(None) if default.is_callable else default.arg
+            elif not cols[k].nullable:
+                raise ValueError(f'{k} is required')
+    if table == 'schedule':
+        # то же написание, что дают валидаторы ScheduleItem: вставка идёт мимо ORM
+        out['time'] = out['time'].strip()
+        out['week_day'] = normalize_day(out['week_day'])
+        out['classroom'], out['teacher'] = normalize_resource(out['classroom']), normalize_resource(out['teacher'])
+        out['classroom_key'], out['teacher_key'] = resource_key(out['classroom']), resource_key(out['teacher'])
+        out['start_min'], out['end_min'] = parse_time_range(out['time'])
+    return out
+
+
+class ScheduleGuard:
+    # накладки аудиторий и преподавателей при загрузке расписания: на шард — TimetableIndex с парами из БД,
+    # принятые строки файла добавляются в него же, поэтому ловятся и накладки внутри файла.
+    # Пара из файла, которая обновляет существующую (тот же id или естественный ключ), заменяет её в индексе
+    def __init__(self, shards):
+        self.shards = shards
+        self._loaded = {}  # шард -> (TimetableIndex, {естественный ключ: id пары})
+
+    def _load(self, shard):
+        if shard not in self._loaded:
+            idx, by_key = TimetableIndex(), {}
+            with self.shards.engine(shard).connect() as conn:
+                for r in conn.execute(select(ScheduleItem.__table__).where(ScheduleItem.start_min.isnot(None))
+                                      .order_by(ScheduleItem.start_min)):
+                    idx.add(r.id, r.week_day, r.classroom, r.teacher, r.start_min, r.end_min)
+                    by_key[(r.program, r.week_day, r.time)] = r.id
+            self._loaded[shard] = idx, by_key
+        return self._loaded[shard]
+
+    def check(self, shard, row, line):
+        # ValueError — строка накладывается на пару из БД или на принятую ранее строку файла
+        idx, by_key = self._load(shard)
+        key = (row['program'], row['week_day'], row['time'])
+        ident = row['id'] if row['id'] is not None else by_key.get(key, f'row {line}')
+        busy = {}
+        for kind, res, other in idx.check(row['week_day'], row['classroom'], row['teacher'], row['start_min'], row['end_min']):
+            if other != ident:
+                busy.setdefault(f'{kind} {res}', []).append(f'schedule id={other}' if isinstance(other, int) else other)
+        if busy:
+            raise ValueError('; '.join(f'{res} is busy: overlaps {", ".join(others)}' for res, others in busy.items()))
+        by_key[key] = ident
+        idx.add(ident, row['week_day'], row['classroom'], row['teacher'], row['start_min'], row['end_min'])
+
+
+class StudentDirectory:
+    # направления студентов для строк ДЗ и оценок: id пачки ищутся одним запросом на шард
+    def __init__(self, shards):
+        self.shards = shards
+        self._programs = {}  # id студента -> направление (None — такого студента нет)
+
+    def prefetch(self, ids):
+        missing = {i for i in ids if i not in self._programs}
+        if not missing:
+            return
+        for name in self.shards.names():
+            with self.shards.engine(name, readonly=True).connect() as conn:
+                self._programs.update(conn.execute(select(Student.id, Student.program).where(Student.id.in_(missing))).all())
+        for i in missing:
+            self._programs.setdefault(i, None)
+
+    def program(self, student_id):
+        self.prefetch((student_id,))
+        program = self._programs[student_id]
+        if program is None:
+            raise ValueError(f'unknown student {student_id}')
+        return program
+
+
+def _shard_of(shards, table, row, students):
+    if students and row.get('student_id') is not None:
+        return shards.shard_for(students.program(row['student_id']))
+    return shards.shard_for(row.get('program'))
+
+
+def _upsert(conn, table, rows):
+    t = EXPORT_TABLES[table][0].__table__
+    updated = [k for k in rows[0] if k != 'id']
+    if conn.dialect.name == 'sqlite':
+        stmt = sqlite.insert(t)
+        stmt = stmt.on_conflict_do_update(index_elements=[t.c.id], set_={k: stmt.excluded[k] for k in updated})
+    elif conn.dialect.name == 'mysql':
+        stmt = mysql.insert(t)
+        stmt = stmt.on_duplicate_key_update({k: stmt.inserted[k] for k in updated})
+    else:
+        conn.execute(t.delete().where(t.c.id.in_([r['id'] for r in rows])))
+        stmt = t.insert()
+    conn.execute(stmt, rows)
+
+
+def _match_existing(conn, table, rows):
+    # id для строк без id — по естественному ключу; выборка по IN на каждую колонку ключа даёт
+    # надмножество, точное совпадение проверяется здесь
+    key = NATURAL_KEYS[table]
+    t = EXPORT_TABLES[table][0].__table__
+    where = []
+    for k in key:
+        values = {r[k] for r in rows}
+        cond = t.c[k].in_([v for v in values if v is not None])
+        where.append(or_(cond, t.c[k].is_(None)) if None in values else cond)
+    found = {tuple(r[1:]): r[0] for r in conn.execute(select(t.c.id, *[t.c[k] for k in key]).where(*where))}
+    for r in rows:
+        r['id'] = found.get(tuple(r[k] for k in key))
+
+
+def _write_chunk(shards, shard, table, rows):
+    # одна транзакция на пачку шарда: upsert строк с известным id и вставка новых;
+    # id новых строк на шардах берутся до транзакции — блок id пишется в БД шарда по умолчанию
+    t = EXPORT_TABLES[table][0].__table__
+    engine = shards.engine(shard)
+    unkeyed = [r for r in rows if r['id'] is None]
+    if unkeyed:
+        with engine.connect() as conn:
+            _match_existing(conn, table, unkeyed)
+    new = [r for r in rows if r['id'] is None]
+    if shards.sharded:
+        for r in new:
+            r['id'] = shards.next_id(t.name)
+        new = []
+    keyed = [r for r in rows if r['id'] is not None]
+    with engine.begin() as conn:
+        if keyed:
+            _upsert(conn, table, keyed)
+        if new:
+            conn.execute(t.insert(), [{k: v for k, v in r.items() if k != 'id'} for r in new])
+    return len(rows)
+
+
+def import_table(shards, table, filename, batch_size=IMPORT_BATCH, progress=None):
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'table must be one of {", ".join(EXPORT_TABLES)}')
+    stats = {'table': table, 'done': 0, 'rejected': 0, 'errors': [], 'rate': 0.0, 'elapsed': 0.0}
+    started = last_report = time.monotonic()
+    line = 0
+    key = NATURAL_KEYS[table]
+    guard = ScheduleGuard(shards) if table == 'schedule' else None
+    students = StudentDirectory(shards) if table in ('homeworks', 'grades') else None
+
+    def reject(line, e):
+        stats['rejected'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append((line, str(e)))
+
+    for batch in read_batches(filename, table, batch_size):
+        by_shard = {}
+        cleaned = []
+        for row in batch:
+            line += 1
+            try:
+                cleaned.append((line, clean_row(table, row)))
+            except ValueError as e:
+                reject(line, e)
+        if students:
+            students.prefetch(row['student_id'] for _, row in cleaned if row['student_id'] is not None)
+        for n, row in cleaned:
+            try:
+                shard = _shard_of(shards, table, row, students)
+                if guard:
+                    guard.check(shard, row, n)
+            except ValueError as e:
+                reject(n, e)
+                continue
+            # повтор ключа внутри пачки: остаётся последняя строка
+            ident = ('id', row['id']) if row['id'] is not None else tuple(row[k] for k in key)
+            by_shard.setdefault(shard, {})[ident] = row
+        for shard, rows in by_shard.items():
+            stats['done'] += _write_chunk(shards, shard, table, list(rows.values()))
+        if progress and time.monotonic() - last_report >= PROGRESS_EVERY_SEC:
+            last_report = time.monotonic()
+            stats['elapsed'] = last_report - started
+            stats['rate'] = stats['done'] / stats['elapsed']
+            progress(dict(stats))
+    stats['errors'].sort()
+    stats['elapsed'] = time.monotonic() - started
+    stats['rate'] = stats['done'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+    return stats
+
+
+def print_import_progress(stats):
+    print(f"\r[{stats['table']}] {stats['done']} rows, {stats['rejected']} rejected ({stats['rate']:.0f} rows/s)", end='', flush=True)
@@ -0,0 +1,185 @@
+# reports.py
+# Генерация табелей (report cards) по направлениям: студенты читаются потоково,
+# файлы рендерятся в пуле процессов и сразу дописываются в zip-архив.
+import csv
+import html
+import io
+import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from db_models import get_session, Student, Homework, Grade
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas as pdf_canvas
+except ImportError:  # PDF доступен только при установленном reportlab
+    pdf_canvas = None
+
+REPORT_FORMATS = ('csv', 'html', 'pdf')
+BATCH_SIZE = 200
+
+
+def _safe_name(s):
+    return ''.join('_' if ch in '/\\:*?"<>|' else ch for ch in (s or '')).strip() or 'unknown'
+
+
+def _render_csv(card):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(['id', 'full_name', 'program', 'year'])
+    w.writerow([card['id'], card['full_name'], card['program'], card['year']])
+    w.writerow([])
+    w.writerow(['subject', 'grade', 'comment', 'created_at'])
+    for g in card['grades']:
+        w.writerow([g['subject'], g['grade'], g['comment'], g['created_at']])
+    w.writerow([])
+    w.writerow(['homework', 'due_date', 'attachment'])
+    for h in card['homeworks']:
+        w.writerow([h['title'], h['due_date'], h['attachment']])
+    return buf.getvalue().encode('utf-8')
+
+
+def _render_html(card):
+    e = lambda v: html.escape('' if v is None else str(v))
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f'<title>{e(card["full_name"])}</title></head><body>',
+        f'<h1>{e(card["full_name"])}</h1>',
+        f'<p>Направление: {e(card["program"])} | Курс: {e(card["year"])} | ID: {e(card["id"])}</p>',
+        '<h2>Оценки</h2><table border="1"><tr><th>Предмет</th><th>Оценка</th><th>Комментарий</th><th>Дата</th></tr>',
+    ]
+    for g in card['grades']:
+        parts.append(f'<tr><td>{e(g["subject"])}</td><td>{e(g["grade"])}</td><td>{e(g["comment"])}</td><td>{e(g["created_at"])}</td></tr>')
+    parts.append('</table><h2>Домашние задания</h2><table border="1"><tr><th>Заголовок</th><th>Срок</th></tr>')
+    for h in card['homeworks']:
+        parts.append(f'<tr><td>{e(h["title"])}</td><td>{e(h["due_date"])}</td></tr>')
+    parts.append('</table></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _render_pdf(card):
+    buf = io.BytesIO()
+    c = pdf_canvas.Canvas(buf, pagesize=A4)
+    y = A4[1] - 50
+    lines = [f'{card["full_name"]} (ID {card["id"]})', f'Program: {card["program"]}, year {card["year"]}', '', 'Grades:']
+    lines += [f'  {g["subject"]}: {g["grade"]} {g["comment"] or ""}' for g in card['grades']]
+    lines += ['', 'Homework:']
+    lines += [f'  {h["title"]} (due {h["due_date"] or "-"})' for h in card['homeworks']]
+    for line in lines:
+        if y < 50:
+            c.showPage(); y = A4[1] - 50
+        c.drawString(50, y, line); y -= 16
+    c.save()
+    return buf.getvalue()
+
+
+_RENDERERS = {'csv': _render_csv, 'html': _render_html, 'pdf': _render_pdf}
+
+
+def render_report(card, fmt):
+    # выполняется в процессе пула: на входе только простые dict, на выходе (имя в архиве, байты)
+    name = f'{_safe_name(card["program"])}/{card["id"]}_{_safe_name(card["full_name"])}.{fmt}'
+    return name, _RENDERERS[fmt](card)
+
+
+def _render_batch(cards, fmt):
+    return [render_report(c, fmt) for c in cards]
+
+
+def iter_card_batches(sess, program=None, batch_size=BATCH_SIZE):
+    # по одному направлению за раз; студенты читаются пачками по ключу (id > last_id),
+    # чтобы не держать открытый курсор, пока догружаются оценки и личные ДЗ пачки
+    if program:
+        programs = [program]
+    else:
+        programs = [p for (p,) in sess.query(Student.program).distinct().order_by(Student.program)]
+    for prog in programs:
+        program_hw = [_hw_dict(h) for h in sess.query(Homework).filter(Homework.program == prog, Homework.student_id.is_(None)).order_by(Homework.id)]
+        last_id = 0
+        while True:
+            rows = (sess.query(Student.id, Student.full_name, Student.program, Student.year)
+                    .filter(Student.program == prog, Student.id > last_id)
+                    .order_by(Student.id).limit(batch_size).all())
+            if not rows:
+                break
+            last_id = rows[-1].id
+            batch = [{'id': r.id, 'full_name': r.full_name, 'program': r.program, 'year': r.year} for r in rows]
+            yield prog, _fill_batch(sess, batch, program_hw)
+            sess.expunge_all()
+
+
+def _hw_dict(h):
+    return {'title': h.title, 'due_date': h.due_date, 'attachment': h.attachment}
+
+
+def _fill_batch(sess, batch, program_hw):
+    ids = [c['id'] for c in batch]
+    grades = {i: [] for i in ids}
+    for g in sess.query(Grade).filter(Grade.student_id.in_(ids)).order_by(Grade.id):
+        grades[g.student_id].append({'subject': g.subject, 'grade': g.grade, 'comment': g.comment, 'created_at': str(g.created_at)})
+    own_hw = {i: [] for i in ids}
+    for h in sess.query(Homework).filter(Homework.student_id.in_(ids)).order_by(Homework.id):
+        own_hw[h.student_id].append(_hw_dict(h))
+    for c in batch:
+        c['grades'] = grades[c['id']]
+        c['homeworks'] = own_hw[c['id']] + program_hw
+    return batch
+
+
+def count_students(sess, program=None):
+    q = sess.query(Student)
+    if program:
+        q = q.filter(Student.program == program)
+    return q.count()
+
+
+def generate_reports(engines, out_path, program=None, fmt='csv', workers=None, batch_size=BATCH_SIZE, progress=None):
+    # engines — по одному на шард (без шардирования — один)
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f'format must be one of {", ".join(REPORT_FORMATS)}')
+    if fmt == 'pdf' and pdf_canvas is None:
+        raise RuntimeError('PDF reports require reportlab (pip install reportlab)')
+    sessions = [get_session(e) for e in engines]
+    stats = {'program': None, 'done': 0, 'total': sum(count_students(sess, program) for sess in sessions), 'rate': 0.0, 'elapsed': 0.0}
+    started = time.monotonic()
+    # в полёте не больше двух пачек: пока пул рендерит одну, читаем следующую
+    pending = deque()
+
+    def drain(zf):
+        prog, fut = pending.popleft()
+        rendered = fut.result()
+        for name, data in rendered:
+            zf.writestr(name, data)
+        stats['program'] = prog
+        stats['done'] += len(rendered)
+        stats['elapsed'] = time.monotonic() - started
+        stats['rate'] = stats['done'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+        if progress:
+            progress(dict(stats))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool, \
+                zipfile.ZipFile(out_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for sess in sessions:
+                for prog, batch in iter_card_batches(sess, program, batch_size):
+                    pending.append((prog, pool.submit(_render_batch, batch, fmt)))
+                    if len(pending) >= 2:
+                        drain(zf)
+            while pending:
+                drain(zf)
+    except BaseException:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    finally:
+        for sess in sessions:
+            sess.close()
+    stats['elapsed'] = time.monotonic() - started
+    return stats
+
+
+def print_progress(stats):
+    print(f"\r[{stats['program']}] {stats['done']}/{stats['total']} ({stats['rate']:.1f} st/s)", end='', flush=True)
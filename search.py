@@ -0,0 +1,112 @@
+# search.py
+# Полнотекстовый поиск по заголовку и описанию ДЗ:
+# MySQL — индекс FULLTEXT, SQLite — внешняя таблица FTS5 с триггерами, иначе — LIKE.
+import re
+from sqlalchemy import inspect, text, or_
+from db_models import Homework
+
+FTS_INDEX = 'ft_homeworks_title_description'
+FTS_TABLE = 'homeworks_fts'
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, description, content='homeworks', content_rowid='id')",
+    f"""CREATE TRIGGER IF NOT EXISTS homeworks_fts_ai AFTER INSERT ON homeworks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS homeworks_fts_ad AFTER DELETE ON homeworks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS homeworks_fts_au AFTER UPDATE OF title, description ON homeworks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+
+def ensure_search_index(engine):
+    dialect = engine.dialect.name
+    if dialect == 'mysql':
+        if FTS_INDEX not in {i['name'] for i in inspect(engine).get_indexes('homeworks')}:
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE homeworks ADD FULLTEXT INDEX {FTS_INDEX} (title, description)'))
+    elif dialect == 'sqlite':
+        created = FTS_TABLE not in inspect(engine).get_table_names()
+        with engine.begin() as conn:
+            for ddl in _SQLITE_DDL:
+                conn.execute(text(ddl))
+            if created:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _fts5_query(q):
+    # каждое слово — префиксный поиск в кавычках, чтобы ввод пользователя не разбирался как синтаксис FTS5
+    words = re.findall(r'\w+', q)
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def _scope_sql(student_id, program):
+    if student_id is not None:
+        return '(h.student_id = :student_id OR h.program = :program)', {'student_id': student_id, 'program': program}
+    if program:
+        return 'h.program = :program', {'program': program}
+    return '1 = 1', {}
+
+
+def _page(page, per_page):
+    page = max(1, page); per_page = max(1, min(per_page, 100))
+    return (page - 1) * per_page, per_page
+
+
+def search_homework(sess, q, student_id=None, program=None, page=1, per_page=20):
+    # возвращает (total, [(Homework, score)]); при student_id — только свои и ДЗ направления
+    offset, per_page = _page(page, per_page)
+    return _search(sess, (q or '').strip(), student_id, program, per_page, offset)
+
+
+def search_homework_scatter(sessions, q, page=1, per_page=20):
+    # поиск по всем шардам: с каждого берём первые offset+per_page, сливаем по score
+    offset, per_page = _page(page, per_page)
+    total, merged = 0, []
+    for sess in sessions:
+        t, rows = _search(sess, (q or '').strip(), None, None, offset + per_page, 0)
+        total += t
+        merged += rows
+    merged.sort(key=lambda r: (r[1], r[0].id), reverse=True)
+    return total, merged[offset:offset + per_page]
+
+
+def _search(sess, q, student_id, program, per_page, offset):
+    dialect = sess.get_bind().dialect.name
+    scope, params = _scope_sql(student_id, program)
+    if dialect == 'mysql':
+        match = 'MATCH(h.title, h.description) AGAINST (:q IN NATURAL LANGUAGE MODE)'
+        params['q'] = q
+        total = sess.execute(text(f'SELECT COUNT(*) FROM homeworks h WHERE {match} AND {scope}'), params).scalar()
+        rows = sess.execute(text(f'SELECT h.id, {match} AS score FROM homeworks h WHERE {match} AND {scope} '
+                                 f'ORDER BY score DESC, h.id DESC LIMIT :limit OFFSET :offset'),
+                            dict(params, limit=per_page, offset=offset)).all()
+    elif dialect == 'sqlite':
+        params['q'] = _fts5_query(q)
+        if not params['q']:
+            return 0, []
+        base = f'FROM {FTS_TABLE} JOIN homeworks h ON h.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH :q AND {scope}'
+        total = sess.execute(text(f'SELECT COUNT(*) {base}'), params).scalar()
+        # bm25() тем меньше, чем релевантнее — меняем знак, чтобы score рос с релевантностью
+        rows = sess.execute(text(f'SELECT h.id, -bm25({FTS_TABLE}) AS score {base} '
+                                 f'ORDER BY score DESC, h.id DESC LIMIT :limit OFFSET :offset'),
+                            dict(params, limit=per_page, offset=offset)).all()
+    else:
+        return _search_like(sess, q, student_id, program, per_page, offset)
+    by_id = {h.id: h for h in sess.query(Homework).filter(Homework.id.in_([r.id for r in rows]))} if rows else {}
+    return total, [(by_id[r.id], float(r.score)) for r in rows if r.id in by_id]
+
+
+def _search_like(sess, q, student_id, program, per_page, offset):
+    pattern = f'%{q}%'
+    query = sess.query(Homework).filter(or_(Homework.title.ilike(pattern), Homework.description.ilike(pattern)))
+    if student_id is not None:
+        query = query.filter((Homework.student_id == student_id) | (Homework.program == program))
+    elif program:
+        query = query.filter(Homework.program == program)
+    total = query.count()
+    return total, [(h, 0.0) for h in query.order_by(Homework.id.desc()).offset(offset).limit(per_page)]
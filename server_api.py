@@ -1,17 +1,98 @@
 # server_api.py
 import os
-from flask import Flask, request, jsonify, send_from_directory
-from db_models import get_engine, get_session, Student, ScheduleItem, Homework, Grade, Base
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Flask, request, jsonify, send_from_directory, send_file, g
+from db_models import get_shards, get_session, shard_sessions, Student, ScheduleItem, Homework, Grade, HomeworkArchive
+from archive import archived_homework, archived_grades
 from werkzeug.utils import secure_filename
+from search import search_homework, search_homework_scatter
+from reports import generate_reports, REPORT_FORMATS
+from avatars import AvatarStore, AVATAR_SIZES, THUMBNAILS
+from dbstats import QueryStats
 from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
 import config
 
 UPLOAD_DIR = getattr(config, 'UPLOAD_DIR', 'uploads')
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+REPORT_DIR = os.path.abspath(os.path.join(UPLOAD_DIR, 'reports'))
+os.makedirs(REPORT_DIR, exist_ok=True)
+# через сколько секунд клиенту повторить запрос, если БД недоступна (заголовок Retry-After)
+RETRY_AFTER_SEC = getattr(config, 'RETRY_AFTER_SEC', 15)
+AVATAR_MAX_BYTES = getattr(config, 'AVATAR_MAX_BYTES', 5 * 1024 * 1024)
+REPORT_TTL_SEC = getattr(config, 'REPORT_TTL_SEC', 24 * 3600)
+avatar_store = AvatarStore(os.path.join(UPLOAD_DIR, 'avatars'))
 
 app = Flask(__name__)
-engine = get_engine()
-Base.metadata.create_all(engine)
+shards = get_shards()
+# до первого соединения: время запросов к БД, медленные запросы и попадания в пул/кэши — для команды консоли stats
+if getattr(config, 'QUERY_STATS_FILE', 'query_stats.db'):
+    query_stats = QueryStats(getattr(config, 'QUERY_STATS_FILE', 'query_stats.db'), slow_ms=getattr(config, 'SLOW_QUERY_MS', 100),
+                             keep=getattr(config, 'SLOW_QUERY_KEEP', 500))
+    query_stats.attach_shards(shards)
+    query_stats.start(getattr(config, 'QUERY_STATS_FLUSH_SEC', 10))
+shards.init_all()
+shards.start_health_checks()
+shards.start_maintenance()
+
+def request_session(**kwargs):
+    # сессия закрывается в конце запроса: иначе соединение возвращается в пул только сборщиком мусора,
+    # и под нагрузкой пул (особенно отдельный пул читателей) исчерпывается
+    sess = get_session(**kwargs)
+    g.setdefault('sessions', []).append(sess)
+    return sess
+
+@app.teardown_request
+def close_sessions(exc):
+    for sess in g.pop('sessions', ()):
+        sess.close()
+
+def student_session(student_id, readonly=True):
+    # сессия на шарде направления студента; чтения после его собственной записи идут в основную БД
+    return request_session(program=shards.locate_student(student_id), readonly=readonly, sticky_key=student_id)
+
+def wants_history():
+    # ДЗ и оценки закрытых учебных лет лежат в архиве и отдаются только по ?history=1
+    return request.args.get('history', '').lower() in ('1', 'true', 'yes')
+
+def _unavailable(body):
+    resp = jsonify(body)
+    resp.status_code = 503
+    resp.headers['Retry-After'] = str(RETRY_AFTER_SEC)
+    return resp
+
+@app.errorhandler(OperationalError)
+def db_unavailable(e):
+    return _unavailable({'error': 'database unavailable'})
+
+@app.route('/health', methods=['GET'])
+def health():
+    # дешёвая проверка доступности для клиентов: без запросов к таблицам;
+    # ?deep=1 дополнительно выполняет SELECT 1 на основной БД каждого шарда
+    if request.args.get('deep'):
+        down = []
+        for name in shards.names():
+            try:
+                with shards.engine(name).connect() as conn:
+                    conn.execute(text('SELECT 1'))
+            except Exception:
+                down.append(name)
+        if down:
+            return _unavailable({'status': 'degraded', 'down': down})
+    resp = jsonify({'status': 'ok', 'time': datetime.utcnow().isoformat()})
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+def find_student_by_name(name):
+    for sess in shard_sessions():
+        st = sess.query(Student).filter(Student.full_name == name).first()
+        if st:
+            return st
+    return None
 
 @app.route('/register', methods=['POST'])
 def register():
@@ -24,14 +105,14 @@ def register():
     password = data.get('password')
     if not all([name, program, year, password]):
         return jsonify({'error': 'Поля full_name, program, year, password обязательны'}), 400
-    sess = get_session(engine)
-    existing = sess.query(Student).filter(Student.full_name == name).first()
-    if existing:
+    if find_student_by_name(name):
         return jsonify({'error': 'Пользователь с таким ФИО уже существует'}), 400
+    sess = request_session(program=program)
     s = Student(full_name=name, program=program, year=int(year))
     s.set_password(password)
     sess.add(s)
     sess.commit()
+    shards.mark_written(program, s.id)
     return jsonify({'id': s.id, 'full_name': s.full_name})
 
 @app.route('/login', methods=['POST'])
@@ -43,8 +124,7 @@ def login():
     password = data.get('password')
     if not all([name, password]):
         return jsonify({'error': 'full_name и password обязательны'}), 400
-    sess = get_session(engine)
-    st = sess.query(Student).filter(Student.full_name == name).first()
+    st = find_student_by_name(name)
     if not st or not st.check_password(password):
         return jsonify({'error': 'Неверные учетные данные'}), 401
     return jsonify({'id': st.id, 'full_name': st.full_name})
@@ -52,7 +132,7 @@ def login():
 @app.route('/students/<int:student_id>/schedule', methods=['GET'])
 def get_schedule(student_id):
     day = request.args.get('day')
-    sess = get_session(engine)
+    sess = student_session(student_id)
     st = sess.get(Student, student_id)
     if not st:
         return jsonify({'error': 'student not found'}), 404
@@ -67,21 +147,32 @@ def get_schedule(student_id):
 
 @app.route('/students/<int:student_id>/homework', methods=['GET', 'POST'])
 def student_homework(student_id):
-    sess = get_session(engine)
+    sess = student_session(student_id, readonly=request.method == 'GET')
     st = sess.get(Student, student_id)
     if not st:
         return jsonify({'error': 'student not found'}), 404
     if request.method == 'GET':
         rows = sess.query(Homework).filter((Homework.student_id == student_id) | (Homework.program == st.program)).all()
-        return jsonify([{
+        out = [{
             'id': h.id,
             'title': h.title,
             'description': h.description,
             'due_date': h.due_date,
             'pushed': h.pushed,
             'attachment': h.attachment
-        } for h in rows])
+        } for h in rows]
+        if wants_history():
+            out += [{'id': h.id, 'title': h.title, 'description': h.description, 'due_date': h.due_date, 'pushed': h.pushed,
+                     'attachment': h.attachment, 'academic_year': h.academic_year} for h in archived_homework(sess, student_id, st.program)]
+        return jsonify(out)
     else:
+        idem_key = (request.headers.get('Idempotency-Key') or '').strip() or None
+        if idem_key and len(idem_key) > 64:
+            return jsonify({'error': 'Idempotency-Key too long'}), 400
+        if idem_key:
+            existing = _find_idempotent(sess, student_id, idem_key)
+            if existing:
+                return jsonify(_homework_created(existing))
         if request.content_type and 'multipart/form-data' in request.content_type:
             title = request.form.get('title')
             description = request.form.get('description')
@@ -101,32 +192,132 @@ def student_homework(student_id):
         if file:
             filename = secure_filename(file.filename)
             timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-            filename_saved = f"{timestamp}_{filename}"
+            # суффикс нужен, чтобы параллельные загрузки одного файла (повторы с тем же ключом) не перезаписали друг друга
+            filename_saved = f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
             save_path = os.path.join(UPLOAD_DIR, filename_saved)
             file.save(save_path)
             attachment_filename = filename_saved
 
-        hw = Homework(student_id=student_id, program=st.program, title=title, description=description, due_date=due_date, pushed=1, attachment=attachment_filename)
+        hw = Homework(student_id=student_id, program=st.program, title=title, description=description, due_date=due_date, pushed=1,
+                      attachment=attachment_filename, idempotency_key=idem_key)
         sess.add(hw)
-        sess.commit()
-        return jsonify({'id': hw.id, 'title': hw.title, 'attachment': hw.attachment})
+        try:
+            sess.commit()
+        except IntegrityError:
+            # параллельный повтор с тем же ключом успел первым — отдаём его запись
+            sess.rollback()
+            if attachment_filename:
+                os.remove(os.path.join(UPLOAD_DIR, attachment_filename))
+            existing = _find_idempotent(sess, student_id, idem_key)
+            if not existing:
+                raise
+            return jsonify(_homework_created(existing))
+        shards.mark_written(st.program, student_id)
+        return jsonify(_homework_created(hw))
+
+def _find_idempotent(sess, student_id, idem_key):
+    # ДЗ, уже созданное с этим ключом; команда archive могла перенести его в homeworks_archive
+    for model in (Homework, HomeworkArchive):
+        found = sess.query(model).filter(model.student_id == student_id, model.idempotency_key == idem_key).first()
+        if found:
+            return found
+    return None
+
+def _homework_created(hw):
+    return {'id': hw.id, 'title': hw.title, 'attachment': hw.attachment}
+
+@app.route('/search', methods=['GET'])
+def search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q required'}), 400
+    try:
+        page = int(request.args.get('page', 1)); per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    student_id = request.args.get('student_id', type=int)
+    program = request.args.get('program')
+    if student_id is not None:
+        sess = student_session(student_id)
+        st = sess.get(Student, student_id)
+        if not st:
+            return jsonify({'error': 'student not found'}), 404
+        total, rows = search_homework(sess, q, student_id=student_id, program=st.program, page=page, per_page=per_page)
+    elif program:
+        total, rows = search_homework(request_session(program=program, readonly=True), q, program=program, page=page, per_page=per_page)
+    else:
+        total, rows = search_homework_scatter(shard_sessions(readonly=True), q, page=page, per_page=per_page)
+    return jsonify({'total': total, 'page': max(1, page), 'per_page': max(1, min(per_page, 100)), 'items': [{
+        'id': h.id,
+        'title': h.title,
+        'description': h.description,
+        'due_date': h.due_date,
+        'pushed': h.pushed,
+        'attachment': h.attachment,
+        'score': score
+    } for h, score in rows]})
 
 @app.route('/homework/<int:hw_id>/download', methods=['GET'])
 def download_attachment(hw_id):
-    sess = get_session(engine)
-    hw = sess.get(Homework, hw_id)
+    hw = None
+    for sess in shard_sessions(readonly=True):
+        hw = sess.get(Homework, hw_id) or sess.query(HomeworkArchive).filter(HomeworkArchive.id == hw_id).first()
+        if hw:
+            break
     if not hw or not hw.attachment:
         return jsonify({'error': 'attachment not found'}), 404
     return send_from_directory(UPLOAD_DIR, hw.attachment, as_attachment=True)
 
+@app.route('/students/<int:student_id>/avatar', methods=['GET', 'PUT', 'POST'])
+def student_avatar(student_id):
+    if request.method == 'GET':
+        found = avatar_store.path(student_id, request.args.get('size', type=int))
+        if not found:
+            return jsonify({'error': 'avatar not found'}), 404
+        path, mimetype, etag = found
+        version = etag.split('-')[0]
+        # по URL с версией (?v=...) содержимое не меняется никогда; без версии клиент перепроверяет по ETag
+        immutable = request.args.get('v') == version
+        resp = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+        resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable' if immutable else 'no-cache'
+        resp.headers['X-Avatar-Version'] = version
+        return resp
+    sess = student_session(student_id)
+    if not sess.get(Student, student_id):
+        return jsonify({'error': 'student not found'}), 404
+    if request.content_length and request.content_length > AVATAR_MAX_BYTES:
+        return jsonify({'error': f'avatar larger than {AVATAR_MAX_BYTES} bytes'}), 413
+    file = request.files.get('file')
+    data = file.read() if file else request.get_data()
+    if not data:
+        return jsonify({'error': 'file required'}), 400
+    if len(data) > AVATAR_MAX_BYTES:
+        return jsonify({'error': f'avatar larger than {AVATAR_MAX_BYTES} bytes'}), 413
+    try:
+        version, job = avatar_store.submit(student_id, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # миниатюры режутся в фоне; пока они не готовы, GET отдаёт прежнюю версию. ?wait=1 — ответить после нарезки
+    if job and request.args.get('wait'):
+        try:
+            job.result(timeout=30); job = None
+        except FutureTimeout:
+            pass  # нарезка затянулась — отвечаем как без ожидания, 202 с версией
+    return jsonify({'version': version, 'status': 'processing' if job else 'ready', 'sizes': list(AVATAR_SIZES),
+                    'thumbnails': THUMBNAILS}), 202 if job else 200
+
 @app.route('/students/<int:student_id>/grades', methods=['GET'])
 def get_grades(student_id):
-    sess = get_session(engine)
+    sess = student_session(student_id)
     st = sess.get(Student, student_id)
     if not st:
         return jsonify({'error': 'student not found'}), 404
     rows = sess.query(Grade).filter(Grade.student_id == student_id).all()
-    return jsonify([{'id': g.id, 'subject': g.subject, 'grade': g.grade, 'comment': g.comment} for g in rows])
+    out = [{'id': g.id, 'subject': g.subject, 'grade': g.grade, 'comment': g.comment} for g in rows]
+    if wants_history():
+        out += [{'id': g.id, 'subject': g.subject, 'grade': g.grade, 'comment': g.comment, 'academic_year': g.academic_year}
+                for g in archived_grades(sess, student_id)]
+    return jsonify(out)
 
 @app.route('/admin/push_homework', methods=['POST'])
 def push_homework_all():
@@ -137,12 +328,86 @@ def push_homework_all():
     due_date = data.get('due_date')
     if not all([program, title]):
         return jsonify({'error': 'program and title required'}), 400
-    sess = get_session(engine)
+    sess = request_session(program=program)
     hw = Homework(program=program, title=title, description=description, due_date=due_date, pushed=1)
     sess.add(hw)
     sess.commit()
     return jsonify({'ok': True, 'id': hw.id})
 
+# фоновые задания генерации табелей: job_id -> состояние
+report_jobs = {}
+report_jobs_lock = threading.Lock()
+
+def _expire_report_jobs():
+    # под report_jobs_lock: задания, завершённые больше REPORT_TTL_SEC назад, забываются вместе с архивами;
+    # архивы без задания (остались от прошлого запуска сервера) удаляются по времени изменения
+    now = time.time()
+    for job_id, job in list(report_jobs.items()):
+        if job.get('finished_at') and now - job['finished_at'] > REPORT_TTL_SEC:
+            del report_jobs[job_id]
+            try:
+                os.remove(job['path'])
+            except FileNotFoundError:
+                pass
+    known = {os.path.basename(job['path']) for job in report_jobs.values()}
+    for entry in os.scandir(REPORT_DIR):
+        if entry.name.endswith('.zip') and entry.name not in known and now - entry.stat().st_mtime > REPORT_TTL_SEC:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+def _run_report_job(job_id, program, fmt):
+    job = report_jobs[job_id]
+    def on_progress(stats):
+        with report_jobs_lock:
+            job.update(stats)
+    try:
+        if program:
+            engines = [shards.engine_for(program, readonly=True)]
+        else:
+            engines = [shards.engine(name, readonly=True) for name in shards.names()]
+        stats = generate_reports(engines, job['path'], program=program, fmt=fmt, progress=on_progress)
+        with report_jobs_lock:
+            job.update(stats); job['status'] = 'done'; job['finished_at'] = time.time()
+    except Exception as e:
+        with report_jobs_lock:
+            job['status'] = 'failed'; job['error'] = str(e); job['finished_at'] = time.time()
+
+@app.route('/admin/reports', methods=['POST'])
+def start_report():
+    data = request.get_json(silent=True) or {}
+    program = data.get('program')
+    fmt = data.get('format', 'csv')
+    if fmt not in REPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(REPORT_FORMATS)}'}), 400
+    job_id = uuid.uuid4().hex
+    job = {'id': job_id, 'status': 'running', 'program': program, 'format': fmt, 'done': 0, 'total': None,
+           'rate': 0.0, 'elapsed': 0.0, 'path': os.path.join(REPORT_DIR, f'{job_id}.zip')}
+    with report_jobs_lock:
+        _expire_report_jobs()
+        report_jobs[job_id] = job
+    threading.Thread(target=_run_report_job, args=(job_id, program, fmt), daemon=True).start()
+    return jsonify({'id': job_id, 'status': 'running'}), 202
+
+@app.route('/admin/reports/<job_id>', methods=['GET'])
+def report_status(job_id):
+    with report_jobs_lock:
+        _expire_report_jobs()
+        job = report_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'job not found'}), 404
+        return jsonify({k: v for k, v in job.items() if k != 'path'})
+
+@app.route('/admin/reports/<job_id>/download', methods=['GET'])
+def report_download(job_id):
+    with report_jobs_lock:
+        _expire_report_jobs()
+        job = report_jobs.get(job_id)
+    if not job or job['status'] != 'done':
+        return jsonify({'error': 'report not ready'}), 404
+    return send_from_directory(REPORT_DIR, os.path.basename(job['path']), as_attachment=True)
+
 if __name__ == '__main__':
     print('Run API server: http://127.0.0.1:5000')
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,153 +1,484 @@
 # server_console.py
-import csv
-import json
-from db_models import get_engine, get_session, Student, Homework, ScheduleItem, Grade, Base
+import argparse
+import os
+import re
+import shlex
+import sys
+from datetime import datetime
+import config
+from db_models import get_shards, get_session, shard_sessions, Student, Homework, ScheduleItem, Grade
+from timetable import find_conflicts, audit_timetable, format_minutes
+from reports import generate_reports, print_progress, REPORT_FORMATS
+from exports import export_table as export_table_to, print_export_progress
+from imports import import_table as import_table_from, print_import_progress
+from backup import backup as backup_to, restore as restore_from
+from archive import archive_before, current_academic_year
+from dbstats import table_stats, index_report, hot_statements, slow_queries, recorded_statements, hit_rates
 
-engine = get_engine()
-Base.metadata.create_all(engine)
+# схема создаётся/обновляется при запуске REPL или в пакетном режиме с --init-db, не при импорте модуля
+shards = get_shards()
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE = 0, 1, 2
 
 HELP = '''Команды консоли:
   help                    - показать это сообщение
   list_students           - список студентов
   list_homeworks          - список домашних заданий
   list_schedule           - расписание
-  add_student             - добавить студента (с паролем)
-  add_homework            - добавить домашнее задание
-  add_schedule            - добавить пару в расписание
-  add_grade               - поставить оценку
-  export <table> <file>   - экспорт (students|homeworks|grades|schedule) -> .csv или .json
+  add_student [<full_name> <program> <year> <password>]
+                          - добавить студента (с паролем)
+  add_homework [<student_id|-> <program|-> <title> <description> <due_date>]
+                          - добавить домашнее задание (студенту или направлению)
+  add_schedule [<program> <week_day> <time> <subject> <classroom> <teacher>]
+                          - добавить пару в расписание (с проверкой накладок)
+  audit_schedule          - найти накладки аудиторий и преподавателей во всём расписании
+  add_grade [<student_id> <subject> <grade> [comment]]
+                          - поставить оценку
+  export <table> <file>   - экспорт (students|homeworks|grades|schedule) -> .csv, .ndjson, .json или .parquet
+                          (потоково; с .gz на конце — сжатый gzip; .parquet — нужен pyarrow)
+  import <table> <file>   - загрузка из .csv, .ndjson, .json (в т.ч. .gz) или .parquet пачками;
+                          строка с id обновляет эту запись, без id — запись с тем же естественным ключом
+  report <file.zip> [csv|html|pdf] [program]
+                          - табели студентов (по направлению или по всем) в zip-архив
+  backup [dir]            - согласованный снимок БД и вложений в dir (по умолчанию BACKUP_DIR);
+                          уже сохранённые файлы повторно не копируются
+  restore [dir] [name]    - восстановить копию (по умолчанию последнюю): заменяет строки таблиц и файлы
+  archive [year]          - перенести ДЗ и оценки учебных лет до year (по умолчанию — все закрытые годы)
+                          в архивные таблицы пачками; API отдаёт их только с ?history=1
+  shards                  - шарды и привязка направлений
+  stats [top]             - размеры таблиц, отсутствующие и неиспользуемые индексы, самые долгие и медленные
+                          запросы API (из QUERY_STATS_FILE), попадания в пул соединений и кэши
+  rebalance <shard> <program>
+                          - перенести направление (студенты, ДЗ, оценки, расписание) на другой шард
   exit
+
+Без аргументов add_* задают вопросы. Пакетный режим (аргументы в кавычках, как в shell):
+  python server_console.py add_grade 5 Математика A "Хорошо"
+  python server_console.py --script jobs.txt [--batch-size N] [--keep-going] [--init-db]
 '''
 
-def list_students(sess):
-    rows = sess.query(Student).all()
-    for r in rows:
-        print(r.id, r.full_name, r.program, 'year', r.year)
-
-def list_homeworks(sess):
-    rows = sess.query(Homework).all()
-    for r in rows:
-        print(r.id, 'st_id=' + str(r.student_id), r.program, r.title, r.due_date, 'pushed=' + str(r.pushed), 'attachment=' + str(r.attachment))
-
-def list_schedule(sess):
-    rows = sess.query(ScheduleItem).all()
-    for r in rows:
-        print(r.id, r.program, r.week_day, r.time, r.subject, r.classroom, r.teacher)
-
-def add_student(sess):
-    name = input('Full name: ')
-    program = input('Program: ')
-    year = input('Year: ')
-    pwd = input('Password (will be hashed): ')
-    s = Student(full_name=name, program=program, year=int(year))
+class CommandError(Exception):
+    pass
+
+class Batch:
+    # сессии по шардам на пачку команд: запись копится в них и фиксируется одним commit на шард,
+    # затем сессии закрываются — карта идентичности не растёт от пачки к пачке
+    def __init__(self, interactive=False):
+        self.interactive = interactive
+        self.sessions = {}
+        self.pending = 0
+
+    def session(self, program=None, student_id=None):
+        if student_id is not None:
+            program = shards.locate_student(student_id)
+        name = shards.shard_for(program)
+        if name not in self.sessions:
+            self.sessions[name] = get_session(shards.engine(name))
+        return self.sessions[name]
+
+    def commit(self):
+        try:
+            for sess in self.sessions.values():
+                sess.commit()
+        finally:
+            self.close()
+
+    def close(self):
+        for sess in self.sessions.values():
+            sess.close()
+        self.sessions = {}
+        self.pending = 0
+
+def ask(batch, args, usage, *prompts):
+    # аргументы команды; в REPL без аргументов — вопросы, как раньше
+    if not args and batch.interactive:
+        return [input(p) for p in prompts]
+    if len(args) != len(prompts):
+        raise CommandError('Usage: ' + usage)
+    return list(args)
+
+def list_students():
+    for sess in shard_sessions(readonly=True):
+        for r in sess.query(Student).yield_per(1000):
+            print(r.id, r.full_name, r.program, 'year', r.year)
+
+def list_homeworks():
+    for sess in shard_sessions(readonly=True):
+        for r in sess.query(Homework).yield_per(1000):
+            print(r.id, 'st_id=' + str(r.student_id), r.program, r.title, r.due_date, 'pushed=' + str(r.pushed), 'attachment=' + str(r.attachment))
+
+def list_schedule():
+    for sess in shard_sessions(readonly=True):
+        for r in sess.query(ScheduleItem).yield_per(1000):
+            print(r.id, r.program, r.week_day, r.time, r.subject, r.classroom, r.teacher)
+
+def _int(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError(f'{name} must be a number, got {value!r}')
+
+def add_student(batch, *args):
+    name, program, year, pwd = ask(batch, args, 'add_student <full_name> <program> <year> <password>',
+                                   'Full name: ', 'Program: ', 'Year: ', 'Password (will be hashed): ')
+    s = Student(full_name=name, program=program, year=_int(year, 'year'))
     s.set_password(pwd)
+    sess = batch.session(program=program)
     sess.add(s)
-    sess.commit()
+    sess.flush()
     print('Added', s.id)
 
-def add_homework(sess):
-    sid = input('Student id (or leave empty to create program-level): ')
-    program = None
-    student_id = None
-    if sid.strip() == '':
-        program = input('Program for homework: ')
-    else:
-        student_id = int(sid)
-    title = input('Title: ')
-    desc = input('Description: ')
-    due = input('Due date: ')
+def add_homework(batch, *args):
+    if not args and batch.interactive:
+        sid = input('Student id (or leave empty to create program-level): ').strip() or '-'
+        program = input('Program for homework: ') if sid == '-' else '-'
+        args = [sid, program, input('Title: '), input('Description: '), input('Due date: ')]
+    elif len(args) != 5:
+        raise CommandError('Usage: add_homework <student_id|-> <program|-> <title> <description> <due_date>')
+    sid, program, title, desc, due = args
+    student_id = None if sid == '-' else _int(sid, 'student_id')
+    program = None if program == '-' else program
+    if student_id is None and program is None:
+        raise CommandError('Homework needs a student id or a program')
     hw = Homework(student_id=student_id, program=program, title=title, description=desc, due_date=due, pushed=0)
+    sess = batch.session(student_id=student_id) if student_id is not None else batch.session(program=program)
     sess.add(hw)
-    sess.commit()
+    sess.flush()
     print('Homework added id=', hw.id)
 
-def add_schedule(sess):
-    program = input('Program: ')
-    week_day = input('Week day (e.g. Monday): ')
-    time = input('Time (e.g. 09:00-10:30): ')
-    subject = input('Subject: ')
-    classroom = input('Classroom: ')
-    teacher = input('Teacher: ')
-    si = ScheduleItem(program=program, week_day=week_day, time=time, subject=subject, classroom=classroom, teacher=teacher)
+def add_schedule(batch, *args):
+    program, week_day, time, subject, classroom, teacher = ask(
+        batch, args, 'add_schedule <program> <week_day> <time> <subject> <classroom> <teacher>',
+        'Program: ', 'Week day (e.g. Monday): ', 'Time (e.g. 09:00-10:30): ', 'Subject: ', 'Classroom: ', 'Teacher: ')
+    try:
+        si = ScheduleItem(program=program, week_day=week_day, time=time, subject=subject, classroom=classroom, teacher=teacher)
+    except ValueError as e:
+        raise CommandError(f'Rejected: {e}')
+    # аудитории и преподаватели проверяются в пределах шарда (кампуса) направления;
+    # flush — чтобы учесть пары, добавленные раньше в этой же пачке
+    sess = batch.session(program=program)
+    sess.flush()
+    conflicts = find_conflicts(sess, si.week_day, si.classroom, si.teacher, si.start_min, si.end_min)
+    if conflicts:
+        for kind, res, other_id in conflicts:
+            print(f'Conflict: {kind} {res} is already busy (schedule id={other_id})')
+        if not batch.interactive:
+            raise CommandError('Not added: schedule conflict')
+        if input('Add anyway? [y/N]: ').strip().lower() != 'y':
+            print('Not added'); return
     sess.add(si)
-    sess.commit()
+    sess.flush()
     print('Schedule item added, id=', si.id)
 
-def add_grade(sess):
-    sid = int(input('Student id: '))
-    subject = input('Subject: ')
-    grade = input('Grade: ')
-    comment = input('Comment: ')
+def audit_schedule():
+    # накладки ищутся в пределах шарда (кампуса)
+    rows, conflicts = [], []
+    for sess in shard_sessions(readonly=True):
+        shard_rows = sess.query(ScheduleItem).all()
+        rows += shard_rows
+        conflicts += audit_timetable(shard_rows)
+    bad = [r for r in rows if r.start_min is None]
+    for r in bad:
+        print(f'Unparsed time: id={r.id} {r.program} {r.week_day} {r.time!r}')
+    for kind, a, b in conflicts:
+        print(f'{a.week_day} {kind}={getattr(a, kind)}: id={a.id} {format_minutes(a.start_min)}-{format_minutes(a.end_min)} ({a.program})'
+              f' overlaps id={b.id} {format_minutes(b.start_min)}-{format_minutes(b.end_min)} ({b.program})')
+    print(f'Checked {len(rows)} items: {len(conflicts)} conflicts, {len(bad)} unparsed')
+    if conflicts or bad:
+        # ненулевой код выхода — чтобы аудит можно было ставить в cron/CI
+        raise CommandError('Audit failed: schedule has conflicts or unparsed times')
+
+def add_grade(batch, *args):
+    if len(args) == 3:
+        args += ('',)
+    sid, subject, grade, comment = ask(batch, args, 'add_grade <student_id> <subject> <grade> [comment]',
+                                       'Student id: ', 'Subject: ', 'Grade: ', 'Comment: ')
+    sid = _int(sid, 'student_id')
     g = Grade(student_id=sid, subject=subject, grade=grade, comment=comment)
+    sess = batch.session(student_id=sid)
     sess.add(g)
-    sess.commit()
+    sess.flush()
     print('Grade added')
 
-def export_table(sess, table, filename):
-    if table == 'students':
-        rows = sess.query(Student).all()
-        keys = ['id','full_name','program','year','created_at']
-        data = [[r.id,r.full_name,r.program,r.year,str(r.created_at)] for r in rows]
-    elif table == 'homeworks':
-        rows = sess.query(Homework).all()
-        keys = ['id','student_id','program','title','description','due_date','pushed','attachment','created_at']
-        data = [[r.id,r.student_id,r.program,r.title,r.description,r.due_date,r.pushed,r.attachment,str(r.created_at)] for r in rows]
-    elif table == 'grades':
-        rows = sess.query(Grade).all()
-        keys = ['id','student_id','subject','grade','comment','created_at']
-        data = [[r.id,r.student_id,r.subject,r.grade,r.comment,str(r.created_at)] for r in rows]
-    elif table == 'schedule':
-        rows = sess.query(ScheduleItem).all()
-        keys = ['id','program','week_day','time','subject','classroom','teacher']
-        data = [[r.id,r.program,r.week_day,r.time,r.subject,r.classroom,r.teacher] for r in rows]
-    else:
-        print('Unknown table')
-        return
-    if filename.endswith('.csv'):
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(keys)
-            writer.writerows(data)
-        print('Exported to', filename)
-    elif filename.endswith('.json'):
-        arr = [dict(zip(keys,row)) for row in data]
-        with open(filename,'w',encoding='utf-8') as f:
-            json.dump(arr,f,ensure_ascii=False,indent=2)
-        print('Exported to', filename)
-    else:
-        print('Use .csv or .json')
+def export_table(table, filename):
+    engines = [shards.engine(name, readonly=True) for name in shards.names()]
+    try:
+        stats = export_table_to(engines, table, filename, progress=print_export_progress)
+    except (ValueError, RuntimeError) as e:
+        raise CommandError(f'Export failed: {e}')
+    print(f"\rExported {stats['done']} rows in {stats['elapsed']:.1f}s ({stats['rate']:.0f} rows/s) -> {filename}")
+
+def import_table(table, filename):
+    try:
+        stats = import_table_from(shards, table, filename, progress=print_import_progress)
+    except (ValueError, RuntimeError, OSError) as e:
+        raise CommandError(f'Import failed: {e}')
+    print(f"\rImported {stats['done']} rows, rejected {stats['rejected']} in {stats['elapsed']:.1f}s ({stats['rate']:.0f} rows/s) <- {filename}")
+    for line, error in stats['errors']:
+        print(f'  row {line}: {error}')
+    if stats['rejected'] > len(stats['errors']):
+        print(f"  ... and {stats['rejected'] - len(stats['errors'])} more")
+
+def report(filename, fmt='csv', program=None):
+    if not filename.endswith('.zip'):
+        raise CommandError('Use .zip')
+    if fmt not in REPORT_FORMATS:
+        raise CommandError('Format must be one of ' + ', '.join(REPORT_FORMATS))
+    try:
+        if program:
+            engines = [shards.engine_for(program, readonly=True)]
+        else:
+            engines = [shards.engine(name, readonly=True) for name in shards.names()]
+        stats = generate_reports(engines, filename, program=program, fmt=fmt, progress=print_progress)
+    except (ValueError, RuntimeError) as e:
+        raise CommandError(f'Report failed: {e}')
+    print()
+    print(f"Reports: {stats['done']} students in {stats['elapsed']:.1f}s ({stats['rate']:.1f} st/s) -> {filename}")
+
+def backup(target=None):
+    target = target or getattr(config, 'BACKUP_DIR', 'backups')
+    try:
+        name, manifest = backup_to(shards, target, getattr(config, 'UPLOAD_DIR', 'uploads'), progress=lambda msg: print(' ', msg))
+    except (RuntimeError, OSError) as e:
+        raise CommandError(f'Backup failed: {e}')
+    st = manifest['stats']
+    rows = sum(t['rows'] for info in manifest['shards'].values() for t in info['tables'].values())
+    print(f"Backup {name}: {rows} rows, {len(manifest['files'])} files ({st['files_copied']} copied, {st['files_reused']} unchanged)"
+          f" in {st['elapsed']:.1f}s -> {os.path.join(target, name)}")
+    for rel in manifest['missing']:
+        print('  missing attachment:', rel)
+
+def restore(batch, target=None, name=None):
+    target = target or getattr(config, 'BACKUP_DIR', 'backups')
+    if batch.interactive and input(f'Replace all students, schedule, homeworks and grades with backup {name or "(latest)"} from {target}? [y/N]: ').strip().lower() != 'y':
+        print('Not restored'); return
+    shards.init_all()
+    try:
+        stats = restore_from(shards, target, getattr(config, 'UPLOAD_DIR', 'uploads'), name, progress=lambda msg: print(' ', msg))
+    except (RuntimeError, OSError) as e:
+        raise CommandError(f'Restore failed: {e}')
+    rows = sum(n for counts in stats['rows'].values() for n in counts.values())
+    print(f"Restored {stats['name']}: {rows} rows, {stats['files']} files ({stats['files_written']} written) in {stats['elapsed']:.1f}s")
+
+def archive(year=None):
+    current = current_academic_year()
+    before = _int(year, 'year') + 1 if year else current
+    if before > current:
+        raise CommandError(f'Academic year {before - 1} is not closed yet (current: {current})')
+    print(f'Archiving academic years before {before}/{before + 1}')
+    for name in shards.names():
+        moved = archive_before(shards.engine(name), before, progress=lambda table, n: print(f'\r  {name}.{table}: {n}', end='', flush=True))
+        print(f'\r{name}:', ', '.join(f'{t}={n}' for t, n in moved.items()).ljust(40))
+
+def list_shards():
+    shards.reload_map()
+    for name in shards.names():
+        with get_session(shards.engine(name, readonly=True)) as sess:
+            programs = {p for (p,) in sess.query(Student.program).distinct()} | {p for (p,) in sess.query(ScheduleItem.program).distinct()}
+        default = ' (default)' if name == shards.default else ''
+        print(f'{name}{default}:', ', '.join(sorted(programs)) or '-')
+
+def rebalance(shard, program):
+    if shard not in shards.names():
+        raise CommandError('Unknown shard. Known: ' + ', '.join(shards.names()))
+    src = shards.shard_for(program)
+    if src == shard:
+        print(f'{program} is already on {shard}'); return
+    moved = shards.move_program(program, shard, progress=lambda table, n: print(f'  {table}: {n}'))
+    print(f'Moved {program}: {src} -> {shard},', ', '.join(f'{t}={n}' for t, n in moved.items()))
+
+def _size(n):
+    if n is None:
+        return '-'
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if n < 1024 or unit == 'GiB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+
+def _sql(statement, width=90):
+    # список колонок ORM длинный и ничего не говорит — важнее FROM и WHERE
+    statement = re.sub(r'^SELECT (?!COUNT).*? FROM ', 'SELECT ... FROM ', statement)
+    return statement if len(statement) <= width else statement[:width - 3] + '...'
+
+def stats(top='10'):
+    top = _int(top, 'top')
+    path = getattr(config, 'QUERY_STATS_FILE', 'query_stats.db')
+    slow_ms = getattr(config, 'SLOW_QUERY_MS', 100)
+    for name in shards.names():
+        engine = shards.engine(name)
+        engines = [name] + [f'{name}/replica{i}' for i in range(1, len(shards.routers[name].replicas) + 1)]
+        print(f'== {name} ({engine.dialect.name})')
+        tables, total = table_stats(engine)
+        print(f"  {'table':<20} {'rows':>10} {'data':>11} {'indexes':>11}")
+        for table, rows, data, index in tables:
+            print(f'  {table:<20} {rows:>10} {_size(data):>11} {_size(index):>11}')
+        if total is not None:
+            print(f'  total on disk: {_size(total)}')
+        report = index_report(engine, recorded_statements(path, engines))
+        for idx in report['missing']:
+            print(f'  missing index: {idx} (declared in models; run --init-db)')
+        for table, statement in report['full_scans']:
+            print(f'  full scan of {table}: {_sql(statement)}')
+        if report['unused']:
+            print('  unused indexes:', ', '.join(report['unused']))
+        if report['note']:
+            print('  note:', report['note'])
+        hot = hot_statements(path, engines, top)
+        if hot:
+            print(f"  top statements by total time:\n  {'calls':>8} {'total ms':>10} {'avg ms':>8} {'max ms':>8}  statement")
+            for statement, calls, total_ms, avg_ms, max_ms in hot:
+                print(f'  {calls:>8} {total_ms:>10.0f} {avg_ms:>8.1f} {max_ms:>8.1f}  {_sql(statement)}')
+        slow = slow_queries(path, engines, top)
+        if slow:
+            print(f"  slow queries (>= {slow_ms} ms, latest {getattr(config, 'SLOW_QUERY_KEEP', 500)}):\n  {'times':>8} {'avg ms':>10} {'max ms':>8} {'last':>8}  statement")
+            for statement, times, avg_ms, max_ms, last in slow:
+                print(f"  {times:>8} {avg_ms:>10.1f} {max_ms:>8.1f} {datetime.fromtimestamp(last):%H:%M:%S}  {_sql(statement)}")
+    rates = hit_rates(path)
+    if rates:
+        print('== hit rates (API processes)')
+        for name, hits, misses in rates:
+            total = hits + misses
+            if total:
+                print(f'  {name:<32} {hits / total:7.1%} of {total}')
+    elif not os.path.exists(path):
+        print(f'No query log at {path}: it is written by the API process (QUERY_STATS_FILE)')
+
+# имя -> (функция, пишет ли в пачку, мин. и макс. число аргументов, подсказка); пишущим командам
+# первым аргументом передаётся Batch, остальные сами фиксируют свою работу
+COMMANDS = {
+    'help': (lambda: print(HELP), False, 0, 0, 'help'),
+    'list_students': (list_students, False, 0, 0, 'list_students'),
+    'list_homeworks': (list_homeworks, False, 0, 0, 'list_homeworks'),
+    'list_schedule': (list_schedule, False, 0, 0, 'list_schedule'),
+    'add_student': (add_student, True, 0, 4, None),
+    'add_homework': (add_homework, True, 0, 5, None),
+    'add_schedule': (add_schedule, True, 0, 6, None),
+    'audit_schedule': (audit_schedule, False, 0, 0, 'audit_schedule'),
+    'add_grade': (add_grade, True, 0, 4, None),
+    'export': (export_table, False, 2, 2, 'export <table> <file.csv|file.ndjson|file.json>[.gz] | <file.parquet>'),
+    'import': (import_table, False, 2, 2, 'import <table> <file.csv|file.ndjson|file.json>[.gz] | <file.parquet>'),
+    'report': (report, False, 1, 3, 'report <file.zip> [csv|html|pdf] [program]'),
+    'backup': (backup, False, 0, 1, 'backup [dir]'),
+    'restore': (restore, True, 0, 2, 'restore [dir] [name]'),
+    'archive': (archive, False, 0, 1, 'archive [year]'),
+    'shards': (list_shards, False, 0, 0, 'shards'),
+    'rebalance': (rebalance, False, 2, 2, 'rebalance <shard> <program>'),
+    'stats': (stats, False, 0, 1, 'stats [top]'),
+}
+
+def run_command(batch, name, args):
+    if name not in COMMANDS:
+        raise CommandError(f'Unknown command {name!r}. Type help')
+    func, writes, lo, hi, usage = COMMANDS[name]
+    if usage and not lo <= len(args) <= hi:
+        raise CommandError('Usage: ' + usage)
+    if not writes:
+        return func(*args)
+    func(batch, *args)
+    batch.pending += 1
+
+def split_command(line):
+    try:
+        return shlex.split(line, comments=True)
+    except ValueError as e:
+        raise CommandError(f'Cannot parse command: {e}')
 
 def repl():
-    sess = get_session(engine)
+    shards.init_all()
     print('Console manager. Type help')
     while True:
         cmd = input('> ').strip()
-        if cmd == 'help':
-            print(HELP)
-        elif cmd == 'list_students':
-            list_students(sess)
-        elif cmd == 'list_homeworks':
-            list_homeworks(sess)
-        elif cmd == 'list_schedule':
-            list_schedule(sess)
-        elif cmd == 'add_student':
-            add_student(sess)
-        elif cmd == 'add_homework':
-            add_homework(sess)
-        elif cmd == 'add_schedule':
-            add_schedule(sess)
-        elif cmd == 'add_grade':
-            add_grade(sess)
-        elif cmd.startswith('export'):
-            parts = cmd.split()
-            if len(parts) >= 3:
-                export_table(sess, parts[1], parts[2])
-            else:
-                print('Usage: export <table> <file.csv|file.json>')
-        elif cmd == 'exit':
+        if cmd == 'exit':
             break
-        else:
-            print('Unknown command. Type help')
+        batch = Batch(interactive=True)
+        try:
+            # report принимает направление из нескольких слов без кавычек, как раньше
+            parts = cmd.split(maxsplit=3) if cmd.startswith('report') else split_command(cmd)
+            if not parts:
+                continue
+            run_command(batch, parts[0], parts[1:])
+            batch.commit()
+        except CommandError as e:
+            print(e)
+        finally:
+            batch.close()
+
+def run_batch(commands, batch_size, keep_going=False):
+    # commands — [(номер строки, имя, аргументы)]; пишущие команды фиксируются пачками по batch_size.
+    # Ошибка команды: с keep_going команда пропускается (её изменения в пачку не попадают — они
+    # проверяются до записи), без него — пачка откатывается и выполнение останавливается
+    batch = Batch()
+    done = failed = committed = 0
+    try:
+        for line, name, args in commands:
+            try:
+                run_command(batch, name, args)
+                done += 1
+            except CommandError as e:
+                failed += 1
+                print(f'line {line}: {name}: {e}', file=sys.stderr)
+                if not keep_going:
+                    batch.close()
+                    print(f'Stopped: {committed} write commands committed before line {line}', file=sys.stderr)
+                    return EXIT_FAILED
+                continue
+            if batch.pending >= batch_size:
+                n = batch.pending
+                batch.commit()
+                committed += n
+        committed += batch.pending
+        batch.commit()
+    except Exception as e:
+        batch.close()
+        print(f'Failed: {type(e).__name__}: {e}; {committed} write commands committed', file=sys.stderr)
+        return EXIT_FAILED
+    print(f'Done: {done} commands, {committed} writes committed, {failed} failed', file=sys.stderr)
+    return EXIT_FAILED if failed else EXIT_OK
+
+def read_script(path):
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    with f:
+        for n, line in enumerate(f, 1):
+            parts = split_command(line)
+            if parts:
+                yield n, parts[0], parts[1:]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Консольный менеджер. Без аргументов — интерактивный режим (REPL).')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='команда и её аргументы, например: add_grade 5 Математика A')
+    parser.add_argument('--script', help='файл с командами, по одной на строку (- — stdin); # — комментарий')
+    parser.add_argument('--batch-size', type=int, default=getattr(config, 'CONSOLE_BATCH_SIZE', 200),
+                        help='сколько пишущих команд фиксировать одной транзакцией')
+    parser.add_argument('--keep-going', action='store_true', help='не останавливаться на ошибочной команде')
+    parser.add_argument('--init-db', action='store_true', help='создать недостающие таблицы, колонки и индексы перед запуском')
+    opts = parser.parse_args(argv)
+    if not opts.command and not opts.script:
+        if opts.init_db:
+            shards.init_all()
+            return EXIT_OK
+        repl()
+        return EXIT_OK
+    if opts.command and opts.script:
+        parser.error('use either a command or --script')
+    if opts.batch_size < 1:
+        parser.error('--batch-size must be positive')
+    # скрипт разбирается целиком до выполнения: опечатка в команде не оставит его выполненным наполовину
+    try:
+        commands = list(read_script(opts.script)) if opts.script else [(1, opts.command[0], opts.command[1:])]
+    except (OSError, CommandError) as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    unknown = [(line, name) for line, name, _ in commands if name not in COMMANDS or name == 'exit']
+    if unknown:
+        for line, name in unknown:
+            print(f'line {line}: unknown command {name!r}', file=sys.stderr)
+        return EXIT_USAGE
+    if opts.init_db:
+        shards.init_all()
+    return run_batch(commands, opts.batch_size, opts.keep_going)
 
 if __name__ == '__main__':
-    repl()
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -0,0 +1,165 @@
+# timetable.py
+# Разбор времени пар ("09:00-10:30" -> минуты от начала суток) и индекс интервалов
+# для поиска накладок по аудиториям и преподавателям.
+import re
+from bisect import bisect_left, bisect_right
+
+_TIME_RE = re.compile(r'^\s*(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})\s*$')
+
+
+def parse_time_range(s):
+    m = _TIME_RE.match(s or '')
+    if not m:
+        raise ValueError(f'bad time {s!r}, expected HH:MM-HH:MM')
+    h1, m1, h2, m2 = (int(x) for x in m.groups())
+    if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59:
+        raise ValueError(f'bad time {s!r}')
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    if end <= start:
+        raise ValueError(f'bad time {s!r}: end must be after start')
+    return start, end
+
+
+def format_minutes(m):
+    return f'{m // 60:02d}:{m % 60:02d}'
+
+
+WEEK_DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+_DAYS = {d.casefold(): d for d in WEEK_DAYS}
+
+
+def normalize_day(v):
+    # день недели хранится в одном написании ('monday ' -> 'Monday'): по нему же ищут индекс БД и TimetableIndex
+    v = (v or '').strip()
+    return _DAYS.get(v.casefold(), v)
+
+
+def normalize_resource(v):
+    # аудитория / преподаватель: без пробелов по краям, пустое значение — NULL
+    return (v or '').strip() or None
+
+
+def resource_key(v):
+    # ключ сравнения без учёта регистра ('a101' и 'A101' — одна аудитория), как у _ci-сопоставлений MySQL;
+    # хранится в classroom_key / teacher_key, чтобы SQLite сравнивал так же
+    v = normalize_resource(v)
+    return v.casefold() if v else None
+
+
+def _key(week_day, resource):
+    return normalize_day(week_day), resource_key(resource)
+
+
+class IntervalIndex:
+    # на каждый ключ — список интервалов, отсортированный по началу; поиск пересечений
+    # ограничен окном [s - max_len, e), поэтому стоит O(log n + k) даже при старых накладках
+    def __init__(self):
+        self._starts = {}
+        self._items = {}
+        self._max_len = {}
+
+    def add(self, key, start, end, item_id):
+        pos = bisect_right(self._starts.setdefault(key, []), start)
+        self._starts[key].insert(pos, start)
+        self._items.setdefault(key, []).insert(pos, (start, end, item_id))
+        self._max_len[key] = max(self._max_len.get(key, 0), end - start)
+
+    def overlaps(self, key, start, end):
+        starts = self._starts.get(key)
+        if not starts:
+            return []
+        lo = bisect_right(starts, start - self._max_len[key])
+        hi = bisect_left(starts, end)
+        return [it for it in self._items[key][lo:hi] if it[1] > start]
+
+    def remove(self, key, start, item_id):
+        starts = self._starts.get(key, [])
+        for pos in range(bisect_left(starts, start), bisect_right(starts, start)):
+            if self._items[key][pos][2] == item_id:
+                del starts[pos], self._items[key][pos]
+                return
+
+    def __len__(self):
+        return sum(len(v) for v in self._starts.values())
+
+
+class TimetableIndex:
+    # накладки ищутся в пределах дня недели: по аудитории и по преподавателю (независимо от направления)
+    def __init__(self):
+        self.rooms = IntervalIndex()
+        self.teachers = IntervalIndex()
+        self._entries = {}  # item_id -> (week_day, classroom, teacher, start): повторный add заменяет пару
+
+    @classmethod
+    def load(cls, sess, week_day=None):
+        from db_models import ScheduleItem
+        idx = cls()
+        q = sess.query(ScheduleItem.id, ScheduleItem.week_day, ScheduleItem.classroom, ScheduleItem.teacher,
+                       ScheduleItem.start_min, ScheduleItem.end_min).filter(ScheduleItem.start_min.isnot(None))
+        if week_day:
+            q = q.filter(ScheduleItem.week_day == normalize_day(week_day))
+        # по возрастанию начала — add дописывает в конец списков, без сдвига
+        for r in q.order_by(ScheduleItem.start_min):
+            idx.add(r.id, r.week_day, r.classroom, r.teacher, r.start_min, r.end_min)
+        return idx
+
+    def check(self, week_day, classroom, teacher, start, end):
+        out = []
+        if normalize_resource(classroom):
+            out += [('classroom', classroom, it[2]) for it in self.rooms.overlaps(_key(week_day, classroom), start, end)]
+        if normalize_resource(teacher):
+            out += [('teacher', teacher, it[2]) for it in self.teachers.overlaps(_key(week_day, teacher), start, end)]
+        return out
+
+    def add(self, item_id, week_day, classroom, teacher, start, end):
+        self.remove(item_id)
+        self._entries[item_id] = (week_day, classroom, teacher, start)
+        if normalize_resource(classroom):
+            self.rooms.add(_key(week_day, classroom), start, end, item_id)
+        if normalize_resource(teacher):
+            self.teachers.add(_key(week_day, teacher), start, end, item_id)
+
+    def remove(self, item_id):
+        entry = self._entries.pop(item_id, None)
+        if entry:
+            week_day, classroom, teacher, start = entry
+            self.rooms.remove(_key(week_day, classroom), start, item_id)
+            self.teachers.remove(_key(week_day, teacher), start, item_id)
+
+
+def find_conflicts(sess, week_day, classroom, teacher, start, end):
+    # накладки одной пары запросом по индексам ix_schedule_day_classroom_key / ix_schedule_day_teacher_key:
+    # O(log n + k), без загрузки расписания дня; [(вид, ресурс, id пары)]
+    from db_models import ScheduleItem
+    day, out = normalize_day(week_day), []
+    for kind, col, value in (('classroom', ScheduleItem.classroom_key, normalize_resource(classroom)),
+                             ('teacher', ScheduleItem.teacher_key, normalize_resource(teacher))):
+        if value:
+            q = sess.query(ScheduleItem.id).filter(ScheduleItem.week_day == day, col == resource_key(value),
+                                                   ScheduleItem.start_min < end, ScheduleItem.end_min > start)
+            out += [(kind, value, item_id) for (item_id,) in q]
+    return out
+
+
+def audit_timetable(rows):
+    # один проход сортировки + sweep: для каждого ключа держим интервал с самым поздним концом;
+    # rows — объекты с id, week_day, classroom, teacher, start_min, end_min
+    conflicts = []
+    for kind in ('classroom', 'teacher'):
+        keyed = []
+        for r in rows:
+            res = getattr(r, kind)
+            if r.start_min is None or not normalize_resource(res):
+                continue
+            keyed.append((_key(r.week_day, res), r.start_min, r.end_min, r))
+        keyed.sort(key=lambda x: (x[0], x[1]))
+        cur_key, cur_end, cur_row = None, -1, None
+        for key, start, end, r in keyed:
+            if key != cur_key:
+                cur_key, cur_end, cur_row = key, end, r
+                continue
+            if start < cur_end:
+                conflicts.append((kind, cur_row, r))
+            if end > cur_end:
+                cur_end, cur_row = end, r
+    return conflicts